@@ -0,0 +1,387 @@
+import argparse
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import string
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+import uvicorn
+
+from .http_bench import free_port, percentile
+
+logger = logging.getLogger(__name__)
+
+CHATBOT_DIR = Path(__file__).parent.parent / "chatbot_interface"
+# share of turns per kind: a word for `get_game_result`, random words, plain chat
+DEFAULT_MIX = {"play": 0.5, "random": 0.2, "chat": 0.3}
+PLAY_PROMPT = re.compile(r"^play (\S+)$")
+RANDOM_PROMPT = re.compile(r"^random (\d+)$")
+# component durations per `Server-Timing` entry, e.g. `engine;dur=0.65`
+SERVER_TIMING_ENTRY = re.compile(r"(\w+);dur=([\d.]+)")
+
+# timings of the turn running in the current context, followed into graph nodes, tools and fan-out threads
+_current_turn: contextvars.ContextVar["TurnRecord | None"] = contextvars.ContextVar("current_turn", default=None)
+_record_lock = threading.Lock()
+
+
+@dataclass
+class TurnRecord:
+    session: int
+    turn: int
+    kind: str
+    total_s: float = 0.0
+    first_token_s: float | None = None
+    summarize_s: float = 0.0
+    model_s: float = 0.0
+    tool_http_s: float = 0.0
+    engine_s: float = 0.0
+    db_s: float = 0.0
+    tool_requests: int = 0
+    error: str | None = None
+
+    @property
+    def graph_s(self) -> float:
+        # framework overhead: everything that is neither a node measured here nor a tool request
+        return max(self.total_s - self.summarize_s - self.model_s - self.tool_http_s, 0.0)
+
+    def add(self, component: str, seconds: float) -> None:
+        # several tool requests of a turn can finish concurrently
+        with _record_lock:
+            setattr(self, component, getattr(self, component) + seconds)
+
+
+def scripted_model_class():
+    """
+    Deterministic stand-in for the chat model: a `play <word>` prompt is answered with a
+    `get_game_result` call, `random <n>` with a `get_results_for_random_words` call, anything else
+    (and every tool result) with plain text. Tokens are counted as words.
+    """
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import (
+        AIMessage,
+        AIMessageChunk,
+        HumanMessage,
+        ToolMessage,
+    )
+    from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+    class ScriptedChatModel(BaseChatModel):
+        # simulated model latency per call, seconds
+        latency: float = 0.0
+
+        @property
+        def _llm_type(self) -> str:
+            return "scripted"
+
+        def bind_tools(self, tools, **kwargs):
+            # tool calls are only scripted for calls with tools bound, not for the summarization model
+            return self.bind(tools=[getattr(tool, "name", str(tool)) for tool in tools], **kwargs)
+
+        def get_num_tokens_from_messages(self, messages, tools=None) -> int:
+            return 3 + sum(4 + len(str(message.content).split()) for message in messages)
+
+        def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs) -> ChatResult:
+            if self.latency:
+                time.sleep(self.latency)
+            return ChatResult(generations=[ChatGeneration(message=self.reply(messages, tools))])
+
+        def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+            # streamed word by word like the real model, so the time to the first token is measured
+            if self.latency:
+                time.sleep(self.latency)
+            message = self.reply(messages, tools)
+            if message.tool_calls:
+                tool_call_chunks = [
+                    {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": idx}
+                    for idx, call in enumerate(message.tool_calls)
+                ]
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks))
+                return
+            for word in message.content.split(" "):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+        def reply(self, messages, tools) -> AIMessage:
+            last = messages[-1]
+            if tools and isinstance(last, HumanMessage):
+                tool_call = self.script_tool_call(str(last.content))
+                if tool_call is not None:
+                    return AIMessage(content="", tool_calls=[tool_call])
+            if isinstance(last, ToolMessage):
+                return AIMessage(content=f"The game returned {last.content}.")
+            return AIMessage(content=f"Here is what I know about: {str(last.content)[:200]}")
+
+        @staticmethod
+        def script_tool_call(prompt: str) -> dict | None:
+            call_id = f"call_{uuid.uuid4().hex[:12]}"
+            if match := PLAY_PROMPT.match(prompt):
+                return {"name": "get_game_result", "args": {"word": match.group(1)}, "id": call_id}
+            if match := RANDOM_PROMPT.match(prompt):
+                return {"name": "get_results_for_random_words", "args": {"n_words": int(match.group(1))}, "id": call_id}
+            return None
+
+    return ScriptedChatModel
+
+
+def instrumented_chatbot_class():
+    """
+    `Chatbot` recording the time spent in its summarization and model nodes into the current turn.
+    """
+    if str(CHATBOT_DIR) not in sys.path:
+        sys.path.insert(0, str(CHATBOT_DIR))
+    from chatbot import Chatbot
+
+    class InstrumentedChatbot(Chatbot):
+        def _summarize(self, state, config):
+            start = time.perf_counter()
+            try:
+                return super()._summarize(state, config)
+            finally:
+                record_component("summarize_s", time.perf_counter() - start)
+
+        def _model_call(self, state):
+            start = time.perf_counter()
+            try:
+                return super()._model_call(state)
+            finally:
+                record_component("model_s", time.perf_counter() - start)
+
+    return InstrumentedChatbot
+
+
+def record_component(component: str, seconds: float) -> None:
+    record = _current_turn.get()
+    if record is not None:
+        record.add(component, seconds)
+
+
+def on_request(request) -> None:
+    request.extensions["load_test_started_at"] = time.perf_counter()
+
+
+def on_response(response) -> None:
+    record = _current_turn.get()
+    started_at = response.request.extensions.get("load_test_started_at")
+    if record is None or started_at is None:
+        return
+    record.add("tool_http_s", time.perf_counter() - started_at)
+    record.add("tool_requests", 1)
+    timings = dict(SERVER_TIMING_ENTRY.findall(response.headers.get("server-timing", "")))
+    record.add("engine_s", float(timings.get("engine", 0.0)) / 1000)
+    record.add("db_s", float(timings.get("db", 0.0)) / 1000)
+
+
+@contextmanager
+def in_process_service(db_path: str):
+    """
+    The FastAPI service on a uvicorn server thread of this process, on a free local port with the
+    database at `db_path`. Yields the base url.
+    """
+    os.environ["ENGINE_DB_URL"] = db_path
+    from service.app import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="chat-load-service", daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 60
+        while not server.started:
+            if not thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("In-process service did not start")
+            time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+
+
+def session_prompts(rng: random.Random, turns: int, mix: dict[str, float]) -> list[tuple[str, str]]:
+    prompts = []
+    for kind in rng.choices(list(mix), weights=list(mix.values()), k=turns):
+        if kind == "play":
+            prompts.append((kind, f"play {random_word(rng)}"))
+        elif kind == "random":
+            prompts.append((kind, f"random {rng.randint(5, 50)}"))
+        else:
+            prompts.append((kind, " ".join(random_word(rng) for _ in range(rng.randint(5, 40)))))
+    return prompts
+
+
+def run_session(chatbot, session: int, prompts: list[tuple[str, str]]) -> list[TurnRecord]:
+    from langchain_core.messages import AIMessageChunk
+
+    # a conversation of its own, as a Streamlit browser session
+    thread_id = f"load-test-{session}-{uuid.uuid4().hex[:8]}"
+    records = []
+    for turn, (kind, prompt) in enumerate(prompts):
+        record = TurnRecord(session=session, turn=turn, kind=kind)
+        token = _current_turn.set(record)
+        start = time.perf_counter()
+        try:
+            for chunk, metadata in chatbot.stream({"messages": [prompt]}, thread_id=thread_id):
+                first_token = record.first_token_s is None and isinstance(chunk, AIMessageChunk) and chunk.content
+                if first_token and metadata.get("langgraph_node") == "model":
+                    record.first_token_s = time.perf_counter() - start
+        except Exception as e:
+            record.error = repr(e)
+        finally:
+            record.total_s = time.perf_counter() - start
+            _current_turn.reset(token)
+        records.append(record)
+    return records
+
+
+def summarize(records: list[TurnRecord], elapsed: float) -> dict:
+    components = [field.name for field in fields(TurnRecord) if field.name.endswith("_s")] + ["graph_s"]
+    report = {
+        "turns": len(records),
+        "errors": sum(record.error is not None for record in records),
+        "elapsed_s": elapsed,
+        "turns_per_s": len(records) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {},
+    }
+    for component in components:
+        values = [getattr(record, component) for record in records]
+        values_ms = sorted(1000 * value for value in values if value is not None)
+        report["latency_ms"][component.removesuffix("_s")] = {
+            "mean": sum(values_ms) / len(values_ms) if values_ms else 0.0,
+            "p50": percentile(values_ms, 0.50),
+            "p95": percentile(values_ms, 0.95),
+            "p99": percentile(values_ms, 0.99),
+            "max": values_ms[-1] if values_ms else 0.0,
+        }
+    return report
+
+
+def run_load_test(
+    sessions: int = 8,
+    turns: int = 10,
+    mix: dict[str, float] = DEFAULT_MIX,
+    model_latency: float = 0.0,
+    words_file: str | None = None,
+    seed: int = 0,
+) -> tuple[dict, list[TurnRecord]]:
+    """
+    Runs `sessions` concurrent conversations of `turns` turns through `Chatbot` with the scripted model,
+    against an in-process service with a fresh database. Returns the report and the per-turn records.
+    """
+    rng = random.Random(seed)
+    # the random words tool draws from the global generator
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if words_file is None:
+            words_file = os.path.join(tmp_dir, "words.txt")
+            Path(words_file).write_text("\n".join(random_word(rng) for _ in range(10_000)))
+        os.environ["WORDS_FILE"] = words_file
+
+        with in_process_service(os.path.join(tmp_dir, "service.db")) as url:
+            os.environ["API_URL"] = url + "/cgol/game"
+            chatbot_class = instrumented_chatbot_class()
+            import chatbot_tools
+
+            chatbot_tools.get_api_client.cache_clear()
+            api_client = chatbot_tools.get_api_client()
+            api_client.client.event_hooks = {"request": [on_request], "response": [on_response]}
+
+            chatbot = chatbot_class(
+                reset_memory=True,
+                memory_path=os.path.join(tmp_dir, "chatbot_memory.db"),
+                llm=scripted_model_class()(latency=model_latency),
+            )
+            all_prompts = [session_prompts(rng, turns, mix) for _ in range(sessions)]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="chat-session") as pool:
+                session_records = list(pool.map(run_session, [chatbot] * sessions, range(sessions), all_prompts))
+            elapsed = time.perf_counter() - start
+
+            records = [record for records in session_records for record in records]
+            report = summarize(records, elapsed)
+            report["config"] = {
+                "sessions": sessions,
+                "turns": turns,
+                "mix": mix,
+                "model_latency_s": model_latency,
+                "seed": seed,
+            }
+            report["token_cache"] = chatbot.token_cache_stats()
+            chatbot.close()
+            api_client.close()
+            chatbot_tools.get_api_client.cache_clear()
+    return report, records
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    # e.g. "play=0.5,random=0.2,chat=0.3"
+    weights = {kind: float(weight) for kind, weight in (item.split("=") for item in mix.split(","))}
+    unknown = set(weights) - set(DEFAULT_MIX)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown turn kinds {sorted(unknown)}, expected {list(DEFAULT_MIX)}")
+    return weights
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline chat pipeline load test with a scripted model")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=10, help="turns per session")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=DEFAULT_MIX, help="turn kind weights, play=..,random=..,chat=.."
+    )
+    parser.add_argument("--model-latency", type=float, default=0.0, help="simulated seconds per model call")
+    parser.add_argument("--words-file", help="word pool of the random words tool, generated words by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON report path")
+    parser.add_argument("--records", help="JSON lines file for the per turn records")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report, records = run_load_test(
+        sessions=args.sessions,
+        turns=args.turns,
+        mix=args.mix,
+        model_latency=args.model_latency,
+        words_file=args.words_file,
+        seed=args.seed,
+    )
+
+    logger.info(
+        "%d turns in %.2f s (%.1f turns/s), %d errors, token cache hit rate %.1f%%",
+        report["turns"],
+        report["elapsed_s"],
+        report["turns_per_s"],
+        report["errors"],
+        100 * report["token_cache"]["hit_rate"],
+    )
+    for component, latency in report["latency_ms"].items():
+        logger.info(
+            "%-12s mean %8.2f ms  p50 %8.2f ms  p95 %8.2f ms  p99 %8.2f ms",
+            component,
+            latency["mean"],
+            latency["p50"],
+            latency["p95"],
+            latency["p99"],
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        logger.info("Report written to %s", args.output)
+    if args.records:
+        with open(args.records, "w") as records_file:
+            for record in records:
+                records_file.write(json.dumps({**asdict(record), "graph_s": record.graph_s}) + "\n")
+    return 1 if report["errors"] else 0
@@ -0,0 +1,102 @@
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+
+from service.cgol_engine import BACKENDS, GameOfLifeEngine
+
+DEFAULT_GRIDS = ((60, 40), (50, 50), (100, 100), (200, 200))
+DEFAULT_WORDS = ("persistent_state", "hello", "monkey")
+DEFAULT_MAX_GENERATIONS = (1000,)
+# the naive python backend takes minutes per run above this grid area, only run with `include_slow`
+SLOW_BACKEND_MAX_CELLS = {"python": 2500}
+
+
+@dataclass
+class EngineCase:
+    backend: str
+    grid_rows: int
+    grid_cols: int
+    word: str
+    max_generations: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.backend}/{self.grid_rows}x{self.grid_cols}/{self.word}/{self.max_generations}"
+
+
+@dataclass
+class EngineResult:
+    key: str
+    case: dict
+    num_generations: int
+    score: int
+    stop_reason: str
+    times_s: list[float] = field(default_factory=list)
+    median_s: float = 0.0
+    min_s: float = 0.0
+    generations_per_s: float = 0.0
+    cells_per_s: float = 0.0
+    # peak of the Python / NumPy allocations traced during one run, C++ allocations are not traced
+    peak_traced_mb: float = 0.0
+
+
+def engine_cases(
+    backends: list[str] | None = None,
+    grids: tuple[tuple[int, int], ...] = DEFAULT_GRIDS,
+    words: tuple[str, ...] = DEFAULT_WORDS,
+    max_generations: tuple[int, ...] = DEFAULT_MAX_GENERATIONS,
+    include_slow: bool = False,
+) -> list[EngineCase]:
+    """
+    The benchmark matrix, restricted to the backends available on this machine.
+    """
+    available = GameOfLifeEngine().available_backends()
+    backends = [backend for backend in (backends or BACKENDS) if backend in available]
+    return [
+        EngineCase(backend, grid_rows, grid_cols, word, generations)
+        for backend in backends
+        for grid_rows, grid_cols in grids
+        if include_slow or grid_rows * grid_cols <= SLOW_BACKEND_MAX_CELLS.get(backend, grid_rows * grid_cols)
+        for word in words
+        for generations in max_generations
+    ]
+
+
+def run_engine_case(case: EngineCase, repeats: int = 3) -> EngineResult:
+    engine = GameOfLifeEngine(
+        max_generations=case.max_generations,
+        grid_rows=case.grid_rows,
+        grid_cols=case.grid_cols,
+        backend=case.backend,
+    )
+    # warm up: library loading, first touch allocations
+    response = engine.run(case.word)
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.run(case.word)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        engine.run(case.word)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(times)
+    return EngineResult(
+        key=case.key,
+        case=asdict(case),
+        num_generations=response.num_generations,
+        score=response.score,
+        stop_reason=response.stop_reason,
+        times_s=times,
+        median_s=median,
+        min_s=min(times),
+        generations_per_s=response.num_generations / median if median > 0 else 0.0,
+        cells_per_s=response.num_generations * case.grid_rows * case.grid_cols / median if median > 0 else 0.0,
+        peak_traced_mb=peak / (1 << 20),
+    )
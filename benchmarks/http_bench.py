@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+
+@dataclass
+class HttpResult:
+    key: str
+    scenario: str
+    num_requests: int
+    concurrency: int
+    errors: int
+    elapsed_s: float
+    requests_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def random_words(num_words: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    # a run specific prefix, so the words are cold even against a long running service
+    prefix = "".join(rng.choices(string.ascii_lowercase, k=6))
+    return [prefix + "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(num_words)]
+
+
+async def load(url: str, words: list[str], concurrency: int) -> tuple[list[float], int, float]:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+
+        async def request(word: str) -> None:
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"word": word})
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(word) for word in words))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def summarize(scenario: str, concurrency: int, latencies: list[float], errors: int, elapsed: float) -> HttpResult:
+    latencies_ms = sorted(1000 * latency for latency in latencies)
+    return HttpResult(
+        key=f"http/{scenario}/c{concurrency}",
+        scenario=scenario,
+        num_requests=len(latencies_ms),
+        concurrency=concurrency,
+        errors=errors,
+        elapsed_s=elapsed,
+        requests_per_s=len(latencies_ms) / elapsed if elapsed > 0 else 0.0,
+        p50_ms=percentile(latencies_ms, 0.50),
+        p95_ms=percentile(latencies_ms, 0.95),
+        p99_ms=percentile(latencies_ms, 0.99),
+        max_ms=latencies_ms[-1] if latencies_ms else 0.0,
+    )
+
+
+def run_http_scenarios(url: str, num_requests: int = 500, concurrency: int = 16, seed: int = 0) -> list[HttpResult]:
+    """
+    `cold`: words never requested before, every request runs the engine and inserts its result.
+    `warm`: the same words again, answered from the result cache.
+    """
+    words = random_words(num_requests, seed)
+    results = []
+    for scenario in ("cold", "warm"):
+        latencies, errors, elapsed = asyncio.run(load(url, words, concurrency))
+        results.append(summarize(scenario, concurrency, latencies, errors, elapsed))
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_service():
+    """
+    The service in a separate process on a free local port with a temporary database, so the load
+    generator does not compete with it for the GIL. Yields the `/cgol/game` url.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = {**os.environ, "ENGINE_DB_URL": os.path.join(tmp_dir, "bench.db")}
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "service.app:app", "--port", str(port), "--log-level", "warning"],
+            env=env,
+            cwd=Path(__file__).parent.parent,
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError("Benchmark service failed to start")
+                try:
+                    httpx.get(url + "/cgol/engine/stats").raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("Benchmark service did not start within 60 s")
+                    time.sleep(0.1)
+            yield url + "/cgol/game"
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,153 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from .engine_bench import (
+    DEFAULT_GRIDS,
+    DEFAULT_MAX_GENERATIONS,
+    DEFAULT_WORDS,
+    engine_cases,
+    run_engine_case,
+)
+from .http_bench import local_service, run_http_scenarios
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# (result field, True when higher is better) compared against the baseline
+ENGINE_METRICS = (("median_s", False),)
+HTTP_METRICS = (("requests_per_s", True), ("p95_ms", False))
+
+
+def machine_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Regressions of `report` against `baseline`: metrics worse by more than `tolerance` (relative) and
+    engine results that differ from the baseline's.
+    """
+    problems = []
+    for section, metrics in (("engine", ENGINE_METRICS), ("http", HTTP_METRICS)):
+        baseline_results = {result["key"]: result for result in baseline.get(section, [])}
+        for result in report.get(section, []):
+            reference = baseline_results.get(result["key"])
+            if reference is None:
+                continue
+            if section == "engine":
+                outcome = (result["num_generations"], result["score"], result["stop_reason"])
+                expected = (reference["num_generations"], reference["score"], reference["stop_reason"])
+                if outcome != expected:
+                    problems.append(f"{result['key']}: result {outcome} differs from baseline {expected}")
+            for metric, higher_is_better in metrics:
+                value, reference_value = result[metric], reference[metric]
+                if reference_value <= 0:
+                    continue
+                ratio = value / reference_value
+                if (ratio < 1 / (1 + tolerance)) if higher_is_better else (ratio > 1 + tolerance):
+                    problems.append(f"{result['key']}: {metric} {value:.4g} vs baseline {reference_value:.4g}")
+    return problems
+
+
+def parse_grid(grid: str) -> tuple[int, int]:
+    rows, cols = grid.lower().split("x")
+    return int(rows), int(cols)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Engine and HTTP benchmark suite")
+    parser.add_argument("--backends", nargs="*", help="engine backends, all available by default")
+    parser.add_argument("--grids", nargs="*", default=[f"{rows}x{cols}" for rows, cols in DEFAULT_GRIDS])
+    parser.add_argument("--words", nargs="*", default=list(DEFAULT_WORDS))
+    parser.add_argument("--max-generations", nargs="*", type=int, default=list(DEFAULT_MAX_GENERATIONS))
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per engine case")
+    parser.add_argument("--include-slow", action="store_true", help="run the naive python backend on large grids")
+    parser.add_argument("--skip-engine", action="store_true")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--url", help="`/cgol/game` url of a running service, a local one is started by default")
+    parser.add_argument("--requests", type=int, default=500, help="requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report path")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON report")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative slowdown flagged as regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = {"machine": machine_info(), "engine": [], "http": []}
+
+    if not args.skip_engine:
+        cases = engine_cases(
+            backends=args.backends,
+            grids=tuple(parse_grid(grid) for grid in args.grids),
+            words=tuple(args.words),
+            max_generations=tuple(args.max_generations),
+            include_slow=args.include_slow,
+        )
+        for case in cases:
+            result = run_engine_case(case, repeats=args.repeats)
+            report["engine"].append(asdict(result))
+            logger.info(
+                "%-40s %8.2f ms  %10.0f gen/s  %12.3g cells/s  %7.2f MB traced",
+                result.key,
+                1000 * result.median_s,
+                result.generations_per_s,
+                result.cells_per_s,
+                result.peak_traced_mb,
+            )
+
+    if not args.skip_http:
+        if args.url is not None:
+            http_results = run_http_scenarios(args.url, args.requests, args.concurrency)
+        else:
+            with local_service() as url:
+                http_results = run_http_scenarios(url, args.requests, args.concurrency)
+        for result in http_results:
+            report["http"].append(asdict(result))
+            logger.info(
+                "%-40s %8.1f req/s  p50 %7.2f ms  p95 %7.2f ms  p99 %7.2f ms  %d errors",
+                result.key,
+                result.requests_per_s,
+                result.p50_ms,
+                result.p95_ms,
+                result.p99_ms,
+                result.errors,
+            )
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    logger.info("Report written to %s", args.output)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        logger.info("Baseline updated at %s", baseline_path)
+        return 0
+    if not baseline_path.is_file():
+        logger.info("No baseline at %s, run with --update-baseline to store one", baseline_path)
+        return 0
+
+    problems = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+    for problem in problems:
+        logger.warning("Regression: %s", problem)
+    if not problems:
+        logger.info("No regressions against %s", baseline_path)
+    return 1 if problems else 0
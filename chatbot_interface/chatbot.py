@@ -1,19 +1,32 @@
+import asyncio
+import sqlite3
 from pathlib import Path
-from typing import Any, Literal, TypedDict
+from typing import Any, AsyncIterator, Iterator, Literal, TypedDict
 
-from chatbot_tools import get_game_result, get_results_for_random_words
+import aiosqlite
+from chatbot_tools import (
+    get_game_result,
+    get_results_for_random_words,
+    get_stored_results,
+)
 from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import (
     AnyMessage,
     HumanMessage,
     RemoveMessage,
     SystemMessage,
 )
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
 from langmem.short_term import RunningSummary, SummarizationNode, summarize_messages
+from token_counting import TokenCountCache
+
+DEFAULT_MEMORY_PATH = "chatbot_memory.db"
 
 SYSTEM_PROMT = """
     You are a helpful and knowledgeable chatbot assistant.
@@ -33,27 +46,52 @@ SYSTEM_PROMT = """
 class SummaryState(MessagesState):
     summarized_messages: list[AnyMessage]
     context: dict[str, Any]
+    # token counts of the current messages by message key, see `TokenCountCache`
+    token_counts: dict[str, int]
 
 
-class Chatbot:
+def connect_memory(memory_path: str) -> sqlite3.Connection:
+    # shared by every session's thread: WAL lets readers of one thread's checkpoints proceed while another is written
+    conn = sqlite3.connect(memory_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
 
-    def __init__(self, reset_memory: bool) -> None:
-        self.tools = [get_game_result, get_results_for_random_words]
-        self.llm = init_chat_model(model="openai:gpt-4o-mini")
 
+class Chatbot:
+    """
+    Model client, summarization node, checkpointer and compiled graph are built once and shared by all
+    conversations of the process; conversations are told apart by their `thread_id`.
+    """
+
+    def __init__(
+        self, reset_memory: bool, memory_path: str = DEFAULT_MEMORY_PATH, llm: BaseChatModel | None = None
+    ) -> None:
+        self.tools = [get_game_result, get_results_for_random_words, get_stored_results]
+        self.llm = llm if llm is not None else init_chat_model(model="openai:gpt-4o-mini")
+        self.llm_with_tools = self.llm.bind_tools(self.tools)
+
+        self.token_counter = TokenCountCache(self.llm.get_num_tokens_from_messages)
         self.summary_node = SummarizationNode(
-            token_counter=self.llm.get_num_tokens_from_messages,
+            token_counter=self.token_counter.count_messages,
             model=self.llm.bind(max_tokens=128),
             max_tokens=256,
             max_tokens_before_summary=528,
             max_summary_tokens=128,
         )
 
+        self.memory_path = memory_path
         self._setup_memory(reset_memory=reset_memory)
+        self.memory = SqliteSaver(connect_memory(memory_path))
 
-        self.config = {"configurable": {"thread_id": 1}}
         self.system_prompt = SystemMessage(content=SYSTEM_PROMT)
-        self._build_graph()
+        self.graph = self._build_graph().compile(checkpointer=self.memory)
+        # built on first async use for the running event loop: the lock and the checkpointer (its aiosqlite
+        # connection and lock) are bound to that loop and rebuilt when another loop uses the chatbot
+        self.async_graph = None
+        self.async_graph_loop: asyncio.AbstractEventLoop | None = None
+        self.async_loop: asyncio.AbstractEventLoop | None = None
+        self.async_lock: asyncio.Lock | None = None
 
     def _build_graph(self) -> StateGraph:
         graph_builder = StateGraph(SummaryState)
@@ -61,7 +99,7 @@ class Chatbot:
 
         tool_node = ToolNode(self.tools)
         graph_builder.add_node("tools", tool_node)
-        graph_builder.add_node("summarize", self.summary_node)
+        graph_builder.add_node("summarize", self._summarize)
 
         graph_builder.set_entry_point("summarize")
         graph_builder.add_edge("summarize", "model")
@@ -72,13 +110,22 @@ class Chatbot:
         return graph_builder
 
     def _setup_memory(self, reset_memory: bool = False):
-        if Path("chatbot_memory.db").exists() and reset_memory:
-            Path("chatbot_memory.db").unlink()
+        if reset_memory:
+            for suffix in ("", "-wal", "-shm"):
+                Path(self.memory_path + suffix).unlink(missing_ok=True)
+
+    def _summarize(self, state: SummaryState, config: RunnableConfig):
+        # counts checkpointed with the conversation, e.g. before a restart, are not recomputed
+        self.token_counter.load(state.get("token_counts") or {})
+        update = self.summary_node.invoke(state, config)
+        return {**update, "token_counts": self.token_counter.counts_for(state["messages"])}
+
+    def token_cache_stats(self) -> dict:
+        return self.token_counter.stats()
 
     def _model_call(self, state: SummaryState):
-        system_prompt = SystemMessage(content=SYSTEM_PROMT)
-        messages = [system_prompt] + state["summarized_messages"]
-        response = self.llm.bind_tools(self.tools).invoke(messages)
+        messages = [self.system_prompt] + state["summarized_messages"]
+        response = self.llm_with_tools.invoke(messages)
         return {"messages": [response]}
 
     @staticmethod
@@ -89,12 +136,51 @@ class Chatbot:
         else:
             return "tools"
 
-    def stream(self, user_input: SummaryState):
-        with SqliteSaver.from_conn_string("chatbot_memory.db") as memory:
-            graph = self._build_graph().compile(checkpointer=memory)
-            yield graph.stream(user_input, config=self.config, stream_mode="messages")
-
-    def invoke(self, user_input: SummaryState):
-        with SqliteSaver.from_conn_string("chatbot_memory.db") as memory:
-            graph = self._build_graph().compile(checkpointer=memory)
-            return graph.invoke(user_input, config=self.config)
+    @staticmethod
+    def thread_config(thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def stream(self, user_input: SummaryState, thread_id: str) -> Iterator[tuple[Any, dict]]:
+        return self.graph.stream(user_input, config=self.thread_config(thread_id), stream_mode="messages")
+
+    def invoke(self, user_input: SummaryState, thread_id: str):
+        return self.graph.invoke(user_input, config=self.thread_config(thread_id))
+
+    def _get_async_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self.async_loop is not loop:
+            self.async_loop = loop
+            self.async_lock = asyncio.Lock()
+        return self.async_lock
+
+    async def _get_async_graph(self):
+        async with self._get_async_lock():
+            if self.async_graph is not None and self.async_graph_loop is not self.async_loop:
+                # aiosqlite connections are not tied to a loop, the previous loop's one is closed from this one
+                await self.async_graph.checkpointer.conn.close()
+                self.async_graph = None
+            if self.async_graph is None:
+                conn = await aiosqlite.connect(self.memory_path)
+                await conn.execute("PRAGMA journal_mode=WAL")
+                self.async_graph = self._build_graph().compile(checkpointer=AsyncSqliteSaver(conn))
+                self.async_graph_loop = self.async_loop
+        return self.async_graph
+
+    async def astream(self, user_input: SummaryState, thread_id: str) -> AsyncIterator[tuple[Any, dict]]:
+        graph = await self._get_async_graph()
+        async for chunk in graph.astream(user_input, config=self.thread_config(thread_id), stream_mode="messages"):
+            yield chunk
+
+    async def ainvoke(self, user_input: SummaryState, thread_id: str):
+        graph = await self._get_async_graph()
+        return await graph.ainvoke(user_input, config=self.thread_config(thread_id))
+
+    async def aclose(self) -> None:
+        # its connection thread keeps the process alive otherwise
+        async with self._get_async_lock():
+            if self.async_graph is not None:
+                await self.async_graph.checkpointer.conn.close()
+                self.async_graph = None
+
+    def close(self) -> None:
+        self.memory.conn.close()
@@ -1,32 +1,291 @@
+import asyncio
+import contextvars
 import os
 import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 
-import requests
-from langchain_core.tools import tool
+import httpx
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool
 from nltk.corpus import words
 
 # from nltk.data import path
 
 # path.append(os.environ["NLTK_DATA"])
 
+# responses of an overloaded API, retried after a backoff
+RETRY_STATUSES = (429, 503)
 
-def request_game_result(payload: dict) -> str | dict:
-    response = requests.post(os.environ["API_URL"], json=payload, timeout=15)
-    try:
+
+def error_result(error_str: str) -> dict:
+    return {"num_generations": 0, "score": 0, "stop_reason": error_str}
+
+
+class GameApiClient:
+    """
+    Client of the game API shared by all tool calls, with sync and async variants of every call.
+
+    Connections are pooled and reused, at most `max_concurrency` requests run at a time. Requests
+    answered with 429 / 503 are retried up to `max_retries` times after a jittered exponential backoff
+    (on top of the server's Retry-After). Many words are fanned out as concurrent batch requests of
+    `batch_size` words. Successful results are memoized per conversation, for the `memo_size` most
+    recent words of the `max_conversations` most recent conversations.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        batch_url: str | None = None,
+        max_concurrency: int = 8,
+        batch_size: int = 64,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 15.0,
+        memo_size: int = 256,
+        max_conversations: int = 64,
+    ):
+        self.api_url = api_url
+        # batch endpoint next to the single game one, e.g. .../cgol/game -> .../cgol/games
+        self.batch_url = batch_url or api_url.rstrip("/") + "s"
+        self.results_url = api_url.rstrip("/").rsplit("/", 1)[0] + "/results"
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+        self.client = httpx.Client(limits=self.limits, timeout=timeout)
+        self.fan_out = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="game-api")
+        # an async client is bound to the event loop it was created in
+        self.async_client: httpx.AsyncClient | None = None
+        self.async_loop: asyncio.AbstractEventLoop | None = None
+
+        self.memo_size = memo_size
+        self.max_conversations = max_conversations
+        self.memo: OrderedDict[str | None, OrderedDict[str, dict]] = OrderedDict()
+        self.memo_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "GameApiClient":
+        return cls(
+            api_url=os.environ["API_URL"],
+            batch_url=os.environ.get("API_BATCH_URL") or None,
+            max_concurrency=int(os.environ.get("API_MAX_CONCURRENCY", 8)),
+            batch_size=int(os.environ.get("API_BATCH_SIZE", 64)),
+            max_retries=int(os.environ.get("API_MAX_RETRIES", 3)),
+            timeout=float(os.environ.get("API_TIMEOUT", 15.0)),
+        )
+
+    def retry_delay(self, attempt: int, response: httpx.Response) -> float:
+        # full jitter, so clients rejected together do not retry together
+        delay = random.uniform(0, self.backoff * 2**attempt)
+        retry_after = response.headers.get("Retry-After", "")
+        return delay + float(retry_after) if retry_after.isdigit() else delay
+
+    def post(self, url: str, payload: dict) -> dict:
+        return self.request("POST", url, json=payload)
+
+    def request(self, method: str, url: str, **kwargs) -> dict:
+        for attempt in range(self.max_retries + 1):
+            response = self.client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            time.sleep(self.retry_delay(attempt, response))
         response.raise_for_status()
-        response = response.json()
-    except requests.exceptions.HTTPError as e:
-        error_str = f"HTTP Error: {e}"
-        response = {"num_generations": 0, "score": 0, "stop_reason": error_str}
-    except Exception as e:
-        error_str = f"Error: {e}"
-        response = {"num_generations": 0, "score": 0, "stop_reason": error_str}
+        return response.json()
+
+    async def apost(self, url: str, payload: dict) -> dict:
+        return await self.arequest("POST", url, json=payload)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> dict:
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self.async_loop is not loop:
+            await self.aclose()
+            self.async_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self.async_loop = loop
+        for attempt in range(self.max_retries + 1):
+            response = await self.async_client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            await asyncio.sleep(self.retry_delay(attempt, response))
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self) -> None:
+        client, self.async_client, self.async_loop = self.async_client, None, None
+        if client is None:
+            return
+        try:
+            await client.aclose()
+        except Exception:
+            # connections bound to an event loop that is already closed cannot be shut down gracefully
+            pass
+
+    def close(self) -> None:
+        self.client.close()
+        self.fan_out.shutdown(wait=False)
+
+    def query_results(self, **params) -> dict:
+        """
+        Stored results from the results API, `params` are its query parameters (None values are left out).
+        """
+        try:
+            return self.request(
+                "GET", self.results_url, params={key: val for key, val in params.items() if val is not None}
+            )
+        except httpx.HTTPStatusError as e:
+            return {"results": [], "error": f"HTTP Error: {e}"}
+        except Exception as e:
+            return {"results": [], "error": f"Error: {e}"}
+
+    async def aquery_results(self, **params) -> dict:
+        try:
+            return await self.arequest(
+                "GET", self.results_url, params={key: val for key, val in params.items() if val is not None}
+            )
+        except httpx.HTTPStatusError as e:
+            return {"results": [], "error": f"HTTP Error: {e}"}
+        except Exception as e:
+            return {"results": [], "error": f"Error: {e}"}
+
+    def memo_get(self, conversation: str | None, word: str) -> dict | None:
+        with self.memo_lock:
+            results = self.memo.get(conversation)
+            if results is None or word not in results:
+                return None
+            self.memo.move_to_end(conversation)
+            results.move_to_end(word)
+            return results[word]
+
+    def memo_put(self, conversation: str | None, word: str, result: dict) -> None:
+        with self.memo_lock:
+            results = self.memo.setdefault(conversation, OrderedDict())
+            self.memo.move_to_end(conversation)
+            results[word] = result
+            results.move_to_end(word)
+            if len(results) > self.memo_size:
+                results.popitem(last=False)
+            if len(self.memo) > self.max_conversations:
+                self.memo.popitem(last=False)
+
+    def get_result(self, word: str, conversation: str | None = None) -> dict:
+        result = self.memo_get(conversation, word)
+        if result is not None:
+            return result
+        try:
+            result = self.post(self.api_url, {"word": word})
+        except httpx.HTTPStatusError as e:
+            return error_result(f"HTTP Error: {e}")
+        except Exception as e:
+            return error_result(f"Error: {e}")
+        self.memo_put(conversation, word, result)
+        return result
+
+    async def aget_result(self, word: str, conversation: str | None = None) -> dict:
+        result = self.memo_get(conversation, word)
+        if result is not None:
+            return result
+        try:
+            result = await self.apost(self.api_url, {"word": word})
+        except httpx.HTTPStatusError as e:
+            return error_result(f"HTTP Error: {e}")
+        except Exception as e:
+            return error_result(f"Error: {e}")
+        self.memo_put(conversation, word, result)
+        return result
+
+    def _split_batches(self, words_list: list[str], conversation: str | None) -> tuple[dict, list[list[str]]]:
+        results = {}
+        missing = []
+        for word in dict.fromkeys(words_list):
+            result = self.memo_get(conversation, word)
+            if result is not None:
+                results[word] = result | {"word": word}
+            else:
+                missing.append(word)
+        return results, [missing[start : start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+
+    def _collect_batch(self, results: dict, batch: list[str], batch_results: list[dict] | str, conversation) -> None:
+        if isinstance(batch_results, str):
+            results.update((word, error_result(batch_results) | {"word": word}) for word in batch)
+            return
+        for result in batch_results:
+            results[result["word"]] = result
+            self.memo_put(conversation, result["word"], {key: val for key, val in result.items() if key != "word"})
+
+    def _post_batch(self, batch: list[str]) -> list[dict] | str:
+        try:
+            return self.post(self.batch_url, {"words": batch})["results"]
+        except httpx.HTTPStatusError as e:
+            return f"HTTP Error: {e}"
+        except Exception as e:
+            return f"Error: {e}"
+
+    async def _apost_batch(self, batch: list[str], semaphore: asyncio.Semaphore) -> list[dict] | str:
+        async with semaphore:
+            try:
+                return (await self.apost(self.batch_url, {"words": batch}))["results"]
+            except httpx.HTTPStatusError as e:
+                return f"HTTP Error: {e}"
+            except Exception as e:
+                return f"Error: {e}"
+
+    def get_results(self, words_list: list[str], conversation: str | None = None) -> list[dict]:
+        """
+        Results of `words_list` in order, each with a "word" key. Words missing from the memo are
+        requested in concurrent batches, so the latency is about that of the slowest batch.
+        """
+        results, batches = self._split_batches(words_list, conversation)
+        # the batches run in the caller's context, so context variables (tracing, timings) follow them
+        contexts = [contextvars.copy_context() for _ in batches]
+        all_batch_results = self.fan_out.map(
+            lambda context, batch: context.run(self._post_batch, batch), contexts, batches
+        )
+        for batch, batch_results in zip(batches, all_batch_results):
+            self._collect_batch(results, batch, batch_results, conversation)
+        return [results[word] for word in words_list]
 
-    return response
+    async def aget_results(self, words_list: list[str], conversation: str | None = None) -> list[dict]:
+        results, batches = self._split_batches(words_list, conversation)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        all_batch_results = await asyncio.gather(*(self._apost_batch(batch, semaphore) for batch in batches))
+        for batch, batch_results in zip(batches, all_batch_results):
+            self._collect_batch(results, batch, batch_results, conversation)
+        return [results[word] for word in words_list]
 
 
-@tool
-def get_game_result(word: str):
+@lru_cache(maxsize=None)
+def get_api_client() -> GameApiClient:
+    return GameApiClient.from_env()
+
+
+@lru_cache(maxsize=None)
+def read_words_file(path: str) -> list[str]:
+    return Path(path).read_text(encoding="utf-8").split()
+
+
+def word_pool() -> list[str]:
+    # `WORDS_FILE` (one word per line) replaces the NLTK words corpus, e.g. on machines without it
+    words_file = os.environ.get("WORDS_FILE")
+    return read_words_file(words_file) if words_file else words.words()
+
+
+def conversation_id(config: RunnableConfig | None) -> str | None:
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def best_result(results: list[dict]) -> dict | None:
+    # the first of equally scored words wins
+    return max(results, key=lambda result: result["score"], default=None)
+
+
+def game_result(word: str, config: RunnableConfig):
     """
     Call to run Conway simulation and get results for the given word.
 
@@ -36,13 +295,14 @@ def get_game_result(word: str):
     Returns:
         dict: Dictionary with keys "num_generations", "score" and "stop_reason"
     """
-    payload = {"word": word}
-    response = request_game_result(payload)
-    return response
+    return get_api_client().get_result(word, conversation_id(config))
+
 
+async def agame_result(word: str, config: RunnableConfig):
+    return await get_api_client().aget_result(word, conversation_id(config))
 
-@tool
-def get_results_for_random_words(n_words: int):
+
+def results_for_random_words(n_words: int, config: RunnableConfig):
     """
     Call to generate specified number of random words (n_words) with nltk.corpus.words,
     run Conway simulation for each word and return the result for the best score.
@@ -53,19 +313,72 @@ def get_results_for_random_words(n_words: int):
     Returns:
         dict: Dictionary with keys "word", "num_generations", "score" and "stop_reason"
     """
-    words_list = random.choices(words.words(), k=n_words)
-    best_score = 0
-    best_response = None
-
-    for word in words_list:
-        payload = {"word": word}
-        response = request_game_result(payload)
-
-        if best_response is None:
-            best_score = response["score"]
-            best_response = response | {"word": word}
-        if response["score"] > best_score:
-            best_score = response["score"]
-            best_response = response | {"word": word}
-
-    return best_response
+    words_list = random.choices(word_pool(), k=n_words)
+    results = get_api_client().get_results(words_list, conversation_id(config))
+    return best_result(results)
+
+
+async def aresults_for_random_words(n_words: int, config: RunnableConfig):
+    words_list = random.choices(word_pool(), k=n_words)
+    results = await get_api_client().aget_results(words_list, conversation_id(config))
+    return best_result(results)
+
+
+# the async variants run when the graph is streamed asynchronously, instead of the sync ones on worker threads
+get_game_result = StructuredTool.from_function(func=game_result, coroutine=agame_result, name="get_game_result")
+get_results_for_random_words = StructuredTool.from_function(
+    func=results_for_random_words, coroutine=aresults_for_random_words, name="get_results_for_random_words"
+)
+
+
+def stored_results(
+    k: int = 10,
+    stop_reason: str | None = None,
+    min_generations: int | None = None,
+    max_generations: int | None = None,
+    order_by: str = "score",
+):
+    """
+    Call to look up already computed Conway simulation results, e.g. the best scoring words,
+    words that ended in a given way or words that lasted a given number of generations.
+
+    Args:
+        k (int): The number of results to return, best first
+        stop_reason (str | None): Only results that stopped with "extinction", "persistent_state",
+            "repeated_pattern" or "reached_max_generation"
+        min_generations (int | None): Only results with at least this many generations
+        max_generations (int | None): Only results with at most this many generations
+        order_by (str): "score" or "num_generations"
+
+    Returns:
+        dict: Dictionary with key "results", a list of dictionaries with keys "word", "num_generations",
+            "score" and "stop_reason"
+    """
+    return get_api_client().query_results(
+        limit=k,
+        stop_reason=stop_reason,
+        min_generations=min_generations,
+        max_generations=max_generations,
+        order_by=order_by,
+    )
+
+
+async def astored_results(
+    k: int = 10,
+    stop_reason: str | None = None,
+    min_generations: int | None = None,
+    max_generations: int | None = None,
+    order_by: str = "score",
+):
+    return await get_api_client().aquery_results(
+        limit=k,
+        stop_reason=stop_reason,
+        min_generations=min_generations,
+        max_generations=max_generations,
+        order_by=order_by,
+    )
+
+
+get_stored_results = StructuredTool.from_function(
+    func=stored_results, coroutine=astored_results, name="get_stored_results"
+)
@@ -1,4 +1,5 @@
 import os
+import uuid
 
 import streamlit as st
 from chatbot import Chatbot, SummaryState
@@ -18,8 +19,20 @@ def init_sesion_state():
         st.session_state.history = []
     if "login_status" not in st.session_state:
         st.session_state.login_status = True
-    if "reset_memory" not in st.session_state:
-        st.session_state.reset_memory = True
+    if "thread_id" not in st.session_state:
+        # every browser session gets its own checkpointed conversation
+        st.session_state.thread_id = uuid.uuid4().hex
+
+
+@st.cache_resource
+def get_chatbot() -> Chatbot:
+    # built once per process and shared by all sessions, memory of a previous process is dropped
+    return Chatbot(reset_memory=True)
+
+
+@st.cache_resource
+def get_db_service() -> SQLiteService:
+    return SQLiteService(os.environ["UI_DB_URL"])
 
 
 def render_messages():
@@ -49,15 +62,14 @@ def show_main_page(chatbot: Chatbot):
 
             response_placeholder = st.empty()
             full_response = []
-            stream = chatbot.stream(SummaryState(messages=[user_prompt]))
-            for streamed in stream:
-                for chunk, metadata in streamed:
-                    if not isinstance(chunk, AIMessageChunk):
-                        continue
-                    if not metadata["langgraph_node"] == "model":
-                        continue
-                    full_response.append(chunk.content)
-                    response_placeholder.markdown("".join(full_response))
+            stream = chatbot.stream(SummaryState(messages=[user_prompt]), thread_id=st.session_state.thread_id)
+            for chunk, metadata in stream:
+                if not isinstance(chunk, AIMessageChunk):
+                    continue
+                if not metadata["langgraph_node"] == "model":
+                    continue
+                full_response.append(chunk.content)
+                response_placeholder.markdown("".join(full_response))
             st.session_state.history.append({"role": "assistant", "content": "".join(full_response)})
 
 
@@ -84,11 +96,9 @@ if __name__ == "__main__":
     set_env()
     init_sesion_state()
 
-    db_service = SQLiteService(os.environ["UI_DB_URL"])
+    db_service = get_db_service()
 
-    chatbot = Chatbot(st.session_state.reset_memory)
-    if st.session_state.reset_memory:
-        st.session_state.reset_memory = False
+    chatbot = get_chatbot()
 
     if st.session_state.login_status:
         show_main_page(chatbot)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Sequence
+
+from langchain_core.messages import BaseMessage
+
+
+def message_key(message: BaseMessage) -> str:
+    # the id alone is not enough, a message can be replaced under the same id with other content
+    payload = json.dumps(
+        [
+            message.type,
+            message.content,
+            getattr(message, "name", None),
+            getattr(message, "tool_calls", None),
+            getattr(message, "tool_call_id", None),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return f"{message.id}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+class TokenCountCache:
+    """
+    Token counter for `SummarizationNode` counting every message only once.
+
+    Token counts are cached per message, keyed by message id and content hash, in an LRU of
+    `max_entries` shared by all conversations. The counts of a conversation's current messages are also
+    kept in its checkpointed state (`load` / `counts_for`), so they survive a restart. `count_messages`
+    relies on the wrapped counter being additive over messages plus a fixed per call overhead (the
+    reply priming tokens of OpenAI models), which is measured on an empty message list.
+    """
+
+    def __init__(self, count_messages: Callable[[Sequence[BaseMessage]], int], max_entries: int = 100_000):
+        self.wrapped = count_messages
+        self.max_entries = max_entries
+        self.call_overhead = count_messages([])
+        self.counts: OrderedDict[str, int] = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "loaded": 0, "evictions": 0}
+
+    def count_message(self, message: BaseMessage) -> int:
+        key = message_key(message)
+        with self.lock:
+            count = self.counts.get(key)
+            if count is not None:
+                self.counts.move_to_end(key)
+                self.counters["hits"] += 1
+                return count
+        count = self.wrapped([message]) - self.call_overhead
+        with self.lock:
+            self.counters["misses"] += 1
+            self._put(key, count)
+        return count
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return self.call_overhead + sum(self.count_message(message) for message in messages)
+
+    def load(self, counts: dict[str, int]) -> None:
+        with self.lock:
+            for key, count in counts.items():
+                if key not in self.counts:
+                    self.counters["loaded"] += 1
+                self._put(key, count)
+
+    def counts_for(self, messages: Sequence[BaseMessage]) -> dict[str, int]:
+        """
+        Cached counts of `messages`, to be stored with the conversation state.
+        """
+        keys = [message_key(message) for message in messages]
+        with self.lock:
+            return {key: self.counts[key] for key in keys if key in self.counts}
+
+    def _put(self, key: str, count: int) -> None:
+        self.counts[key] = count
+        self.counts.move_to_end(key)
+        while len(self.counts) > self.max_entries:
+            self.counts.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "entries": len(self.counts),
+                "max_entries": self.max_entries,
+                **self.counters,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
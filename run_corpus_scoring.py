@@ -0,0 +1,4 @@
+from service.corpus_scoring import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+from service.db.result_snapshot import main
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,25 @@
+import os
+
 from fastapi import FastAPI
 
-from .router import router
+from .metrics import MetricsMiddleware
+from .profiler import SlowRequestProfiler
+from .resources import lifespan
+from .router import metrics_router, router
+
+# opt-in: sampling costs a thread waking every few milliseconds while requests are in flight
+profiler = (
+    SlowRequestProfiler(
+        interval=float(os.environ.get("PROFILE_INTERVAL", 0.005)),
+        keep=int(os.environ.get("PROFILE_KEEP", 10)),
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 1.0)),
+    )
+    if os.environ.get("PROFILE_SLOW_REQUESTS", "0") == "1"
+    else None
+)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.state.profiler = profiler
+app.add_middleware(MetricsMiddleware, profiler=profiler)
 app.include_router(router)
+app.include_router(metrics_router)
@@ -1,18 +1,44 @@
 import ctypes
+import os
 import sys
-from hashlib import md5
 from pathlib import Path
-from typing import Tuple
+from typing import Generator, Tuple
 
 import numpy as np
 
+from .cycle_detection import CycleDetector
 from .data_model import GameResponse
+from .rules import DEFAULT_RULE, parse_rule
+from .trajectory_store import TrajectoryRecorder, TrajectoryStore
+
+BACKENDS = ("python", "numpy", "cpp", "cpp_packed")
+# backends that look up and record states in a trajectory store, the C++ kernels never consult it
+TRAJECTORY_STORE_BACKENDS = ("python", "numpy")
+# Must match `kAbiVersion` in cpp_engine/cgol_engine.cpp. Entry points other than the legacy
+# `runFromWord` are only bound when the loaded library reports this version.
+CPP_ABI_VERSION = 7
+# library versions whose `runFromWord` took extra arguments, their legacy entry point cannot be called
+EXTENDED_RUN_FROM_WORD_ABI_VERSIONS = range(3, 7)
+# Index matches the stop reason codes written by the C++ `runBatch` entry point.
+STOP_REASONS = ("extinction", "persistent_state", "repeated_pattern", "reached_max_generation")
+# Below this grid area the NumPy backend always steps the whole grid, tracking the active region
+# costs more than the stencil it would save.
+ACTIVE_REGION_MIN_CELLS = 10_000
 
 
 class GameOfLifeEngine:
 
     def __init__(
-        self, max_generations: int = 1000, repeat_threshold: int = 10, grid_rows: int = 60, grid_cols: int = 40
+        self,
+        max_generations: int = 1000,
+        repeat_threshold: int = 10,
+        grid_rows: int = 60,
+        grid_cols: int = 40,
+        backend: str | None = None,
+        legacy_hashing: bool = False,
+        num_threads: int | None = None,
+        rule: str = DEFAULT_RULE,
+        trajectory_store: TrajectoryStore | None = None,
     ):
         self.grid_rows: int = grid_rows
         self.grid_cols: int = grid_cols
@@ -22,15 +48,31 @@ class GameOfLifeEngine:
 
         self.max_generations = max_generations
         self.repeat_threshold = repeat_threshold
-
+        self.legacy_hashing = legacy_hashing
+        self.rule = parse_rule(rule)
+        # outcomes of already solved states, used by the "python" and "numpy" backends
+        self.trajectory_store = trajectory_store
+        # threads of the packed C++ kernel, grids below its band size threshold stay single threaded
+        self.num_threads = num_threads if num_threads is not None else os.cpu_count() or 1
+
+        self.cpp_abi_version: int = 0
         self.cpp_lib = self._setup_cpp_lib()
+        # board and scratch buffers the C++ kernels step in place, reused between runs
+        self.cpp_grid: np.ndarray | None = None
+        self.cpp_scratch: np.ndarray | None = None
+        self.backend = self._resolve_backend(backend)
 
     def _setup_cpp_lib(self):
         lib_name = self.get_cpp_lib_name()
         lib_path = Path(__file__).parent / "cpp_engine" / lib_name
-        cpp_lib = ctypes.cdll.LoadLibrary(lib_path)
-
-        cpp_lib.runFromWord.argtypes = [
+        if not lib_path.is_file():
+            return None
+        try:
+            cpp_lib = ctypes.cdll.LoadLibrary(lib_path)
+        except OSError:
+            return None
+
+        run_from_word_argtypes = [
             np.ctypeslib.ndpointer(dtype=np.uint8, ndim=1, flags="C_CONTIGUOUS"),
             ctypes.c_int,
             ctypes.c_int,
@@ -41,10 +83,219 @@ class GameOfLifeEngine:
             ctypes.c_char_p,
             ctypes.c_int,
         ]
+        cpp_lib.runFromWord.argtypes = run_from_word_argtypes
         cpp_lib.runFromWord.restype = ctypes.c_int
 
+        if hasattr(cpp_lib, "getAbiVersion"):
+            cpp_lib.getAbiVersion.argtypes = []
+            cpp_lib.getAbiVersion.restype = ctypes.c_int
+            self.cpp_abi_version = cpp_lib.getAbiVersion()
+        if self.cpp_abi_version != CPP_ABI_VERSION:
+            return cpp_lib
+
+        # legacy hashing flag, birth and survival masks
+        rule_argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        cpp_lib.runFromWordRule.argtypes = run_from_word_argtypes + rule_argtypes
+        cpp_lib.runFromWordRule.restype = ctypes.c_int
+        cpp_lib.runFromWordPacked.argtypes = run_from_word_argtypes + rule_argtypes + [ctypes.c_int]
+        cpp_lib.runFromWordPacked.restype = ctypes.c_int
+
+        cpp_lib.runBatch.argtypes = [
+            np.ctypeslib.ndpointer(dtype=np.uint8, ndim=3, flags="C_CONTIGUOUS"),
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_int,
+            np.ctypeslib.ndpointer(dtype=np.int32, ndim=1, flags="C_CONTIGUOUS"),
+            np.ctypeslib.ndpointer(dtype=np.int32, ndim=1, flags="C_CONTIGUOUS"),
+            np.ctypeslib.ndpointer(dtype=np.int32, ndim=1, flags="C_CONTIGUOUS"),
+            *rule_argtypes,
+        ]
+        cpp_lib.runBatch.restype = ctypes.c_int
+
+        grid_argtype = np.ctypeslib.ndpointer(dtype=np.uint8, ndim=1, flags="C_CONTIGUOUS")
+        cpp_lib.runFromWordInto.argtypes = [
+            grid_argtype,
+            grid_argtype,
+            *[ctypes.c_int] * 9,
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+            ctypes.POINTER(ctypes.c_int),
+            # optional population and births history, NULL when not requested
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+        ]
+        cpp_lib.runFromWordInto.restype = ctypes.c_int
+
         return cpp_lib
 
+    def available_backends(self) -> list[str]:
+        available = ["python", "numpy"]
+        # a library with an older ABI only runs Conway's rule, through its legacy `runFromWord`
+        legacy_cpp = self.rule.is_conway and self.cpp_abi_version not in EXTENDED_RUN_FROM_WORD_ABI_VERSIONS
+        if self.cpp_lib is not None and (self.cpp_abi_version == CPP_ABI_VERSION or legacy_cpp):
+            available.append("cpp")
+        if self.cpp_abi_version == CPP_ABI_VERSION:
+            available.append("cpp_packed")
+        return available
+
+    def _resolve_backend(self, backend: str | None) -> str:
+        available = self.available_backends()
+        if backend is None:
+            for preferred in ("cpp_packed", "cpp"):
+                if preferred in available:
+                    return preferred
+            return "numpy"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown engine backend '{backend}'. Expected one of {BACKENDS}")
+        if backend not in available:
+            raise RuntimeError(
+                f"Engine backend '{backend}' is not supported by the C++ library '{self.get_cpp_lib_name()}'"
+            )
+        return backend
+
+    def run(self, word: str) -> GameResponse:
+        runners = {
+            "python": self.run_from_word,
+            "numpy": self.run_from_word_numpy,
+            "cpp": self.run_from_word_cpp,
+            "cpp_packed": self.run_from_word_cpp_packed,
+        }
+        return runners[self.backend](word)
+
+    def run_with_history(self, word: str) -> tuple[GameResponse, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Runs `word` and also returns the final board and the population and births of every generation
+        (index 0 is the seed). The C++ backends write them directly into the returned arrays, the
+        other backends step the board with `trace_from_word`.
+        """
+        if self.backend in ("cpp", "cpp_packed") and self.cpp_abi_version == CPP_ABI_VERSION:
+            return self._run_cpp_into(word, packed=self.backend == "cpp_packed", history=True)
+
+        population, births = [], []
+        steps = self.trace_from_word(word)
+        try:
+            while True:
+                _, generation_population, generation_births = next(steps)
+                population.append(generation_population)
+                births.append(generation_births)
+        except StopIteration as stop:
+            response = stop.value
+        return (
+            response,
+            np.array(self.grid, dtype=np.uint8),
+            np.array(population, dtype=np.int32),
+            np.array(births, dtype=np.int32),
+        )
+
+    def run_batch(self, words: list[str]) -> list[GameResponse]:
+        if not words:
+            return []
+        if self.backend in ("cpp", "cpp_packed") and self.cpp_abi_version == CPP_ABI_VERSION:
+            return self.run_batch_cpp(words)
+        # the stacked numpy path steps all boards in lockstep and cannot use the trajectory store
+        if self.backend == "python" or self.trajectory_store is not None:
+            return [self.run(word) for word in words]
+        return self.run_batch_numpy(words)
+
+    def seed_batch(self, words: list[str]) -> np.ndarray:
+        stack = np.zeros((len(words), self.grid_rows, self.grid_cols), dtype=np.uint8)
+        for board, word in zip(stack, words):
+            self.grid = board
+            bitmask = self.word_to_bitmask(word)
+            bitmask = self.bitmask_reshape(bitmask)
+            self.inject_bitmask_seed(bitmask=bitmask)
+        return stack
+
+    def run_batch_cpp(self, words: list[str]) -> list[GameResponse]:
+        stack = self.seed_batch(words)
+        out_generations = np.zeros(len(words), dtype=np.int32)
+        out_scores = np.zeros(len(words), dtype=np.int32)
+        out_reasons = np.zeros(len(words), dtype=np.int32)
+
+        self.cpp_lib.runBatch(
+            stack,
+            len(words),
+            self.grid_rows,
+            self.grid_cols,
+            self.max_generations,
+            self.repeat_threshold,
+            out_generations,
+            out_scores,
+            out_reasons,
+            int(self.legacy_hashing),
+            self.rule.birth_mask,
+            self.rule.survival_mask,
+        )
+
+        return [
+            GameResponse(num_generations=generations, score=score, stop_reason=STOP_REASONS[reason])
+            for generations, score, reason in zip(out_generations.tolist(), out_scores.tolist(), out_reasons.tolist())
+        ]
+
+    def run_batch_numpy(self, words: list[str]) -> list[GameResponse]:
+        num_boards = len(words)
+        padded = np.zeros((num_boards, self.grid_rows + 2, self.grid_cols + 2), dtype=np.uint8)
+        padded[:, 1:-1, 1:-1] = self.seed_batch(words)
+
+        responses: list[GameResponse | None] = [None] * num_boards
+        scores = np.zeros(num_boards, dtype=np.int64)
+        cycle_detectors = [self.new_cycle_detector() for _ in range(num_boards)]
+        for cycle_detector, board in zip(cycle_detectors, padded):
+            cycle_detector.reset(board[1:-1, 1:-1])
+        active = np.arange(num_boards)
+
+        for generation_num in range(1, self.max_generations + 1):
+            grids = padded[:, 1:-1, 1:-1]
+            # 9 * alive + live neighbours, the index into the rule's transition table
+            neighbours = grids * np.uint8(9)
+            for row_delta in (0, 1, 2):
+                for col_delta in (0, 1, 2):
+                    if row_delta == col_delta == 1:
+                        continue
+                    neighbours += padded[
+                        :, row_delta : row_delta + self.grid_rows, col_delta : col_delta + self.grid_cols
+                    ]
+
+            new_grids = self.rule.table.take(neighbours)
+            changed = new_grids != grids
+            scores[active] += np.count_nonzero(changed & (new_grids == 1), axis=(1, 2))
+            equal_flags = ~changed.any(axis=(1, 2))
+            extinct_flags = ~new_grids.any(axis=(1, 2))
+            padded[:, 1:-1, 1:-1] = new_grids
+
+            running = np.ones(len(active), dtype=bool)
+            for local_idx, board_idx in enumerate(active.tolist()):
+                stop_reason = None
+                if extinct_flags[local_idx]:
+                    stop_reason = "extinction"
+                elif equal_flags[local_idx]:
+                    stop_reason = "persistent_state"
+                elif cycle_detectors[board_idx].is_repeated(generation_num, new_grids[local_idx], changed[local_idx]):
+                    stop_reason = "repeated_pattern"
+
+                if stop_reason is not None:
+                    responses[board_idx] = GameResponse(
+                        num_generations=generation_num, score=int(scores[board_idx]), stop_reason=stop_reason
+                    )
+                    cycle_detectors[board_idx] = None
+                    running[local_idx] = False
+
+            if not running.all():
+                active = active[running]
+                padded = padded[running]
+            if len(active) == 0:
+                break
+
+        for board_idx in active.tolist():
+            responses[board_idx] = GameResponse(
+                num_generations=self.max_generations,
+                score=int(scores[board_idx]),
+                stop_reason="reached_max_generation",
+            )
+        return responses
+
     def bitmask_reshape(self, bitmask: np.ndarray) -> np.ndarray:
         max_len = self.grid_rows * self.grid_cols
         if len(bitmask) >= max_len:
@@ -68,11 +319,10 @@ class GameOfLifeEngine:
             cell = self.grid[row_idx, col_idx]
             num_neighbours = self.count_cell_neighbours(row_idx, col_idx)
 
-            if cell == 1 and num_neighbours in {2, 3}:
-                new_grid[row_idx, col_idx] = 1
-            elif cell == 0 and num_neighbours == 3:
+            if self.rule.next_state(int(cell), int(num_neighbours)):
                 new_grid[row_idx, col_idx] = 1
-                populated += 1
+                if cell == 0:
+                    populated += 1
 
         equal_flag: bool = np.array_equal(new_grid, self.grid)
         self.grid = new_grid
@@ -97,40 +347,51 @@ class GameOfLifeEngine:
         self.inject_bitmask_seed(bitmask=bitmask)
 
         total_score: int = 0
-        seen_hashmap = {}
-        seen_hashmap[self.hash_array(self.grid)] = 0
+        cycle_detector = self.new_cycle_detector()
+        cycle_detector.reset(self.grid)
+        recorder = self.new_trajectory_recorder()
+        memo_response = recorder.check(self.grid, 0, total_score)
+        if memo_response is not None:
+            return memo_response
 
         for generation_num in range(self.max_generations):
+            previous_grid = self.grid
             populated, equal_flag = self.run_step()
             total_score += populated
-            grid_hash = self.hash_array(self.grid)
 
             if not np.any(self.grid):
-                return GameResponse(
-                    num_generations=generation_num + 1,
-                    score=total_score,
-                    stop_reason="extinction",
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num + 1,
+                        score=total_score,
+                        stop_reason="extinction",
+                    ),
+                    self.grid,
                 )
 
             if equal_flag:
-                return GameResponse(
-                    num_generations=generation_num + 1,
-                    score=total_score,
-                    stop_reason="persistent_state",
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num + 1,
+                        score=total_score,
+                        stop_reason="persistent_state",
+                    ),
+                    self.grid,
                 )
 
-            if not grid_hash in seen_hashmap:
-                seen_hashmap[grid_hash] = generation_num
-                continue
-
-            generation_period = generation_num - seen_hashmap[grid_hash]
-            if generation_period < 10:
-                return GameResponse(
-                    num_generations=generation_num + 1,
-                    score=total_score,
-                    stop_reason="repeated_pattern",
+            if cycle_detector.is_repeated(generation_num + 1, self.grid, self.grid != previous_grid):
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num + 1,
+                        score=total_score,
+                        stop_reason="repeated_pattern",
+                    ),
+                    self.grid,
                 )
-            seen_hashmap[grid_hash] = generation_num
+
+            memo_response = recorder.check(self.grid, generation_num + 1, total_score)
+            if memo_response is not None:
+                return memo_response
 
         return GameResponse(
             num_generations=generation_num + 1,
@@ -138,19 +399,244 @@ class GameOfLifeEngine:
             stop_reason="reached_max_generation",
         )
 
+    def run_step_numpy(self, padded: np.ndarray, changed: np.ndarray, region: Tuple[int, int, int, int]):
+        # `padded` holds the current grid surrounded by a permanently dead border, so the
+        # eight shifted slices below cover every neighbour without per-cell bounds checks.
+        # Only `region` (row_start, row_stop, col_start, col_stop) is recomputed: cells outside of it
+        # had no changed neighbour in the previous generation and keep their state.
+        row_start, row_stop, col_start, col_stop = region
+        grid = self.grid[row_start:row_stop, col_start:col_stop]
+        # 9 * alive + live neighbours, the index into the rule's transition table
+        neighbours = grid * np.uint8(9)
+        for row_delta in (0, 1, 2):
+            for col_delta in (0, 1, 2):
+                if row_delta == col_delta == 1:
+                    continue
+                neighbours += padded[
+                    row_start + row_delta : row_stop + row_delta, col_start + col_delta : col_stop + col_delta
+                ]
+
+        new_grid = self.rule.table.take(neighbours)
+        region_changed = new_grid != grid
+        populated = int(np.count_nonzero(region_changed & new_grid))
+        num_changed = int(np.count_nonzero(region_changed))
+
+        grid[...] = new_grid
+        changed.fill(False)
+        changed[row_start:row_stop, col_start:col_stop] = region_changed
+        return populated, num_changed, self.next_active_region(region, region_changed)
+
+    def next_active_region(
+        self, region: Tuple[int, int, int, int], region_changed: np.ndarray
+    ) -> Tuple[int, int, int, int] | None:
+        if self.grid_rows * self.grid_cols < ACTIVE_REGION_MIN_CELLS:
+            return region if region_changed.any() else None
+
+        changed_rows = np.flatnonzero(region_changed.any(axis=1))
+        if len(changed_rows) == 0:
+            return None
+        changed_cols = np.flatnonzero(region_changed.any(axis=0))
+        row_start, _, col_start, _ = region
+        return (
+            max(row_start + changed_rows[0] - 1, 0),
+            min(row_start + changed_rows[-1] + 2, self.grid_rows),
+            max(col_start + changed_cols[0] - 1, 0),
+            min(col_start + changed_cols[-1] + 2, self.grid_cols),
+        )
+
+    def run_from_word_numpy(self, word: str):
+        padded = np.zeros((self.grid_rows + 2, self.grid_cols + 2), dtype=np.uint8)
+        changed = np.zeros((self.grid_rows, self.grid_cols), dtype=bool)
+        self.grid = padded[1:-1, 1:-1]
+        bitmask = self.word_to_bitmask(word)
+        bitmask = self.bitmask_reshape(bitmask)
+        self.inject_bitmask_seed(bitmask=bitmask)
+
+        total_score: int = 0
+        population = int(np.count_nonzero(self.grid))
+        region = (0, self.grid_rows, 0, self.grid_cols)
+        cycle_detector = self.new_cycle_detector()
+        cycle_detector.reset(self.grid)
+        recorder = self.new_trajectory_recorder()
+        memo_response = recorder.check(self.grid, 0, total_score)
+        if memo_response is not None:
+            return memo_response
+
+        for generation_num in range(1, self.max_generations + 1):
+            populated, num_changed, region = self.run_step_numpy(padded, changed, region)
+            total_score += populated
+            population += 2 * populated - num_changed
+
+            if population == 0:
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num,
+                        score=total_score,
+                        stop_reason="extinction",
+                    ),
+                    self.grid,
+                )
+
+            if region is None:
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num,
+                        score=total_score,
+                        stop_reason="persistent_state",
+                    ),
+                    self.grid,
+                )
+
+            if cycle_detector.is_repeated(generation_num, self.grid, changed):
+                return recorder.finish(
+                    GameResponse(
+                        num_generations=generation_num,
+                        score=total_score,
+                        stop_reason="repeated_pattern",
+                    ),
+                    self.grid,
+                )
+
+            memo_response = recorder.check(self.grid, generation_num, total_score)
+            if memo_response is not None:
+                return memo_response
+
+        return GameResponse(
+            num_generations=self.max_generations,
+            score=total_score,
+            stop_reason="reached_max_generation",
+        )
+
+    def trace_from_word(self, word: str) -> Generator[tuple[int, int, int], None, GameResponse]:
+        """
+        Steps `word` like `run_from_word_numpy` without the trajectory store, yielding
+        `(generation, population, births)` for the seed and every generation. Returns the GameResponse.
+        """
+        padded = np.zeros((self.grid_rows + 2, self.grid_cols + 2), dtype=np.uint8)
+        changed = np.zeros((self.grid_rows, self.grid_cols), dtype=bool)
+        self.grid = padded[1:-1, 1:-1]
+        bitmask = self.word_to_bitmask(word)
+        bitmask = self.bitmask_reshape(bitmask)
+        self.inject_bitmask_seed(bitmask=bitmask)
+
+        total_score: int = 0
+        population = int(np.count_nonzero(self.grid))
+        region = (0, self.grid_rows, 0, self.grid_cols)
+        cycle_detector = self.new_cycle_detector()
+        cycle_detector.reset(self.grid)
+        yield 0, population, 0
+
+        for generation_num in range(1, self.max_generations + 1):
+            populated, num_changed, region = self.run_step_numpy(padded, changed, region)
+            total_score += populated
+            population += 2 * populated - num_changed
+            yield generation_num, population, populated
+
+            stop_reason = None
+            if population == 0:
+                stop_reason = "extinction"
+            elif region is None:
+                stop_reason = "persistent_state"
+            elif cycle_detector.is_repeated(generation_num, self.grid, changed):
+                stop_reason = "repeated_pattern"
+            if stop_reason is not None:
+                return GameResponse(num_generations=generation_num, score=total_score, stop_reason=stop_reason)
+
+        return GameResponse(
+            num_generations=self.max_generations,
+            score=total_score,
+            stop_reason="reached_max_generation",
+        )
+
+    def new_trajectory_recorder(self) -> TrajectoryRecorder:
+        config = f"{self.rule.rulestring};{self.repeat_threshold};{self.grid_rows}x{self.grid_cols}"
+        return TrajectoryRecorder(self.trajectory_store, config, self.max_generations, self.repeat_threshold)
+
+    def new_cycle_detector(self) -> CycleDetector:
+        return CycleDetector(self.grid_rows, self.grid_cols, self.repeat_threshold, self.legacy_hashing)
+
     def run_from_word_cpp(self, word: str):
+        if "cpp" not in self.available_backends():
+            raise RuntimeError(
+                f"C++ engine library '{self.get_cpp_lib_name()}' is not available for rule '{self.rule.rulestring}'"
+            )
+        if self.cpp_abi_version == CPP_ABI_VERSION:
+            return self._run_cpp_into(word, packed=False)[0]
+        return self._run_cpp_legacy(word)
+
+    def run_from_word_cpp_packed(self, word: str):
+        if "cpp_packed" not in self.available_backends():
+            raise RuntimeError(f"C++ engine library '{self.get_cpp_lib_name()}' has no packed kernel")
+        return self._run_cpp_into(word, packed=True)[0]
+
+    def _run_cpp_into(
+        self, word: str, packed: bool, history: bool = False
+    ) -> tuple[GameResponse, np.ndarray | None, np.ndarray | None, np.ndarray | None]:
+        # the kernel steps in place between the board and the scratch buffer, with `history` the board
+        # is returned to the caller and a fresh one is seeded
+        if self.cpp_grid is None or history:
+            self.cpp_grid = np.zeros((self.grid_rows, self.grid_cols), dtype=np.uint8)
+        else:
+            self.cpp_grid.fill(0)
+        if self.cpp_scratch is None:
+            self.cpp_scratch = np.empty(self.grid_rows * self.grid_cols, dtype=np.uint8)
+        self.grid = self.cpp_grid
+        bitmask = self.word_to_bitmask(word)
+        bitmask = self.bitmask_reshape(bitmask)
+        self.inject_bitmask_seed(bitmask=bitmask)
+
+        population = births = None
+        if history:
+            population = np.zeros(self.max_generations + 1, dtype=np.int32)
+            births = np.zeros(self.max_generations + 1, dtype=np.int32)
+        out_generations = ctypes.c_int()
+        out_score = ctypes.c_int()
+        out_reason = ctypes.c_int()
+
+        self.cpp_lib.runFromWordInto(
+            self.cpp_grid.reshape(-1),
+            self.cpp_scratch,
+            self.grid_rows,
+            self.grid_cols,
+            self.max_generations,
+            self.repeat_threshold,
+            int(self.legacy_hashing),
+            self.rule.birth_mask,
+            self.rule.survival_mask,
+            int(packed),
+            self.num_threads,
+            out_generations,
+            out_score,
+            out_reason,
+            population.ctypes.data if history else None,
+            births.ctypes.data if history else None,
+        )
+
+        response = GameResponse(
+            num_generations=out_generations.value,
+            score=out_score.value,
+            stop_reason=STOP_REASONS[out_reason.value],
+        )
+        if not history:
+            return response, None, None, None
+        num_entries = response.num_generations + 1
+        return response, self.cpp_grid, population[:num_entries], births[:num_entries]
+
+    def _run_cpp_legacy(self, word: str):
+        # `runFromWord` of a library built with another ABI version, Conway's rule only
         self.grid = np.zeros((self.grid_rows, self.grid_cols), dtype=np.uint8)
         bitmask = self.word_to_bitmask(word)
         bitmask = self.bitmask_reshape(bitmask)
         self.inject_bitmask_seed(bitmask=bitmask)
 
-        flat_grid = np.ascontiguousarray(self.grid).reshape(-1)
+        # a fresh C contiguous uint8 board, flattened without a copy
+        flat_grid = self.grid.reshape(-1)
 
         out_generations = ctypes.c_int()
         out_score = ctypes.c_int()
         reason_buffer = ctypes.create_string_buffer(128)
 
-        self.cpp_lib.runFromWord(
+        cpp_args = [
             flat_grid,
             self.grid_rows,
             self.grid_cols,
@@ -160,7 +646,8 @@ class GameOfLifeEngine:
             out_score,
             reason_buffer,
             ctypes.sizeof(reason_buffer),
-        )
+        ]
+        self.cpp_lib.runFromWord(*cpp_args)
 
         return GameResponse(
             num_generations=out_generations.value,
@@ -170,10 +657,12 @@ class GameOfLifeEngine:
 
     @staticmethod
     def word_to_bitmask(word: str) -> np.ndarray:
-        byte_arr = []
-        for char in word:
-            byte_arr.append(format(ord(char), "08b"))
-        return np.array([int(byte) for byte_str in byte_arr for byte in byte_str])
+        try:
+            byte_arr = np.frombuffer(word.encode("latin-1"), dtype=np.uint8)
+        except UnicodeEncodeError:
+            bit_str = "".join(format(ord(char), "08b") for char in word)
+            return np.array([int(bit) for bit in bit_str], dtype=np.uint8)
+        return np.unpackbits(byte_arr)
 
     @staticmethod
     def find_optimal_shape(array: np.ndarray, target_shape: np.shape) -> Tuple[int, int]:
@@ -183,10 +672,6 @@ class GameOfLifeEngine:
         optimal_shape = min(factors, key=lambda pair: abs(pair[0] - pair[1]))
         return optimal_shape
 
-    @staticmethod
-    def hash_array(array: np.ndarray) -> str:
-        return md5(array.tobytes()).hexdigest()
-
     @staticmethod
     def get_cpp_lib_name():
         if sys.platform.startswith("win"):
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .cgol_engine import GameOfLifeEngine
+from .data_model import GameResponse
+from .db.db_service import DEFAULT_DB_URL, SQLiteService
+from .executor import run_engine_batch
+from .rules import DEFAULT_RULE, parse_rule
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NLTK_DATA = "./chatbot_interface/nltk_data"
+
+
+def load_corpus_words() -> list[str]:
+    import nltk
+    from nltk.corpus import words
+
+    nltk.data.path.append(str(Path(os.environ.get("NLTK_DATA", DEFAULT_NLTK_DATA)).absolute()))
+    try:
+        nltk.find("corpora/words")
+    except LookupError:
+        if not nltk.download("words", download_dir=os.environ.get("NLTK_DATA", DEFAULT_NLTK_DATA)):
+            raise LookupError("Unable to download NLTK words corpora.")
+    return words.words()
+
+
+def load_words(words_file: str | None) -> list[str]:
+    """
+    Words of `words_file` (one per line) or of the NLTK words corpus, deduplicated in order and
+    restricted to the words the API accepts.
+    """
+    if words_file is not None:
+        raw_words = Path(words_file).read_text(encoding="utf-8").splitlines()
+    else:
+        raw_words = load_corpus_words()
+    return [word for word in dict.fromkeys(word.strip() for word in raw_words) if word and word.isascii()]
+
+
+class Checkpoint:
+    """
+    Number of words of a word list already stored, saved atomically next to the database after every
+    committed transaction. Bound to the word list, rule and engine settings by a fingerprint, a
+    checkpoint of another run is ignored.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+
+    @staticmethod
+    def fingerprint_of(words: list[str], rule: str, engine_settings: tuple) -> str:
+        digest = hashlib.sha256(f"{rule};{engine_settings}".encode())
+        for word in words:
+            digest.update(word.encode() + b"\n")
+        return digest.hexdigest()
+
+    def load(self) -> int:
+        if not self.path.is_file():
+            return 0
+        state = json.loads(self.path.read_text())
+        if state.get("fingerprint") != self.fingerprint:
+            logger.warning("Ignoring checkpoint %s of a different word list or configuration", self.path)
+            return 0
+        return state["words_done"]
+
+    def save(self, words_done: int) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"fingerprint": self.fingerprint, "words_done": words_done}))
+        os.replace(tmp_path, self.path)
+
+
+class Throughput:
+    def __init__(self, total: int, done: int, report_every: float):
+        self.total = total
+        self.done = done
+        self.report_every = report_every
+        self.started_at = self.reported_at = time.perf_counter()
+        self.start_done = self.reported_done = done
+
+    def update(self, done: int, force: bool = False) -> None:
+        self.done = done
+        now = time.perf_counter()
+        if not force and now - self.reported_at < self.report_every:
+            return
+        recent_rate = (done - self.reported_done) / max(now - self.reported_at, 1e-9)
+        overall_rate = (done - self.start_done) / max(now - self.started_at, 1e-9)
+        eta = (self.total - done) / overall_rate if overall_rate > 0 else float("inf")
+        logger.info(
+            "%d / %d words (%.1f%%), %.0f words/s (%.0f words/s overall), ETA %.0f s",
+            done,
+            self.total,
+            100 * done / max(self.total, 1),
+            recent_rate,
+            overall_rate,
+            eta,
+        )
+        self.reported_at = now
+        self.reported_done = done
+
+
+def score_words(
+    words: list[str],
+    db_service: SQLiteService,
+    checkpoint: Checkpoint,
+    rule: str = DEFAULT_RULE,
+    backend: str | None = None,
+    workers: int | None = None,
+    chunk_size: int = 256,
+    commit_every: int = 20_000,
+    skip_existing: bool = True,
+    report_every: float = 5.0,
+) -> int:
+    """
+    Scores `words` on a process pool and stores the results in `commit_every` sized transactions,
+    resuming after the last checkpointed word. Words already stored are skipped, or rescored and
+    overwritten without `skip_existing`. Returns the number of words done.
+    """
+    workers = workers or os.cpu_count() or 1
+    # the processes already use every core, the packed kernel stays single threaded
+    engine_options = {"backend": backend, "num_threads": 1}
+
+    words_done = checkpoint.load()
+    if words_done:
+        logger.info("Resuming after %d of %d words", words_done, len(words))
+    stored = db_service.get_words(rule) if skip_existing else set()
+    throughput = Throughput(len(words), words_done, report_every)
+
+    pending_rows: dict[str, GameResponse] = {}
+    # words done once the pending rows are committed
+    pending_done = words_done
+
+    def commit() -> None:
+        nonlocal words_done
+        # words rescored with `skip_existing` off replace the stored results
+        if not db_service.insert_responses(pending_rows, rule=rule, overwrite=not skip_existing):
+            raise RuntimeError(f"Storing results failed, resume from the checkpoint at {words_done} words")
+        pending_rows.clear()
+        words_done = pending_done
+        checkpoint.save(words_done)
+
+    def collect(in_flight: deque) -> None:
+        nonlocal pending_done
+        chunk_end, todo, future = in_flight.popleft()
+        _, responses = future.result()
+        pending_rows.update(zip(todo, responses))
+        pending_done = chunk_end
+        if len(pending_rows) >= commit_every:
+            commit()
+        throughput.update(pending_done)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        try:
+            for start in range(words_done, len(words), chunk_size):
+                chunk = words[start : start + chunk_size]
+                todo = [word for word in chunk if word not in stored]
+                in_flight.append((start + len(chunk), todo, pool.submit(run_engine_batch, todo, rule, engine_options)))
+                # results are stored in word list order, so the checkpoint is a plain word count
+                while len(in_flight) > 2 * workers or (in_flight and in_flight[0][2].done()):
+                    collect(in_flight)
+            while in_flight:
+                collect(in_flight)
+            commit()
+        except KeyboardInterrupt:
+            # keeps the results computed so far
+            for _, _, future in in_flight:
+                future.cancel()
+            commit()
+            logger.info("Interrupted after %d words, rerun with the same arguments to resume", words_done)
+            raise
+
+    throughput.update(words_done, force=True)
+    return words_done
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute game results for a word list into the service database")
+    parser.add_argument("--words-file", help="file with one word per line, the NLTK words corpus by default")
+    parser.add_argument("--db", default=os.environ.get("ENGINE_DB_URL", DEFAULT_DB_URL), help="SQLite database path")
+    parser.add_argument("--rule", default=DEFAULT_RULE, help="Life-like rule in B/S notation")
+    parser.add_argument("--backend", default=os.environ.get("ENGINE_BACKEND") or None, help="engine backend")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--chunk-size", type=int, default=256, help="words per worker task")
+    parser.add_argument("--commit-every", type=int, default=20_000, help="results per transaction")
+    parser.add_argument("--checkpoint", help="checkpoint file, next to the database by default")
+    parser.add_argument(
+        "--no-skip-existing", action="store_true", help="rescore words already stored and replace their results"
+    )
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between throughput reports")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    rule = parse_rule(args.rule).rulestring
+    words = load_words(args.words_file)
+    probe = GameOfLifeEngine(backend=args.backend, rule=rule)
+    engine_settings = (probe.max_generations, probe.repeat_threshold, probe.grid_rows, probe.grid_cols)
+    checkpoint = Checkpoint(
+        args.checkpoint or args.db + ".corpus-checkpoint.json",
+        Checkpoint.fingerprint_of(words, rule, engine_settings),
+    )
+    logger.info("Scoring %d words with rule %s on the %s backend", len(words), rule, probe.backend)
+
+    db_service = SQLiteService(args.db)
+    try:
+        score_words(
+            words,
+            db_service,
+            checkpoint,
+            rule=rule,
+            backend=args.backend,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            commit_every=args.commit_every,
+            skip_existing=not args.no_skip_existing,
+            report_every=args.report_every,
+        )
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+    finally:
+        db_service.dispose()
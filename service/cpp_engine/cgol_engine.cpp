@@ -1,147 +1,875 @@
 #include <stdint.h>
 
 #include <algorithm>
+#include <array>
+#include <condition_variable>
 #include <cstring>
+#include <functional>
+#include <memory>
+#include <mutex>
 #include <set>
 #include <sstream>
 #include <string>
+#include <thread>
 #include <unordered_map>
 #include <vector>
 
+#include "cycle_detector.h"
 #include "picosha2.h"
 
+#if defined(_MSC_VER)
+#include <intrin.h>
+#endif
+
 #ifdef _WIN32
 #define DLL_EXPORT __declspec(dllexport)
 #else
 #define DLL_EXPORT
 #endif
 
+// Bumped whenever an exported signature changes, so the python side can tell a stale prebuilt
+// library apart from one built from this source. The legacy `runFromWord` keeps its original
+// 9 argument signature, except in versions 3 to 6 which extended it in place (since version 7
+// the options are taken by `runFromWordRule`).
+const int kAbiVersion = 7;
+
+// Minimum number of words (64x1 cell tiles) a band has to hold before a generation is split across
+// threads, below that waking the workers costs more than the band saves.
+const int kMinWordsPerBand = 2048;
+
+// Life-like rule as masks over the number of live neighbours: bit `n` of `birthMask` is set when a
+// dead cell with `n` live neighbours is born, bit `n` of `survivalMask` when a live one survives.
+struct LifeRule
+{
+    int birthMask;
+    int survivalMask;
+    bool isConway;
+
+    LifeRule(const int &birthMask, const int &survivalMask)
+        : birthMask(birthMask),
+          survivalMask(survivalMask),
+          isConway(birthMask == (1 << 3) && survivalMask == ((1 << 2) | (1 << 3)))
+    {
+    }
+
+    // Next cell state indexed by `9 * alive + numNeighbours`.
+    std::array<uint8_t, 18> transitionTable() const
+    {
+        std::array<uint8_t, 18> table;
+        for (int numNeighbours = 0; numNeighbours <= 8; numNeighbours++)
+        {
+            table[numNeighbours] = (birthMask >> numNeighbours) & 1;
+            table[9 + numNeighbours] = (survivalMask >> numNeighbours) & 1;
+        }
+        return table;
+    }
+};
+
 const int convertToFlatIndex(const int &rowIdx, const int &colIdx, const int &gridCols)
 {
     return gridCols * rowIdx + colIdx;
 }
 
-const int countCellNeighbours(const std::vector<uint8_t> &grid, const int &rowIdx,
-                              const int &colIdx, const int &gridRows, const int &gridCols)
+const int countCellNeighbours(const uint8_t *pGrid, const int &rowIdx, const int &colIdx,
+                              const int &gridRows, const int &gridCols)
 {
     int neigbourCount = 0;
-    std::vector<int> idxDelta = {-1, 0, 1};
-
-    for (int rowDelta : idxDelta)
+    for (int neigbourRowIdx = std::max(rowIdx - 1, 0);
+         neigbourRowIdx <= std::min(rowIdx + 1, gridRows - 1); neigbourRowIdx++)
     {
-        for (int colDelta : idxDelta)
+        for (int neigbourColIdx = std::max(colIdx - 1, 0);
+             neigbourColIdx <= std::min(colIdx + 1, gridCols - 1); neigbourColIdx++)
         {
-            if (rowDelta == 0 && colDelta == 0) continue;
-            int neigbourRowIdx = rowIdx + rowDelta;
-            int neigbourColIdx = colIdx + colDelta;
-
-            if (neigbourRowIdx >= 0 && neigbourRowIdx < gridRows && neigbourColIdx >= 0 &&
-                neigbourColIdx < gridCols)
-            {
-                int flatIdx = convertToFlatIndex(neigbourRowIdx, neigbourColIdx, gridCols);
-                neigbourCount += grid[flatIdx];
-            }
+            neigbourCount += pGrid[convertToFlatIndex(neigbourRowIdx, neigbourColIdx, gridCols)];
         }
     }
 
-    return neigbourCount;
+    return neigbourCount - pGrid[convertToFlatIndex(rowIdx, colIdx, gridCols)];
 }
 
-const std::string computeGridHash(const std::vector<uint8_t> &grid)
+uint64_t computeGridFingerprint(const uint8_t *pGrid, const size_t &gridSize)
 {
-    return picosha2::hash256_hex_string(grid);
+    uint64_t fingerprint = 0;
+    for (size_t flatIdx = 0; flatIdx < gridSize; flatIdx++)
+    {
+        if (pGrid[flatIdx]) fingerprint ^= cellKey(flatIdx);
+    }
+    return fingerprint;
 }
 
 struct StepResult
 {
     int populated;
     bool gridsEqual;
+    uint64_t fingerprintDelta;
+    int populationDelta;
+};
+
+enum StopReason
+{
+    kRunning = -1,
+    kExtinction = 0,
+    kPersistentState = 1,
+    kRepeatedPattern = 2,
+    kReachedMaxGeneration = 3,
 };
 
-StepResult runStep(std::vector<uint8_t> &grid, const int &gridRows, const int &gridCols)
+const char *stopReasonName(const StopReason &stopReason)
+{
+    switch (stopReason)
+    {
+        case kExtinction:
+            return "extinction";
+        case kPersistentState:
+            return "persistent_state";
+        case kRepeatedPattern:
+            return "repeated_pattern";
+        case kReachedMaxGeneration:
+            return "reached_max_generation";
+        default:
+            return "";
+    }
+}
+
+// Computes the next generation of `pGrid` into `pNewGrid`, both caller owned, nothing is allocated.
+StepResult runStep(const uint8_t *pGrid, uint8_t *pNewGrid, const int &gridRows,
+                   const int &gridCols, const std::array<uint8_t, 18> &transitionTable)
 {
-    int gridSize = gridRows * gridCols;
-    std::vector<uint8_t> newGrid(gridSize, 0);
     int populated = 0;
+    int numChanged = 0;
+    uint64_t fingerprintDelta = 0;
 
     for (int rowIdx = 0; rowIdx < gridRows; rowIdx++)
     {
         for (int colIdx = 0; colIdx < gridCols; colIdx++)
         {
             int flatIdx = convertToFlatIndex(rowIdx, colIdx, gridCols);
-            uint8_t cellValue = grid[flatIdx];
-            int numNeighbours = countCellNeighbours(grid, rowIdx, colIdx, gridRows, gridCols);
+            uint8_t cellValue = pGrid[flatIdx];
+            int numNeighbours = countCellNeighbours(pGrid, rowIdx, colIdx, gridRows, gridCols);
 
-            if (cellValue == 1 && (numNeighbours == 2 || numNeighbours == 3))
-            {
-                newGrid[flatIdx] = 1;
-            }
-            else if (cellValue == 0 && numNeighbours == 3)
+            uint8_t newValue = transitionTable[9 * cellValue + numNeighbours];
+            pNewGrid[flatIdx] = newValue;
+            if (newValue != cellValue)
             {
-                newGrid[flatIdx] = 1;
-                populated += 1;
+                populated += newValue;
+                numChanged++;
+                fingerprintDelta ^= cellKey(flatIdx);
             }
         }
     }
 
-    bool gridsEqual = (grid == newGrid);
-    grid = newGrid;
-    return {populated, gridsEqual};
+    return {populated, numChanged == 0, fingerprintDelta, 2 * populated - numChanged};
+}
+
+struct RunResult
+{
+    int generation;
+    int totalScore;
+    StopReason stopReason;
+};
+
+// Runs the naive kernel between the caller owned `pGrid` and `pScratch`, swapping the two pointers
+// every generation; the final board is left in `pGrid`. With `pOutPopulation` / `pOutBirths`
+// (`maxGenerations + 1` entries) the population and births of every generation are written to them.
+RunResult runCells(uint8_t *pGrid, uint8_t *pScratch, const int &gridRows, const int &gridCols,
+                   const int &maxGenerations, const int &repeatPatternThreshold,
+                   const bool &legacyHashing, const LifeRule &rule, int32_t *pOutPopulation,
+                   int32_t *pOutBirths)
+{
+    size_t gridSize = static_cast<size_t>(gridRows) * gridCols;
+    std::array<uint8_t, 18> transitionTable = rule.transitionTable();
+    CycleDetector cycleDetector(repeatPatternThreshold, gridSize, legacyHashing);
+
+    uint8_t *pCurrent = pGrid;
+    uint8_t *pNext = pScratch;
+    uint64_t fingerprint = computeGridFingerprint(pCurrent, gridSize);
+    int population = static_cast<int>(std::count(pCurrent, pCurrent + gridSize, 1));
+    cycleDetector.reset(pCurrent, fingerprint);
+    if (pOutPopulation != nullptr) pOutPopulation[0] = population;
+    if (pOutBirths != nullptr) pOutBirths[0] = 0;
+
+    RunResult result = {0, 0, kReachedMaxGeneration};
+    for (int genNum = 1; genNum <= maxGenerations; genNum++)
+    {
+        StepResult stepResult = runStep(pCurrent, pNext, gridRows, gridCols, transitionTable);
+        std::swap(pCurrent, pNext);
+
+        result.generation = genNum;
+        result.totalScore += stepResult.populated;
+        fingerprint ^= stepResult.fingerprintDelta;
+        population += stepResult.populationDelta;
+        if (pOutPopulation != nullptr) pOutPopulation[genNum] = population;
+        if (pOutBirths != nullptr) pOutBirths[genNum] = stepResult.populated;
+
+        if (population == 0)
+        {
+            result.stopReason = kExtinction;
+            break;
+        }
+        if (stepResult.gridsEqual)
+        {
+            result.stopReason = kPersistentState;
+            break;
+        }
+        if (cycleDetector.isRepeated(genNum, pCurrent, fingerprint))
+        {
+            result.stopReason = kRepeatedPattern;
+            break;
+        }
+    }
+
+    if (pCurrent != pGrid) std::memcpy(pGrid, pCurrent, gridSize);
+    return result;
+}
+
+extern "C" DLL_EXPORT int runFromWordRule(uint8_t *pInputGrid, int gridRows, int gridCols,
+                                          int maxGenerations, int repeatPatternThreshold,
+                                          int *pOutGenerations, int *pOutScore, char *pReason,
+                                          int reasonBuffSize, int legacyHashing, int birthMask,
+                                          int survivalMask)
+{
+    // unlike `runFromWordInto`, leaves the caller's grid untouched
+    size_t gridSize = static_cast<size_t>(gridRows) * gridCols;
+    std::vector<uint8_t> grid(pInputGrid, pInputGrid + gridSize);
+    std::vector<uint8_t> scratch(gridSize);
+    RunResult result = runCells(grid.data(), scratch.data(), gridRows, gridCols, maxGenerations,
+                                repeatPatternThreshold, legacyHashing != 0,
+                                LifeRule(birthMask, survivalMask), nullptr, nullptr);
+
+    *pOutGenerations = result.generation;
+    *pOutScore = result.totalScore;
+    strncpy(pReason, stopReasonName(result.stopReason), reasonBuffSize);
+    return 0;
 }
 
+// The original entry point: Conway's rule with the fingerprint cycle detection.
 extern "C" DLL_EXPORT int runFromWord(uint8_t *pInputGrid, int gridRows, int gridCols,
                                       int maxGenerations, int repeatPatternThreshold,
                                       int *pOutGenerations, int *pOutScore, char *pReason,
                                       int reasonBuffSize)
 {
-    int gridSize = gridRows * gridCols;
-    std::vector<uint8_t> grid(pInputGrid, pInputGrid + gridSize);
-    std::unordered_map<std::string, int> seenHashmap;
+    return runFromWordRule(pInputGrid, gridRows, gridCols, maxGenerations, repeatPatternThreshold,
+                           pOutGenerations, pOutScore, pReason, reasonBuffSize, 0, 1 << 3,
+                           (1 << 2) | (1 << 3));
+}
 
+inline int popcount64(uint64_t value)
+{
+#if defined(__GNUC__) || defined(__clang__)
+    return __builtin_popcountll(value);
+#else
+    value = value - ((value >> 1) & 0x5555555555555555ULL);
+    value = (value & 0x3333333333333333ULL) + ((value >> 2) & 0x3333333333333333ULL);
+    value = (value + (value >> 4)) & 0x0F0F0F0F0F0F0F0FULL;
+    return static_cast<int>((value * 0x0101010101010101ULL) >> 56);
+#endif
+}
+
+inline int countTrailingZeros64(uint64_t value)
+{
+#if defined(__GNUC__) || defined(__clang__)
+    return __builtin_ctzll(value);
+#else
+    unsigned long bitIdx;
+    _BitScanForward64(&bitIdx, value);
+    return static_cast<int>(bitIdx);
+#endif
+}
+
+// Grid stored as rows of 64-cell bitboards. Bit `b` of word `w` in a row holds column `64 * w + b`,
+// bits past the last column are kept at zero so word-wide compares and popcounts stay exact.
+struct PackedGrid
+{
+    int gridRows;
+    int gridCols;
+    int wordsPerRow;
+    uint64_t tailMask;
+    std::vector<uint64_t> words;
+
+    PackedGrid(const int &rows, const int &cols)
+        : gridRows(rows), gridCols(cols), wordsPerRow((cols + 63) / 64)
+    {
+        int tailBits = cols % 64;
+        tailMask = tailBits == 0 ? ~0ULL : (1ULL << tailBits) - 1;
+        words.assign(static_cast<size_t>(gridRows) * wordsPerRow, 0);
+    }
+
+    uint64_t *row(const int &rowIdx)
+    {
+        return words.data() + static_cast<size_t>(rowIdx) * wordsPerRow;
+    }
+    const uint64_t *row(const int &rowIdx) const
+    {
+        return words.data() + static_cast<size_t>(rowIdx) * wordsPerRow;
+    }
+
+    void loadFrom(const uint8_t *pGrid)
+    {
+        std::fill(words.begin(), words.end(), 0);
+        for (int rowIdx = 0; rowIdx < gridRows; rowIdx++)
+        {
+            uint64_t *pRow = row(rowIdx);
+            for (int colIdx = 0; colIdx < gridCols; colIdx++)
+            {
+                if (pGrid[convertToFlatIndex(rowIdx, colIdx, gridCols)])
+                {
+                    pRow[colIdx / 64] |= 1ULL << (colIdx % 64);
+                }
+            }
+        }
+    }
+
+    void storeTo(uint8_t *pGrid) const
+    {
+        for (int rowIdx = 0; rowIdx < gridRows; rowIdx++)
+        {
+            const uint64_t *pRow = row(rowIdx);
+            for (int colIdx = 0; colIdx < gridCols; colIdx++)
+            {
+                uint64_t cell = (pRow[colIdx / 64] >> (colIdx % 64)) & 1;
+                pGrid[convertToFlatIndex(rowIdx, colIdx, gridCols)] = static_cast<uint8_t>(cell);
+            }
+        }
+    }
+
+    int population() const
+    {
+        int numAlive = 0;
+        for (uint64_t word : words) numAlive += popcount64(word);
+        return numAlive;
+    }
+
+    const uint8_t *bytes() const { return reinterpret_cast<const uint8_t *>(words.data()); }
+    size_t numBytes() const { return words.size() * sizeof(uint64_t); }
+
+    uint64_t fingerprint() const
+    {
+        uint64_t gridFingerprint = 0;
+        for (int rowIdx = 0; rowIdx < gridRows; rowIdx++)
+        {
+            for (int wordIdx = 0; wordIdx < wordsPerRow; wordIdx++)
+            {
+                gridFingerprint ^= wordFingerprint(rowIdx, wordIdx, row(rowIdx)[wordIdx]);
+            }
+        }
+        return gridFingerprint;
+    }
+
+    // XOR of the cell keys of the set bits in `cells`, a word at (`rowIdx`, `wordIdx`)
+    uint64_t wordFingerprint(const int &rowIdx, const int &wordIdx, uint64_t cells) const
+    {
+        uint64_t cellsFingerprint = 0;
+        size_t firstCell =
+            static_cast<size_t>(rowIdx) * gridCols + static_cast<size_t>(wordIdx) * 64;
+        while (cells != 0)
+        {
+            cellsFingerprint ^= cellKey(firstCell + countTrailingZeros64(cells));
+            cells &= cells - 1;
+        }
+        return cellsFingerprint;
+    }
+};
+
+// Neighbour columns for word `wordIdx` of a row: the word shifted by one cell towards higher
+// (west neighbour) and lower (east neighbour) columns, carrying the bit across word boundaries.
+inline uint64_t westNeighbours(const uint64_t *pRow, const int &wordIdx)
+{
+    uint64_t carry = wordIdx > 0 ? pRow[wordIdx - 1] >> 63 : 0;
+    return (pRow[wordIdx] << 1) | carry;
+}
+
+inline uint64_t eastNeighbours(const uint64_t *pRow, const int &wordIdx, const int &wordsPerRow)
+{
+    uint64_t carry = wordIdx + 1 < wordsPerRow ? pRow[wordIdx + 1] << 63 : 0;
+    return (pRow[wordIdx] >> 1) | carry;
+}
+
+// Applies an arbitrary rule to bit-sliced neighbour counts: cells whose count equals `n` are
+// selected by matching the four count bits, once for every count that gives birth or survives.
+inline uint64_t applyRule(const LifeRule &rule, const uint64_t &alive, const uint64_t &count1,
+                          const uint64_t &count2, const uint64_t &count4, const uint64_t &count8)
+{
+    uint64_t newWord = 0;
+    for (int numNeighbours = 0; numNeighbours <= 8; numNeighbours++)
+    {
+        uint64_t cells = (((rule.birthMask >> numNeighbours) & 1) ? ~alive : 0) |
+                         (((rule.survivalMask >> numNeighbours) & 1) ? alive : 0);
+        if (cells == 0) continue;
+        cells &= (numNeighbours & 1) ? count1 : ~count1;
+        cells &= (numNeighbours & 2) ? count2 : ~count2;
+        cells &= (numNeighbours & 4) ? count4 : ~count4;
+        cells &= (numNeighbours & 8) ? count8 : ~count8;
+        newWord |= cells;
+    }
+    return newWord;
+}
+
+uint64_t stepPackedWord(const uint64_t *pAbove, const uint64_t *pRow, const uint64_t *pBelow,
+                        const int &wordIdx, const int &wordsPerRow, const LifeRule &rule)
+{
+    // Bit-sliced neighbour count: each row contributes a 2-bit horizontal sum (ones, twos),
+    // which are then added with full adders into count bits of weight 1, 2, 4 and 8.
+    uint64_t onesAbove = 0, twosAbove = 0, onesBelow = 0, twosBelow = 0;
+    if (pAbove != nullptr)
+    {
+        uint64_t west = westNeighbours(pAbove, wordIdx);
+        uint64_t east = eastNeighbours(pAbove, wordIdx, wordsPerRow);
+        uint64_t centre = pAbove[wordIdx];
+        onesAbove = west ^ centre ^ east;
+        twosAbove = (west & centre) | (east & (west ^ centre));
+    }
+    if (pBelow != nullptr)
+    {
+        uint64_t west = westNeighbours(pBelow, wordIdx);
+        uint64_t east = eastNeighbours(pBelow, wordIdx, wordsPerRow);
+        uint64_t centre = pBelow[wordIdx];
+        onesBelow = west ^ centre ^ east;
+        twosBelow = (west & centre) | (east & (west ^ centre));
+    }
+    uint64_t west = westNeighbours(pRow, wordIdx);
+    uint64_t east = eastNeighbours(pRow, wordIdx, wordsPerRow);
+    uint64_t onesRow = west ^ east;
+    uint64_t twosRow = west & east;
+
+    uint64_t count1 = onesAbove ^ onesRow ^ onesBelow;
+    uint64_t carry2 = (onesAbove & onesRow) | (onesBelow & (onesAbove ^ onesRow));
+
+    uint64_t twosSum = twosAbove ^ twosRow ^ twosBelow;
+    uint64_t carry4 = (twosAbove & twosRow) | (twosBelow & (twosAbove ^ twosRow));
+    uint64_t count2 = twosSum ^ carry2;
+    uint64_t carry4Extra = twosSum & carry2;
+    uint64_t count4 = carry4 ^ carry4Extra;
+    uint64_t count8 = carry4 & carry4Extra;
+
+    // Conway: alive next generation when count == 3, or count == 2 and the cell is alive
+    if (rule.isConway) return count2 & ~count4 & ~count8 & (count1 | pRow[wordIdx]);
+    return applyRule(rule, pRow[wordIdx], count1, count2, count4, count8);
+}
+
+// Tracks which words (64x1 cell tiles) have to be recomputed. A word can only change when a word
+// in its 3x3 word neighbourhood changed in the previous generation, so settled regions are skipped
+// and the stepping cost follows the changing cells instead of the grid area.
+struct DirtyTiles
+{
+    int gridRows;
+    int wordsPerRow;
+    std::vector<int> changed;
+    std::vector<int> active;
+    std::vector<int> activeStamp;
+    int stamp = 0;
+    bool allActive = true;
+
+    DirtyTiles(const int &rows, const int &wordsPerRow)
+        : gridRows(rows), wordsPerRow(wordsPerRow), activeStamp(rows * wordsPerRow, -1)
+    {
+    }
+
+    int numWords() const { return gridRows * wordsPerRow; }
+
+    // Builds `active` from the words changed in the last step. Falls back to a full scan when
+    // most of the grid is changing and the bookkeeping would cost more than it saves.
+    void collectActive()
+    {
+        active.clear();
+        if (allActive || 3 * changed.size() > static_cast<size_t>(numWords()))
+        {
+            allActive = true;
+            return;
+        }
+
+        stamp++;
+        for (int wordFlatIdx : changed)
+        {
+            int rowIdx = wordFlatIdx / wordsPerRow;
+            int wordIdx = wordFlatIdx % wordsPerRow;
+            for (int neighbourRow = std::max(rowIdx - 1, 0);
+                 neighbourRow <= std::min(rowIdx + 1, gridRows - 1); neighbourRow++)
+            {
+                for (int neighbourWord = std::max(wordIdx - 1, 0);
+                     neighbourWord <= std::min(wordIdx + 1, wordsPerRow - 1); neighbourWord++)
+                {
+                    int neighbourFlatIdx = neighbourRow * wordsPerRow + neighbourWord;
+                    if (activeStamp[neighbourFlatIdx] == stamp) continue;
+                    activeStamp[neighbourFlatIdx] = stamp;
+                    active.push_back(neighbourFlatIdx);
+                }
+            }
+        }
+    }
+};
+
+// Persistent pool stepping the bands of a generation. The calling thread takes band 0, the
+// workers the remaining ones; `run` returns once every band is done, which is the barrier between
+// two generations.
+class BandWorkers
+{
+   public:
+    explicit BandWorkers(const int &numThreads)
+    {
+        for (int workerIdx = 1; workerIdx < numThreads; workerIdx++)
+        {
+            threads.emplace_back(&BandWorkers::workerLoop, this, workerIdx);
+        }
+    }
+
+    ~BandWorkers()
+    {
+        {
+            std::lock_guard<std::mutex> lock(mutex);
+            stopping = true;
+        }
+        wake.notify_all();
+        for (std::thread &thread : threads) thread.join();
+    }
+
+    int numThreads() const { return static_cast<int>(threads.size()) + 1; }
+
+    void run(const int &bands, const std::function<void(int)> &task)
+    {
+        {
+            std::lock_guard<std::mutex> lock(mutex);
+            pTask = &task;
+            numBands = bands;
+            pending = bands - 1;
+            epoch++;
+        }
+        wake.notify_all();
+        task(0);
+
+        std::unique_lock<std::mutex> lock(mutex);
+        done.wait(lock, [this] { return pending == 0; });
+        pTask = nullptr;
+    }
+
+   private:
+    std::vector<std::thread> threads;
+    std::mutex mutex;
+    std::condition_variable wake;
+    std::condition_variable done;
+    const std::function<void(int)> *pTask = nullptr;
+    int numBands = 0;
+    int pending = 0;
+    uint64_t epoch = 0;
+    bool stopping = false;
+
+    void workerLoop(const int workerIdx)
+    {
+        uint64_t seenEpoch = 0;
+        while (true)
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+            wake.wait(lock, [&] { return stopping || epoch != seenEpoch; });
+            if (stopping) return;
+            seenEpoch = epoch;
+            if (workerIdx >= numBands) continue;
+            const std::function<void(int)> *pBandTask = pTask;
+            lock.unlock();
+
+            (*pBandTask)(workerIdx);
+
+            lock.lock();
+            if (--pending == 0) done.notify_one();
+        }
+    }
+};
+
+// Births, changes and changed words of a band of active words, reduced into a `StepResult`.
+struct BandResult
+{
+    int populated = 0;
+    int populationDelta = 0;
+    uint64_t fingerprintDelta = 0;
+    std::vector<int> changed;
+};
+
+// Steps the active words [`beginIdx`, `endIdx`) of `grid` into `newGrid`. Bands only read `grid`
+// and write disjoint words of `newGrid`, so they can run concurrently.
+void stepPackedBand(const PackedGrid &grid, PackedGrid &newGrid, const DirtyTiles &tiles,
+                    const LifeRule &rule, const int &beginIdx, const int &endIdx,
+                    BandResult &result)
+{
+    int lastWord = grid.wordsPerRow - 1;
+    for (int activeIdx = beginIdx; activeIdx < endIdx; activeIdx++)
+    {
+        int wordFlatIdx = tiles.allActive ? activeIdx : tiles.active[activeIdx];
+        int rowIdx = wordFlatIdx / grid.wordsPerRow;
+        int wordIdx = wordFlatIdx % grid.wordsPerRow;
+
+        const uint64_t *pAbove = rowIdx > 0 ? grid.row(rowIdx - 1) : nullptr;
+        const uint64_t *pRow = grid.row(rowIdx);
+        const uint64_t *pBelow = rowIdx + 1 < grid.gridRows ? grid.row(rowIdx + 1) : nullptr;
+
+        uint64_t newWord = stepPackedWord(pAbove, pRow, pBelow, wordIdx, grid.wordsPerRow, rule);
+        if (wordIdx == lastWord) newWord &= grid.tailMask;
+
+        uint64_t changed = newWord ^ pRow[wordIdx];
+        if (changed != 0)
+        {
+            int born = popcount64(newWord & changed);
+            result.populated += born;
+            result.populationDelta += 2 * born - popcount64(changed);
+            result.fingerprintDelta ^= grid.wordFingerprint(rowIdx, wordIdx, changed);
+            result.changed.push_back(wordFlatIdx);
+        }
+        newGrid.row(rowIdx)[wordIdx] = newWord;
+    }
+}
+
+// Computes the next generation into `newGrid` and swaps the buffers. Words outside the active set
+// are not written: they did not change in the previous generation, so `newGrid`, which holds that
+// generation, already has their current value.
+//
+// With `pWorkers` the active words are split into contiguous bands (horizontal bands of rows on a
+// full scan) stepped in parallel, the band results are reduced in band order so the outcome does
+// not depend on the number of threads.
+StepResult runPackedStep(PackedGrid &grid, PackedGrid &newGrid, DirtyTiles &tiles,
+                         const LifeRule &rule, BandWorkers *pWorkers = nullptr)
+{
+    tiles.collectActive();
+    int numActive = tiles.allActive ? tiles.numWords() : static_cast<int>(tiles.active.size());
+    int numBands = 1;
+    if (pWorkers != nullptr)
+    {
+        numBands = std::max(1, std::min(pWorkers->numThreads(), numActive / kMinWordsPerBand));
+    }
+
+    // reuses the changed word list of the previous generation, `collectActive` is done with it
+    BandResult stepResult;
+    stepResult.changed = std::move(tiles.changed);
+    stepResult.changed.clear();
+    if (numBands == 1)
+    {
+        stepPackedBand(grid, newGrid, tiles, rule, 0, numActive, stepResult);
+    }
+    else
+    {
+        std::vector<BandResult> bandResults(numBands);
+        pWorkers->run(
+            numBands,
+            [&](int bandIdx)
+            {
+                int beginIdx =
+                    static_cast<int>(static_cast<int64_t>(numActive) * bandIdx / numBands);
+                int endIdx =
+                    static_cast<int>(static_cast<int64_t>(numActive) * (bandIdx + 1) / numBands);
+                stepPackedBand(grid, newGrid, tiles, rule, beginIdx, endIdx, bandResults[bandIdx]);
+            });
+
+        for (const BandResult &bandResult : bandResults)
+        {
+            stepResult.populated += bandResult.populated;
+            stepResult.populationDelta += bandResult.populationDelta;
+            stepResult.fingerprintDelta ^= bandResult.fingerprintDelta;
+            stepResult.changed.insert(stepResult.changed.end(), bandResult.changed.begin(),
+                                      bandResult.changed.end());
+        }
+    }
+
+    tiles.changed = std::move(stepResult.changed);
+    tiles.allActive = false;
+    std::swap(grid.words, newGrid.words);
+    return {stepResult.populated, tiles.changed.empty(), stepResult.fingerprintDelta,
+            stepResult.populationDelta};
+}
+
+// State of a single packed board between generations, shared by the single word and batch calls.
+struct PackedRun
+{
+    PackedGrid grid;
+    PackedGrid newGrid;
+    DirtyTiles tiles;
+    CycleDetector cycleDetector;
+    LifeRule rule;
+    uint64_t fingerprint;
+    int population;
+    int generation = 0;
     int totalScore = 0;
-    seenHashmap[computeGridHash(grid)] = 0;
+    StopReason stopReason = kRunning;
+    BandWorkers *pWorkers = nullptr;
+    // optional caller owned per generation population and births, `maxGenerations + 1` entries
+    int32_t *pOutPopulation = nullptr;
+    int32_t *pOutBirths = nullptr;
 
-    for (int genNum = 1; genNum <= maxGenerations; genNum++)
+    PackedRun(const uint8_t *pInputGrid, const int &gridRows, const int &gridCols,
+              const int &repeatPatternThreshold, const bool &legacyHashing, const LifeRule &rule)
+        : grid(gridRows, gridCols),
+          newGrid(gridRows, gridCols),
+          tiles(gridRows, grid.wordsPerRow),
+          cycleDetector(repeatPatternThreshold, grid.numBytes(), legacyHashing),
+          rule(rule)
     {
-        StepResult stepResult = runStep(grid, gridRows, gridCols);
+        grid.loadFrom(pInputGrid);
+        fingerprint = grid.fingerprint();
+        population = grid.population();
+        cycleDetector.reset(grid.bytes(), fingerprint);
+    }
 
-        totalScore += stepResult.populated;
-        std::string gridHash = computeGridHash(grid);
+    StopReason advance(const int &maxGenerations)
+    {
+        if (generation >= maxGenerations)
+        {
+            stopReason = kReachedMaxGeneration;
+            return stopReason;
+        }
 
-        bool isExtinct = std::all_of(grid.begin(), grid.end(), [](uint8_t i) { return i == 0; });
+        generation++;
+        StepResult stepResult = runPackedStep(grid, newGrid, tiles, rule, pWorkers);
+        totalScore += stepResult.populated;
+        fingerprint ^= stepResult.fingerprintDelta;
+        population += stepResult.populationDelta;
+        if (pOutPopulation != nullptr) pOutPopulation[generation] = population;
+        if (pOutBirths != nullptr) pOutBirths[generation] = stepResult.populated;
 
-        if (isExtinct)
+        if (population == 0)
         {
-            *pOutGenerations = genNum;
-            *pOutScore = totalScore;
-            strncpy(pReason, "extinction", reasonBuffSize);
-            return 0;
+            stopReason = kExtinction;
+            return stopReason;
         }
 
         if (stepResult.gridsEqual)
         {
-            *pOutGenerations = genNum;
-            *pOutScore = totalScore;
-            strncpy(pReason, "persistent_state", reasonBuffSize);
-            return 0;
+            stopReason = kPersistentState;
+            return stopReason;
         }
 
-        if (seenHashmap.count(gridHash) == 0)
+        if (cycleDetector.isRepeated(generation, grid.bytes(), fingerprint))
         {
-            seenHashmap[gridHash] = genNum;
-            continue;
+            stopReason = kRepeatedPattern;
         }
-
-        int genPeriod = genNum - seenHashmap[gridHash];
-        if (genPeriod < repeatPatternThreshold)
+        else if (generation == maxGenerations)
         {
-            *pOutGenerations = genNum;
-            *pOutScore = totalScore;
-            strncpy(pReason, "repeated_pattern", reasonBuffSize);
-            return 0;
+            stopReason = kReachedMaxGeneration;
         }
+        return stopReason;
+    }
+};
+
+extern "C" DLL_EXPORT int getAbiVersion()
+{
+    return kAbiVersion;
+}
+
+extern "C" DLL_EXPORT int runFromWordPacked(uint8_t *pInputGrid, int gridRows, int gridCols,
+                                            int maxGenerations, int repeatPatternThreshold,
+                                            int *pOutGenerations, int *pOutScore, char *pReason,
+                                            int reasonBuffSize, int legacyHashing, int birthMask,
+                                            int survivalMask, int numThreads)
+{
+    PackedRun run(pInputGrid, gridRows, gridCols, repeatPatternThreshold, legacyHashing != 0,
+                  LifeRule(birthMask, survivalMask));
 
-        seenHashmap[gridHash] = genNum;
+    // the workers live for the whole run, grids too small for two bands stay single threaded
+    std::unique_ptr<BandWorkers> pWorkers;
+    int maxBands = run.tiles.numWords() / kMinWordsPerBand;
+    if (numThreads > 1 && maxBands > 1)
+    {
+        pWorkers.reset(new BandWorkers(std::min(numThreads, maxBands)));
+        run.pWorkers = pWorkers.get();
+    }
+    while (run.advance(maxGenerations) == kRunning)
+    {
+    }
+
+    *pOutGenerations = run.generation;
+    *pOutScore = run.totalScore;
+    strncpy(pReason, stopReasonName(run.stopReason), reasonBuffSize);
+    return 0;
+}
+
+// Extended entry point working in place on caller owned buffers: `pGrid` holds the seed and
+// receives the final board, `pScratch` (same size, only used by the naive kernel) is the second
+// buffer the naive kernel swaps with, the packed kernel keeps its own bitboards. `pOutPopulation`
+// and `pOutBirths` may be null, otherwise they receive `maxGenerations + 1` entries of which the
+// first
+// `*pOutGenerations + 1` are written. The stop reason is returned as a code like `runBatch`'s.
+extern "C" DLL_EXPORT int runFromWordInto(uint8_t *pGrid, uint8_t *pScratch, int gridRows,
+                                          int gridCols, int maxGenerations,
+                                          int repeatPatternThreshold, int legacyHashing,
+                                          int birthMask, int survivalMask, int packed,
+                                          int numThreads, int *pOutGenerations, int *pOutScore,
+                                          int *pOutReasonCode, int32_t *pOutPopulation,
+                                          int32_t *pOutBirths)
+{
+    LifeRule rule(birthMask, survivalMask);
+    if (!packed)
+    {
+        RunResult result =
+            runCells(pGrid, pScratch, gridRows, gridCols, maxGenerations, repeatPatternThreshold,
+                     legacyHashing != 0, rule, pOutPopulation, pOutBirths);
+        *pOutGenerations = result.generation;
+        *pOutScore = result.totalScore;
+        *pOutReasonCode = result.stopReason;
+        return 0;
+    }
+
+    PackedRun run(pGrid, gridRows, gridCols, repeatPatternThreshold, legacyHashing != 0, rule);
+    run.pOutPopulation = pOutPopulation;
+    run.pOutBirths = pOutBirths;
+    if (pOutPopulation != nullptr) pOutPopulation[0] = run.population;
+    if (pOutBirths != nullptr) pOutBirths[0] = 0;
+
+    std::unique_ptr<BandWorkers> pWorkers;
+    int maxBands = run.tiles.numWords() / kMinWordsPerBand;
+    if (numThreads > 1 && maxBands > 1)
+    {
+        pWorkers.reset(new BandWorkers(std::min(numThreads, maxBands)));
+        run.pWorkers = pWorkers.get();
+    }
+    while (run.advance(maxGenerations) == kRunning)
+    {
+    }
+
+    run.grid.storeTo(pGrid);
+    *pOutGenerations = run.generation;
+    *pOutScore = run.totalScore;
+    *pOutReasonCode = run.stopReason;
+    return 0;
+}
+
+// Runs `numBoards` boards stored back to back in `pInputStack` (numBoards x gridRows x gridCols)
+// in lockstep, one generation of every still running board per iteration. Boards drop out of the
+// active set as soon as they stop; results are written into the caller owned output arrays.
+extern "C" DLL_EXPORT int runBatch(uint8_t *pInputStack, int numBoards, int gridRows, int gridCols,
+                                   int maxGenerations, int repeatPatternThreshold,
+                                   int *pOutGenerations, int *pOutScores, int *pOutReasonCodes,
+                                   int legacyHashing, int birthMask, int survivalMask)
+{
+    LifeRule rule(birthMask, survivalMask);
+    size_t gridSize = static_cast<size_t>(gridRows) * gridCols;
+    std::vector<PackedRun> runs;
+    runs.reserve(numBoards);
+    for (int boardIdx = 0; boardIdx < numBoards; boardIdx++)
+    {
+        runs.emplace_back(pInputStack + boardIdx * gridSize, gridRows, gridCols,
+                          repeatPatternThreshold, legacyHashing != 0, rule);
+    }
+
+    std::vector<int> active(numBoards);
+    for (int boardIdx = 0; boardIdx < numBoards; boardIdx++) active[boardIdx] = boardIdx;
+
+    while (!active.empty())
+    {
+        size_t keep = 0;
+        for (size_t activeIdx = 0; activeIdx < active.size(); activeIdx++)
+        {
+            int boardIdx = active[activeIdx];
+            PackedRun &run = runs[boardIdx];
+            if (run.advance(maxGenerations) == kRunning)
+            {
+                active[keep++] = boardIdx;
+                continue;
+            }
+
+            pOutGenerations[boardIdx] = run.generation;
+            pOutScores[boardIdx] = run.totalScore;
+            pOutReasonCodes[boardIdx] = run.stopReason;
+            // release the board memory as soon as it stops instead of at the end of the batch
+            run.cycleDetector.release();
+            run.grid.words = {};
+            run.newGrid.words = {};
+            run.tiles = DirtyTiles(0, 0);
+        }
+        active.resize(keep);
     }
 
     return 0;
@@ -0,0 +1,225 @@
+#pragma once
+
+#include <stdint.h>
+
+#include <algorithm>
+#include <cstring>
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+#include "picosha2.h"
+
+// splitmix64 finalizer, used to derive an independent 64-bit Zobrist key for every cell.
+inline uint64_t mixBits(uint64_t value)
+{
+    value += 0x9E3779B97F4A7C15ULL;
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EBULL;
+    return value ^ (value >> 31);
+}
+
+// Zobrist key of the cell at row major index `flatIdx`. The board fingerprint is the XOR of the
+// keys of all live cells, so flipping a cell updates it with a single XOR.
+inline uint64_t cellKey(const size_t &flatIdx)
+{
+    return mixBits(static_cast<uint64_t>(flatIdx));
+}
+
+// Open addressed fingerprint -> last seen generation table with linear probing.
+class FingerprintTable
+{
+   public:
+    FingerprintTable() { rehash(1024); }
+
+    // Returns the generation slot for `fingerprint`, inserting it with `generation` when missing.
+    int &findOrInsert(const uint64_t &fingerprint, const int &generation, bool &inserted)
+    {
+        if (2 * (numEntries + 1) > slotGenerations.size()) rehash(2 * slotGenerations.size());
+
+        size_t slotIdx = slotFor(fingerprint);
+        inserted = slotGenerations[slotIdx] < 0;
+        if (inserted)
+        {
+            slotFingerprints[slotIdx] = fingerprint;
+            slotGenerations[slotIdx] = generation;
+            numEntries++;
+        }
+        return slotGenerations[slotIdx];
+    }
+
+    void clear()
+    {
+        std::fill(slotGenerations.begin(), slotGenerations.end(), -1);
+        numEntries = 0;
+    }
+
+   private:
+    std::vector<uint64_t> slotFingerprints;
+    std::vector<int> slotGenerations;
+    size_t numEntries = 0;
+
+    size_t slotFor(const uint64_t &fingerprint) const
+    {
+        size_t mask = slotGenerations.size() - 1;
+        size_t slotIdx = static_cast<size_t>(mixBits(fingerprint)) & mask;
+        while (slotGenerations[slotIdx] >= 0 && slotFingerprints[slotIdx] != fingerprint)
+        {
+            slotIdx = (slotIdx + 1) & mask;
+        }
+        return slotIdx;
+    }
+
+    void rehash(const size_t &numSlots)
+    {
+        std::vector<uint64_t> oldFingerprints = std::move(slotFingerprints);
+        std::vector<int> oldGenerations = std::move(slotGenerations);
+        slotFingerprints.assign(numSlots, 0);
+        slotGenerations.assign(numSlots, -1);
+
+        for (size_t oldIdx = 0; oldIdx < oldGenerations.size(); oldIdx++)
+        {
+            if (oldGenerations[oldIdx] < 0) continue;
+            size_t slotIdx = slotFor(oldFingerprints[oldIdx]);
+            slotFingerprints[slotIdx] = oldFingerprints[oldIdx];
+            slotGenerations[slotIdx] = oldGenerations[oldIdx];
+        }
+    }
+};
+
+// Detects a board state repeating within `repeatPatternThreshold` generations.
+//
+// A state repeats within the threshold exactly when it occurred in one of the previous
+// `repeatPatternThreshold - 1` generations. The fingerprint table only narrows that down: a
+// suspected repeat is confirmed against the snapshots of the most recent generations, so a
+// fingerprint collision can never produce a false `repeated_pattern`. Snapshots are limited to
+// `kMaxSnapshotBytes`, beyond that the fingerprint match is trusted.
+//
+// With `legacyHashing` the detector keeps the previous SHA-256 hex string map for A/B comparisons.
+class CycleDetector
+{
+   public:
+    static const size_t kMaxSnapshotBytes = 64 << 20;
+
+    CycleDetector(const int &repeatPatternThreshold, const size_t &stateBytes,
+                  const bool &legacyHashing)
+        : threshold(repeatPatternThreshold), stateBytes(stateBytes), legacyHashing(legacyHashing)
+    {
+        if (legacyHashing) return;
+        size_t maxSnapshots =
+            std::max<size_t>(1, kMaxSnapshotBytes / std::max<size_t>(1, stateBytes));
+        numSnapshots = std::max<size_t>(1, std::min<size_t>(std::max(threshold, 1), maxSnapshots));
+        snapshotGenerations.assign(numSnapshots, -1);
+        snapshotFingerprints.assign(numSnapshots, 0);
+        snapshots.assign(numSnapshots * stateBytes, 0);
+    }
+
+    void reset(const uint8_t *pState, const uint64_t &fingerprint)
+    {
+        if (legacyHashing)
+        {
+            seenHashmap.clear();
+            seenHashmap[hashState(pState)] = 0;
+            return;
+        }
+        table.clear();
+        std::fill(snapshotGenerations.begin(), snapshotGenerations.end(), -1);
+        bool inserted;
+        table.findOrInsert(fingerprint, 0, inserted);
+        storeSnapshot(0, pState, fingerprint);
+    }
+
+    // Records the state of `generation` and returns whether it repeats a state seen less than
+    // `repeatPatternThreshold` generations ago.
+    bool isRepeated(const int &generation, const uint8_t *pState, const uint64_t &fingerprint)
+    {
+        if (legacyHashing) return isRepeatedLegacy(generation, pState);
+
+        bool inserted;
+        int &lastSeen = table.findOrInsert(fingerprint, generation, inserted);
+        if (!inserted && generation - lastSeen < threshold &&
+            seenWithinThreshold(generation, lastSeen, pState, fingerprint))
+        {
+            return true;
+        }
+
+        lastSeen = generation;
+        storeSnapshot(generation, pState, fingerprint);
+        return false;
+    }
+
+    // Frees the table and snapshots once the owning run has stopped.
+    void release()
+    {
+        table = FingerprintTable();
+        seenHashmap = {};
+        snapshotGenerations = {};
+        snapshotFingerprints = {};
+        snapshots = {};
+    }
+
+   private:
+    int threshold;
+    size_t stateBytes;
+    bool legacyHashing;
+
+    FingerprintTable table;
+    size_t numSnapshots = 0;
+    std::vector<int> snapshotGenerations;
+    std::vector<uint64_t> snapshotFingerprints;
+    std::vector<uint8_t> snapshots;
+
+    std::unordered_map<std::string, int> seenHashmap;
+
+    const std::string hashState(const uint8_t *pState) const
+    {
+        return picosha2::hash256_hex_string(pState, pState + stateBytes);
+    }
+
+    bool isRepeatedLegacy(const int &generation, const uint8_t *pState)
+    {
+        std::string stateHash = hashState(pState);
+        auto seen = seenHashmap.find(stateHash);
+        if (seen == seenHashmap.end())
+        {
+            seenHashmap.emplace(std::move(stateHash), generation);
+            return false;
+        }
+        if (generation - seen->second < threshold) return true;
+        seen->second = generation;
+        return false;
+    }
+
+    void storeSnapshot(const int &generation, const uint8_t *pState, const uint64_t &fingerprint)
+    {
+        size_t slotIdx = static_cast<size_t>(generation) % numSnapshots;
+        snapshotGenerations[slotIdx] = generation;
+        snapshotFingerprints[slotIdx] = fingerprint;
+        std::memcpy(snapshots.data() + slotIdx * stateBytes, pState, stateBytes);
+    }
+
+    bool matchesSnapshot(const int &generation, const uint8_t *pState,
+                         const uint64_t &fingerprint) const
+    {
+        size_t slotIdx = static_cast<size_t>(generation) % numSnapshots;
+        return snapshotGenerations[slotIdx] == generation &&
+               snapshotFingerprints[slotIdx] == fingerprint &&
+               std::memcmp(snapshots.data() + slotIdx * stateBytes, pState, stateBytes) == 0;
+    }
+
+    bool seenWithinThreshold(const int &generation, const int &lastSeen, const uint8_t *pState,
+                             const uint64_t &fingerprint) const
+    {
+        int oldestSnapshot = generation - static_cast<int>(numSnapshots);
+        if (lastSeen < oldestSnapshot) return true;
+        if (matchesSnapshot(lastSeen, pState, fingerprint)) return true;
+
+        // `lastSeen` belongs to a colliding state, the same state may still be in the window
+        int oldestCandidate = std::max(generation - threshold + 1, std::max(oldestSnapshot, 0));
+        for (int candidate = generation - 1; candidate >= oldestCandidate; candidate--)
+        {
+            if (matchesSnapshot(candidate, pState, fingerprint)) return true;
+        }
+        return false;
+    }
+};
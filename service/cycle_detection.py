@@ -0,0 +1,112 @@
+from hashlib import md5
+
+import numpy as np
+
+# Snapshots retained for verifying suspected repeats, mirrors `kMaxSnapshotBytes` in cycle_detector.h
+MAX_SNAPSHOT_BYTES = 64 << 20
+
+
+def mix_bits(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, identical to `mixBits` in cpp_engine/cycle_detector.h
+    values = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def cell_keys(grid_rows: int, grid_cols: int) -> np.ndarray:
+    return mix_bits(np.arange(grid_rows * grid_cols, dtype=np.uint64)).reshape(grid_rows, grid_cols)
+
+
+def grid_fingerprint(keys: np.ndarray, cells: np.ndarray) -> int:
+    if cells.dtype != bool:
+        cells = cells.astype(bool)
+    return int(np.bitwise_xor.reduce(keys[cells], initial=np.uint64(0)))
+
+
+class CycleDetector:
+    """
+    Detects a board state repeating within `repeat_threshold` generations, the python counterpart
+    of `CycleDetector` in cpp_engine/cycle_detector.h.
+
+    States are identified by a Zobrist fingerprint (XOR of per-cell keys of live cells) that is
+    updated from the cells changed by a step. Suspected repeats are verified against snapshots of the
+    most recent generations, so fingerprint collisions cannot produce a false repeat.
+    `legacy_hashing` keeps the previous md5 hex digest map for A/B comparisons.
+    """
+
+    def __init__(self, grid_rows: int, grid_cols: int, repeat_threshold: int, legacy_hashing: bool = False):
+        self.repeat_threshold = repeat_threshold
+        self.legacy_hashing = legacy_hashing
+        self.keys = cell_keys(grid_rows, grid_cols)
+
+        snapshot_bytes = max(1, grid_rows * grid_cols)
+        self.num_snapshots = max(1, min(max(repeat_threshold, 1), MAX_SNAPSHOT_BYTES // snapshot_bytes))
+
+        self.fingerprint: int = 0
+        self.seen_generations: dict = {}
+        self.snapshots: list[tuple[int, int, np.ndarray] | None] = []
+
+    def reset(self, grid: np.ndarray) -> None:
+        if self.legacy_hashing:
+            self.seen_generations = {self.hash_array(grid): 0}
+            return
+
+        self.fingerprint = grid_fingerprint(self.keys, grid)
+        self.seen_generations = {self.fingerprint: 0}
+        self.snapshots = [None] * self.num_snapshots
+        self._store_snapshot(0, grid)
+
+    def is_repeated(self, generation: int, grid: np.ndarray, changed: np.ndarray) -> bool:
+        """
+        Records the state of `generation` and returns whether it repeats a state seen less than
+        `repeat_threshold` generations ago. `changed` marks the cells flipped by the last step.
+        """
+        if self.legacy_hashing:
+            return self._is_repeated_legacy(generation, grid)
+
+        self.fingerprint ^= grid_fingerprint(self.keys, changed)
+
+        last_seen = self.seen_generations.get(self.fingerprint)
+        if (
+            last_seen is not None
+            and generation - last_seen < self.repeat_threshold
+            and self._seen_within_threshold(generation, last_seen, grid)
+        ):
+            return True
+
+        self.seen_generations[self.fingerprint] = generation
+        self._store_snapshot(generation, grid)
+        return False
+
+    def _is_repeated_legacy(self, generation: int, grid: np.ndarray) -> bool:
+        grid_hash = self.hash_array(grid)
+        last_seen = self.seen_generations.get(grid_hash)
+        if last_seen is not None and generation - last_seen < self.repeat_threshold:
+            return True
+        self.seen_generations[grid_hash] = generation
+        return False
+
+    def _store_snapshot(self, generation: int, grid: np.ndarray) -> None:
+        self.snapshots[generation % self.num_snapshots] = (generation, self.fingerprint, grid.copy())
+
+    def _matches_snapshot(self, generation: int, grid: np.ndarray) -> bool:
+        snapshot = self.snapshots[generation % self.num_snapshots]
+        if snapshot is None or snapshot[:2] != (generation, self.fingerprint):
+            return False
+        return np.array_equal(snapshot[2], grid)
+
+    def _seen_within_threshold(self, generation: int, last_seen: int, grid: np.ndarray) -> bool:
+        oldest_snapshot = generation - self.num_snapshots
+        if last_seen < oldest_snapshot:
+            return True
+        if self._matches_snapshot(last_seen, grid):
+            return True
+
+        # `last_seen` belongs to a colliding state, the same state may still be in the window
+        oldest_candidate = max(generation - self.repeat_threshold + 1, oldest_snapshot, 0)
+        return any(self._matches_snapshot(candidate, grid) for candidate in range(oldest_candidate, generation))
+
+    @staticmethod
+    def hash_array(array: np.ndarray) -> str:
+        return md5(array.tobytes()).hexdigest()
@@ -1,11 +1,40 @@
 from pydantic import BaseModel
 
+from .rules import DEFAULT_RULE
+
 
 class GameRequest(BaseModel):
     word: str
+    rule: str = DEFAULT_RULE
 
 
 class GameResponse(BaseModel):
     num_generations: int
     score: int
     stop_reason: str
+
+
+class GamesRequest(BaseModel):
+    words: list[str]
+    rule: str = DEFAULT_RULE
+    # only the k best scoring words, best first, instead of all words in request order
+    top_k: int | None = None
+
+
+class WordGameResponse(GameResponse):
+    word: str
+
+
+class GamesResponse(BaseModel):
+    results: list[WordGameResponse]
+
+
+class TraceRequest(GameRequest):
+    # generations per streamed chunk
+    chunk_generations: int = 100
+
+
+class ResultsPage(BaseModel):
+    results: list[WordGameResponse]
+    # pass as `cursor` for the next page, None on the last page
+    next_cursor: str | None = None
@@ -1,48 +1,346 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, event, inspect, text, tuple_
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import sessionmaker
 
 from ..data_model import GameResponse
-from .db_tables import Base, GameData
+from ..metrics import DB_ERRORS, DB_SECONDS, timed_call
+from ..rules import DEFAULT_RULE
+from .db_tables import Base, GameData, TrajectoryState
+
+# database of the service and of the offline tools, unless ENGINE_DB_URL is set
+DEFAULT_DB_URL = "./service/db/service.db"
+
+# bound parameters per `IN (...)` query, below the default sqlite limit of older builds
+MAX_IN_PARAMS = 900
+
+logger = logging.getLogger(__name__)
+
+# applied to every pooled connection: WAL lets readers run alongside the writer, NORMAL sync is
+# durable in WAL mode except for the last transactions on power loss
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+}
 
 
 class SQLiteService:
 
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, pool_size: int = 5):
         self.url = "sqlite:///" + db_name
 
-        self.engine = create_engine(self.url)
+        self.engine = create_engine(
+            self.url,
+            pool_size=pool_size,
+            max_overflow=2 * pool_size,
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(self.engine, "connect", self.set_pragmas)
+        self.migrate_rule_column()
         Base.metadata.create_all(self.engine)
+        # `create_all` skips the indexes of tables that already exist
+        for index in GameData.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
 
         self.Session = sessionmaker(bind=self.engine)
 
-    def insert_response(self, word: str, response: GameResponse):
+    @staticmethod
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+
+    def migrate_rule_column(self) -> None:
+        # tables created before rules were supported have a unique `word` and no `rule` column,
+        # sqlite cannot drop the constraint in place so the table is rebuilt
+        inspector = inspect(self.engine)
+        if not inspector.has_table(GameData.__tablename__):
+            return
+        if "rule" in {column["name"] for column in inspector.get_columns(GameData.__tablename__)}:
+            return
+
+        with self.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE game_requests RENAME TO game_requests_old"))
+            GameData.__table__.create(connection)
+            connection.execute(
+                text(
+                    "INSERT INTO game_requests (id, word, rule, num_generations, score, stop_reason) "
+                    "SELECT id, word, :rule, num_generations, score, stop_reason FROM game_requests_old"
+                ),
+                {"rule": DEFAULT_RULE},
+            )
+            connection.execute(text("DROP TABLE game_requests_old"))
+
+    @timed_call(DB_SECONDS, "insert_response", component="db")
+    def insert_response(self, word: str, response: GameResponse, rule: str = DEFAULT_RULE):
         session = self.Session()
 
         try:
-            game_data = GameData(
-                word=word,
-                num_generations=response.num_generations,
-                score=response.score,
-                stop_reason=response.stop_reason,
+            # results are deterministic, a row stored concurrently by another worker is kept as is
+            statement = (
+                insert(GameData)
+                .values(
+                    word=word,
+                    rule=rule,
+                    num_generations=response.num_generations,
+                    score=response.score,
+                    stop_reason=response.stop_reason,
+                )
+                .on_conflict_do_nothing(index_elements=["word", "rule"])
             )
-            session.add(game_data)
+            session.execute(statement)
             session.commit()
-        except Exception as e:
+        except Exception:
             session.rollback()
-            print(f"error occured on inserting game data. Error: {e}")
+            DB_ERRORS.inc("insert_response")
+            logger.exception("error occured on inserting game data")
         finally:
             session.close()
 
-    def get_response(self, word: str):
+    @timed_call(DB_SECONDS, "get_response", component="db")
+    def get_response(self, word: str, rule: str = DEFAULT_RULE):
         session = self.Session()
 
         try:
-            response = session.query(GameData).filter_by(word=word).first()
-        except Exception as e:
+            response = session.query(GameData).filter_by(word=word, rule=rule).first()
+        except Exception:
             session.rollback()
             response = None
-            print(f"error occured on loadig game data for word '{word}'. Error: {e}")
+            DB_ERRORS.inc("get_response")
+            logger.exception("error occured on loadig game data for word '%s'", word)
         finally:
             session.close()
 
         return response
+
+    @timed_call(DB_SECONDS, "insert_responses", component="db")
+    def insert_responses(
+        self, responses: dict[str, GameResponse], rule: str = DEFAULT_RULE, overwrite: bool = False
+    ) -> bool:
+        """
+        Stores `responses` of `rule` in one transaction. Rows already stored are kept as they are,
+        or replaced with `overwrite`. Returns whether the transaction was committed.
+        """
+        if not responses:
+            return True
+        session = self.Session()
+
+        try:
+            statement = insert(GameData)
+            if overwrite:
+                statement = statement.on_conflict_do_update(
+                    index_elements=["word", "rule"],
+                    set_={
+                        "num_generations": statement.excluded.num_generations,
+                        "score": statement.excluded.score,
+                        "stop_reason": statement.excluded.stop_reason,
+                    },
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=["word", "rule"])
+            session.execute(
+                statement,
+                [
+                    {
+                        "word": word,
+                        "rule": rule,
+                        "num_generations": response.num_generations,
+                        "score": response.score,
+                        "stop_reason": response.stop_reason,
+                    }
+                    for word, response in responses.items()
+                ],
+            )
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            DB_ERRORS.inc("insert_responses")
+            logger.exception("error occured on inserting game data for %d words", len(responses))
+            return False
+        finally:
+            session.close()
+
+    @timed_call(DB_SECONDS, "get_responses", component="db")
+    def get_responses(self, words: list[str], rule: str = DEFAULT_RULE) -> dict[str, GameData]:
+        session = self.Session()
+
+        try:
+            responses = {}
+            for start in range(0, len(words), MAX_IN_PARAMS):
+                rows = (
+                    session.query(GameData)
+                    .filter(GameData.rule == rule, GameData.word.in_(words[start : start + MAX_IN_PARAMS]))
+                    .all()
+                )
+                responses.update((row.word, row) for row in rows)
+        except Exception:
+            session.rollback()
+            responses = {}
+            DB_ERRORS.inc("get_responses")
+            logger.exception("error occured on loadig game data for %d words", len(words))
+        finally:
+            session.close()
+
+        return responses
+
+    @timed_call(DB_SECONDS, "query_responses", component="db")
+    def query_responses(
+        self,
+        rule: str = DEFAULT_RULE,
+        order_by: str = "score",
+        descending: bool = True,
+        limit: int = 10,
+        stop_reason: str | None = None,
+        min_generations: int | None = None,
+        max_generations: int | None = None,
+        min_score: int | None = None,
+        max_score: int | None = None,
+        after: tuple[int, int] | None = None,
+    ) -> list[GameData]:
+        """
+        Stored results of `rule` ordered by `order_by` ("score" or "num_generations") and `id`,
+        filtered by the given bounds. `after` is the `(order_by value, id)` of the last row of the
+        previous page, pages continue from it without an offset scan.
+        """
+        session = self.Session()
+
+        try:
+            order_column = getattr(GameData, order_by)
+            # `+ 0` keeps sqlite from using the index of the other column for its range filter and then
+            # sorting every match, walking the ordered index stops after `limit` matching rows
+            generations = GameData.num_generations if order_by == "num_generations" else GameData.num_generations + 0
+            score = GameData.score if order_by == "score" else GameData.score + 0
+            query = session.query(GameData).filter(GameData.rule == rule)
+            if stop_reason is not None:
+                query = query.filter(GameData.stop_reason == stop_reason)
+            if min_generations is not None:
+                query = query.filter(generations >= min_generations)
+            if max_generations is not None:
+                query = query.filter(generations <= max_generations)
+            if min_score is not None:
+                query = query.filter(score >= min_score)
+            if max_score is not None:
+                query = query.filter(score <= max_score)
+            if after is not None:
+                position = tuple_(order_column, GameData.id)
+                query = query.filter(position < tuple_(*after) if descending else position > tuple_(*after))
+            if descending:
+                query = query.order_by(order_column.desc(), GameData.id.desc())
+            else:
+                query = query.order_by(order_column.asc(), GameData.id.asc())
+            rows = query.limit(limit).all()
+        except Exception:
+            session.rollback()
+            rows = []
+            DB_ERRORS.inc("query_responses")
+            logger.exception("error occured on querying game data")
+        finally:
+            session.close()
+
+        return rows
+
+    @timed_call(DB_SECONDS, "get_words", component="db")
+    def get_words(self, rule: str = DEFAULT_RULE) -> set[str]:
+        session = self.Session()
+
+        try:
+            words = {word for (word,) in session.query(GameData.word).filter_by(rule=rule)}
+        except Exception:
+            session.rollback()
+            words = set()
+            DB_ERRORS.inc("get_words")
+            logger.exception("error occured on loading stored words")
+        finally:
+            session.close()
+
+        return words
+
+    @timed_call(DB_SECONDS, "load_results", component="db")
+    def load_results(self) -> list[tuple[str, str, int, int, str]]:
+        session = self.Session()
+
+        try:
+            rows = [
+                tuple(row)
+                for row in session.query(
+                    GameData.rule, GameData.word, GameData.num_generations, GameData.score, GameData.stop_reason
+                )
+            ]
+        except Exception:
+            session.rollback()
+            rows = []
+            DB_ERRORS.inc("load_results")
+            logger.exception("error occured on loading game data")
+        finally:
+            session.close()
+
+        return rows
+
+    @timed_call(DB_SECONDS, "load_trajectory_states", component="db")
+    def load_trajectory_states(self, limit: int) -> list[tuple[str, bytes, int, int, str]]:
+        session = self.Session()
+
+        try:
+            rows = (
+                session.query(
+                    TrajectoryState.config,
+                    TrajectoryState.state,
+                    TrajectoryState.remaining_generations,
+                    TrajectoryState.remaining_births,
+                    TrajectoryState.stop_reason,
+                )
+                .order_by(TrajectoryState.id.desc())
+                .limit(limit)
+                .all()
+            )
+            # oldest first, so the most recent states end up as the most recently used ones
+            rows = [tuple(row) for row in reversed(rows)]
+        except Exception:
+            session.rollback()
+            rows = []
+            DB_ERRORS.inc("load_trajectory_states")
+            logger.exception("error occured on loading trajectory states")
+        finally:
+            session.close()
+
+        return rows
+
+    @timed_call(DB_SECONDS, "insert_trajectory_states", component="db")
+    def insert_trajectory_states(self, rows: list[tuple[str, bytes, int, int, str]]) -> bool:
+        if not rows:
+            return True
+        session = self.Session()
+
+        try:
+            statement = insert(TrajectoryState).on_conflict_do_nothing(index_elements=["config", "state"])
+            session.execute(
+                statement,
+                [
+                    {
+                        "config": config,
+                        "state": state,
+                        "remaining_generations": remaining_generations,
+                        "remaining_births": remaining_births,
+                        "stop_reason": stop_reason,
+                    }
+                    for config, state, remaining_generations, remaining_births, stop_reason in rows
+                ],
+            )
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            DB_ERRORS.inc("insert_trajectory_states")
+            logger.exception("error occured on inserting trajectory states")
+            return False
+        finally:
+            session.close()
@@ -1,14 +1,38 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Index, Integer, LargeBinary, String, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 
+from ..rules import DEFAULT_RULE
+
 Base = declarative_base()
 
 
 class GameData(Base):
     __tablename__ = "game_requests"
+    __table_args__ = (
+        UniqueConstraint("word", "rule", name="uq_game_requests_word_rule"),
+        # leaderboard / result queries, sqlite appends the rowid `id` to every index which makes the
+        # keyset pagination order (key, id) index ordered as well
+        Index("ix_game_requests_rule_score", "rule", "score"),
+        Index("ix_game_requests_rule_num_generations", "rule", "num_generations"),
+        Index("ix_game_requests_rule_stop_reason_score", "rule", "stop_reason", "score"),
+        Index("ix_game_requests_rule_stop_reason_num_generations", "rule", "stop_reason", "num_generations"),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False)
-    word = Column(String(250), unique=True, nullable=False)
+    word = Column(String(250), nullable=False)
+    rule = Column(String(30), nullable=False, default=DEFAULT_RULE, server_default=DEFAULT_RULE)
     num_generations = Column(Integer, nullable=False)
     score = Column(Integer, nullable=False)
     stop_reason = Column(String(30), nullable=False)
+
+
+class TrajectoryState(Base):
+    __tablename__ = "trajectory_states"
+    __table_args__ = (UniqueConstraint("config", "state", name="uq_trajectory_states_config_state"),)
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    config = Column(String(100), nullable=False)
+    state = Column(LargeBinary, nullable=False)
+    remaining_generations = Column(Integer, nullable=False)
+    remaining_births = Column(Integer, nullable=False)
+    stop_reason = Column(String(30), nullable=False)
@@ -0,0 +1,170 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+from ..data_model import GameResponse
+from ..rules import DEFAULT_RULE
+from .db_service import DEFAULT_DB_URL, SQLiteService
+
+MAGIC = b"CGOLSNAP"
+VERSION = 1
+# magic, version, metadata length, records offset, record count, words offset
+HEADER = struct.Struct("<8sIIQQQ")
+# word offset in the words section, word length, stop reason code, padding, generations, score
+RECORD = struct.Struct("<IHBxii")
+MAX_WORD_BYTES = 0xFFFF
+
+logger = logging.getLogger(__name__)
+
+
+def write_snapshot(path: str, rows: list[tuple[str, str, int, int, str]]) -> int:
+    """
+    Writes `(rule, word, num_generations, score, stop_reason)` rows as a snapshot, returns the number of records.
+
+    Records are sorted by rule and UTF-8 word bytes so `ResultSnapshot` finds a word by binary search in the
+    range of its rule. The file is written next to `path` and renamed over it, processes that mapped the
+    previous snapshot keep reading it until they reopen.
+    """
+    records = sorted(
+        (rule, word.encode(), num_generations, score, stop_reason)
+        for rule, word, num_generations, score, stop_reason in rows
+        if len(word.encode()) <= MAX_WORD_BYTES
+    )
+    stop_reasons = sorted({record[4] for record in records})
+    reason_codes = {reason: code for code, reason in enumerate(stop_reasons)}
+    rules = {}
+    for index, record in enumerate(records):
+        start, _ = rules.get(record[0], (index, index))
+        rules[record[0]] = (start, index + 1)
+    metadata = json.dumps(
+        {"rules": rules, "stop_reasons": stop_reasons, "created_at": time.time()}, separators=(",", ":")
+    ).encode()
+
+    records_offset = HEADER.size + len(metadata)
+    records_offset += -records_offset % 8
+    words_offset = records_offset + RECORD.size * len(records)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(metadata), records_offset, len(records), words_offset))
+            file.write(metadata)
+            file.write(b"\0" * (records_offset - HEADER.size - len(metadata)))
+            word_offset = 0
+            for _, word, num_generations, score, stop_reason in records:
+                file.write(RECORD.pack(word_offset, len(word), reason_codes[stop_reason], num_generations, score))
+                word_offset += len(word)
+            for record in records:
+                file.write(record[1])
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return len(records)
+
+
+class ResultSnapshot:
+    """
+    Read-only game results memory mapped from a file written by `write_snapshot`.
+
+    Lookups binary search the fixed-width records of the word's rule and decode the one match, nothing
+    but the small metadata is loaded on the heap. The mapping is shared, so every worker process of a
+    snapshot reads the same pages from the OS page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, metadata_length, self.records_offset, self.record_count, self.words_offset = (
+                HEADER.unpack_from(self.mm, 0)
+            )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} results snapshot")
+            metadata = json.loads(self.mm[HEADER.size : HEADER.size + metadata_length])
+        except Exception:
+            self.mm.close()
+            raise
+        self.rules: dict[str, tuple[int, int]] = {rule: tuple(bounds) for rule, bounds in metadata["rules"].items()}
+        self.stop_reasons: list[str] = metadata["stop_reasons"]
+        self.created_at: float = metadata["created_at"]
+        self.counters = {"hits": 0, "misses": 0}
+
+    def close(self) -> None:
+        self.mm.close()
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def _word_at(self, index: int) -> tuple[bytes, int]:
+        record_offset = self.records_offset + index * RECORD.size
+        word_offset, word_length = struct.unpack_from("<IH", self.mm, record_offset)
+        start = self.words_offset + word_offset
+        return self.mm[start : start + word_length], record_offset
+
+    def get_response(self, word: str, rule: str = DEFAULT_RULE) -> GameResponse | None:
+        bounds = self.rules.get(rule)
+        if bounds is not None:
+            key = word.encode()
+            low, high = bounds
+            while low < high:
+                middle = (low + high) // 2
+                middle_word, record_offset = self._word_at(middle)
+                if middle_word < key:
+                    low = middle + 1
+                elif middle_word > key:
+                    high = middle
+                else:
+                    _, _, reason, num_generations, score = RECORD.unpack_from(self.mm, record_offset)
+                    self.counters["hits"] += 1
+                    return GameResponse.model_construct(
+                        num_generations=num_generations, score=score, stop_reason=self.stop_reasons[reason]
+                    )
+        self.counters["misses"] += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "records": self.record_count,
+            "bytes": len(self.mm),
+            "rules": sorted(self.rules),
+            "created_at": self.created_at,
+            **self.counters,
+        }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Export the stored game results to a read-only snapshot file")
+    parser.add_argument("--db", default=os.environ.get("ENGINE_DB_URL", DEFAULT_DB_URL), help="SQLite database path")
+    parser.add_argument(
+        "--out",
+        default=os.environ.get("RESULT_SNAPSHOT_PATH"),
+        required="RESULT_SNAPSHOT_PATH" not in os.environ,
+        help="snapshot file, RESULT_SNAPSHOT_PATH by default",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    start = time.perf_counter()
+    db_service = SQLiteService(args.db)
+    try:
+        rows = db_service.load_results()
+    finally:
+        db_service.dispose()
+    count = write_snapshot(args.out, rows)
+    logger.info(
+        "Wrote %d results (%d bytes) to %s in %.1f s",
+        count,
+        os.path.getsize(args.out),
+        args.out,
+        time.perf_counter() - start,
+    )
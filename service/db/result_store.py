@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from ..data_model import GameResponse
+from ..metrics import DB_FLUSH_ROWS, DB_FLUSH_SECONDS
+from ..rules import DEFAULT_RULE
+from .db_service import SQLiteService
+from .db_tables import GameData
+from .result_snapshot import ResultSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def to_response(row: GameData) -> GameResponse:
+    return GameResponse(num_generations=row.num_generations, score=row.score, stop_reason=row.stop_reason)
+
+
+class ResultStore:
+    """
+    Async access to stored game results with write-behind persistence, used by the request path.
+
+    Reads check the results still waiting to be written, then the optional read-only `snapshot`, and only
+    then query the database on the thread pool. Writes only queue the
+    result: a background task stores everything queued in one transaction per rule every
+    `flush_interval` seconds, or as soon as `batch_size` results wait. Once `max_pending` results wait,
+    writers wait for the next flush. Rows are inserted with `ON CONFLICT DO NOTHING` (results are
+    deterministic), so a row stored concurrently by another worker is not an error. A failed flush
+    keeps its results queued for the next one; `close` flushes what is left. Without a running flush
+    loop (`start` not called, or after `close`) writers over `max_pending` flush the queue themselves.
+
+    Database calls go through the synchronous `SQLiteService` on the thread pool rather than an
+    `sqlite+aiosqlite` async engine: aiosqlite runs every connection on a thread of its own as well,
+    so an async engine keeps the thread hop and only adds greenlet bridging, and `SQLiteService`
+    (schema, pragmas, upserts) is shared with the offline scoring and export tools.
+    """
+
+    def __init__(
+        self,
+        db_service: SQLiteService,
+        flush_interval: float = 0.05,
+        batch_size: int = 1000,
+        max_pending: int = 50_000,
+        snapshot: ResultSnapshot | None = None,
+    ):
+        self.db_service = db_service
+        self.snapshot = snapshot
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        # (rule, word) -> result, `flushing` holds the results of the transaction in progress
+        self.pending: dict[tuple[str, str], GameResponse] = {}
+        self.flushing: dict[tuple[str, str], GameResponse] = {}
+        self.wakeup = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.flush_waiters: list[asyncio.Future] = []
+        self.flusher: asyncio.Task | None = None
+        self.stopping = False
+        self.counters = {"queued": 0, "flushed": 0, "flushes": 0, "failed_flushes": 0, "pending_hits": 0}
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    @classmethod
+    def from_env(cls, db_service: SQLiteService, snapshot: ResultSnapshot | None = None) -> "ResultStore":
+        return cls(
+            db_service,
+            snapshot=snapshot,
+            flush_interval=float(os.environ.get("DB_FLUSH_INTERVAL", 0.05)),
+            batch_size=int(os.environ.get("DB_FLUSH_BATCH", 1000)),
+            max_pending=int(os.environ.get("DB_MAX_PENDING", 50_000)),
+        )
+
+    def start(self) -> None:
+        self.stopping = False
+        self.flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self) -> None:
+        if self.flusher is not None:
+            # the loop finishes the flush in progress instead of being cancelled in the middle of it
+            self.stopping = True
+            self.wakeup.set()
+            await self.flusher
+            self.flusher = None
+        await self.flush()
+        if self.pending:
+            logger.error("%d results could not be stored on shutdown", len(self.pending))
+
+    def _stored(self, word: str, rule: str) -> GameResponse | None:
+        key = (rule, word)
+        response = self.pending.get(key) or self.flushing.get(key)
+        if response is not None:
+            self.counters["pending_hits"] += 1
+        elif self.snapshot is not None:
+            response = self.snapshot.get_response(word, rule)
+        return response
+
+    async def get_response(self, word: str, rule: str = DEFAULT_RULE) -> GameResponse | None:
+        response = self._stored(word, rule)
+        if response is not None:
+            return response
+        row = await run_in_threadpool(self.db_service.get_response, word, rule=rule)
+        return to_response(row) if row is not None else None
+
+    async def get_responses(self, words: list[str], rule: str = DEFAULT_RULE) -> dict[str, GameResponse]:
+        responses = {}
+        missing = []
+        for word in words:
+            response = self._stored(word, rule)
+            if response is not None:
+                responses[word] = response
+            else:
+                missing.append(word)
+        if missing:
+            rows = await run_in_threadpool(self.db_service.get_responses, missing, rule=rule)
+            responses.update((word, to_response(row)) for word, row in rows.items())
+        return responses
+
+    async def put(self, word: str, response: GameResponse, rule: str = DEFAULT_RULE) -> None:
+        await self.put_many({word: response}, rule=rule)
+
+    async def put_many(self, responses: dict[str, GameResponse], rule: str = DEFAULT_RULE) -> None:
+        for word, response in responses.items():
+            self.pending[(rule, word)] = response
+        self.counters["queued"] += len(responses)
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+        if len(self.pending) >= self.max_pending:
+            # backpressure: a burst of new words cannot grow the queue without bound
+            if self.flusher is None or self.flusher.done():
+                # nothing would complete the wait
+                await self.flush()
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self.flush_waiters.append(waiter)
+            self.wakeup.set()
+            await waiter
+
+    async def _flush_loop(self) -> None:
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if self.stopping:
+                break
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("error occured on flushing game results")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            waiters, self.flush_waiters = self.flush_waiters, []
+            try:
+                if self.pending:
+                    await self._flush_pending()
+            finally:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    async def _flush_pending(self) -> None:
+        self.flushing, self.pending = self.pending, {}
+        by_rule: dict[str, dict[str, GameResponse]] = {}
+        for (rule, word), response in self.flushing.items():
+            by_rule.setdefault(rule, {})[word] = response
+
+        start = time.perf_counter()
+        stored = 0
+        try:
+            for rule, responses in list(by_rule.items()):
+                if await run_in_threadpool(self.db_service.insert_responses, responses, rule=rule):
+                    stored += len(responses)
+                    del by_rule[rule]
+                else:
+                    self.counters["failed_flushes"] += 1
+        finally:
+            # rules not stored, also the remaining ones when cancelled, are kept for the next flush
+            # unless a newer result of the same word was queued meanwhile
+            for rule, responses in by_rule.items():
+                for word, response in responses.items():
+                    self.pending.setdefault((rule, word), response)
+            self.flushing = {}
+
+        elapsed = time.perf_counter() - start
+        self.counters["flushes"] += 1
+        self.counters["flushed"] += stored
+        self.total_flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+        DB_FLUSH_SECONDS.observe(elapsed)
+        DB_FLUSH_ROWS.observe(stored)
+
+    def stats(self) -> dict:
+        flushes = self.counters["flushes"]
+        return {
+            "snapshot": self.snapshot.stats() if self.snapshot is not None else None,
+            "pending": len(self.pending),
+            "flushing": len(self.flushing),
+            "flush_interval": self.flush_interval,
+            "batch_size": self.batch_size,
+            "max_pending": self.max_pending,
+            **self.counters,
+            "avg_flush_ms": 1000 * self.total_flush_time / flushes if flushes else 0.0,
+            "max_flush_ms": 1000 * self.max_flush_time,
+        }
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from ..trajectory_store import TrajectoryStore
+from .db_service import SQLiteService
+
+logger = logging.getLogger(__name__)
+
+
+class TrajectoryWriter:
+    """
+    Persists the states newly recorded in a `TrajectoryStore` every `flush_interval` seconds, in one
+    transaction per flush, so a crash only loses the states of the last interval. States of a failed
+    flush are kept for the next one; `close` stores what is left.
+    """
+
+    def __init__(self, trajectory_store: TrajectoryStore, db_service: SQLiteService, flush_interval: float = 30.0):
+        self.trajectory_store = trajectory_store
+        self.db_service = db_service
+        self.flush_interval = flush_interval
+        self.wakeup = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.flusher: asyncio.Task | None = None
+        self.stopping = False
+        self.counters = {"flushes": 0, "flushed": 0, "failed_flushes": 0}
+
+    @classmethod
+    def from_env(cls, trajectory_store: TrajectoryStore, db_service: SQLiteService) -> "TrajectoryWriter":
+        return cls(
+            trajectory_store,
+            db_service,
+            flush_interval=float(os.environ.get("TRAJECTORY_STORE_FLUSH_INTERVAL", 30.0)),
+        )
+
+    def start(self) -> None:
+        self.stopping = False
+        self.flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self) -> None:
+        if self.flusher is not None:
+            self.stopping = True
+            self.wakeup.set()
+            await self.flusher
+            self.flusher = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            if self.stopping:
+                break
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("error occured on flushing trajectory states")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            rows = self.trajectory_store.drain_new()
+            if not rows:
+                return
+            if await run_in_threadpool(self.db_service.insert_trajectory_states, rows):
+                self.counters["flushes"] += 1
+                self.counters["flushed"] += len(rows)
+            else:
+                self.counters["failed_flushes"] += 1
+                self.trajectory_store.requeue(rows)
+
+    def stats(self) -> dict:
+        return {"flush_interval": self.flush_interval, **self.counters}
@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+
+from . import metrics
+from .cgol_engine import TRAJECTORY_STORE_BACKENDS, GameOfLifeEngine
+from .data_model import GameResponse
+from .rules import DEFAULT_RULE
+from .trajectory_store import TrajectoryStore
+
+logger = logging.getLogger(__name__)
+
+POOL_KINDS = ("thread", "process")
+
+# fewest words a batch is split into per worker, smaller chunks cost more in dispatch than they save
+MIN_BATCH_CHUNK = 16
+
+# engines of the current worker thread / process keyed by rule, an engine holds per run state and
+# must not be shared between concurrently running workers
+_worker_state = threading.local()
+
+
+def trace_engine(
+    word: str,
+    rule: str,
+    chunk_generations: int,
+    emit: Callable[[list[tuple[int, int, int]]], None],
+    cancelled: threading.Event,
+    engine_options: dict,
+) -> tuple[float, GameResponse | None]:
+    started_at = time.time()
+    steps = get_worker_engine(rule, engine_options).trace_from_word(word)
+    chunk = []
+    try:
+        while True:
+            chunk.append(next(steps))
+            if len(chunk) == chunk_generations:
+                if cancelled.is_set():
+                    return started_at, None
+                emit(chunk)
+                chunk = []
+    except StopIteration as stop:
+        if chunk:
+            emit(chunk)
+        return started_at, stop.value
+
+
+class EngineQueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Engine queue is full, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+def get_worker_engine(rule: str, engine_options: dict) -> GameOfLifeEngine:
+    engines = getattr(_worker_state, "engines", None)
+    if engines is None:
+        engines = _worker_state.engines = {}
+    if rule not in engines:
+        engines[rule] = GameOfLifeEngine(rule=rule, **engine_options)
+    return engines[rule]
+
+
+def run_engine(word: str, rule: str, engine_options: dict) -> tuple[float, GameResponse]:
+    # wall clock start time, comparable with the enqueue time across processes on the same host
+    started_at = time.time()
+    return started_at, get_worker_engine(rule, engine_options).run(word)
+
+
+def warmup_worker(word: str, rule: str, engine_options: dict, barrier, timeout: float) -> None:
+    get_worker_engine(rule, engine_options).run(word)
+    # holds the worker until every worker took a warmup job, so no worker runs two of them
+    barrier.wait(timeout)
+
+
+def run_engine_batch(words: list[str], rule: str, engine_options: dict) -> tuple[float, list[GameResponse]]:
+    started_at = time.time()
+    return started_at, get_worker_engine(rule, engine_options).run_batch(words)
+
+
+class EngineExecutor:
+    """
+    Runs the engine off the event loop on a bounded thread or process pool.
+
+    At most `max_workers + max_queue` runs are admitted at a time, further submissions fail fast with
+    `EngineQueueFullError` instead of queueing without limit. Queue depth and queue wait times are
+    tracked for sizing the pool.
+
+    Worker engines use `backend` (auto selected by default). A `trajectory_store` is shared by the
+    engines of a thread pool, it cannot be shared across the processes of a process pool. Only the
+    "python" and "numpy" backends use it: with a store the auto selected backend is "numpy", an
+    explicit C++ backend is rejected. The band
+    threads of the packed kernel (`num_threads` per engine) default to the cores left per worker, so
+    concurrently running engines do not oversubscribe the CPUs.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        kind: str = "thread",
+        retry_after: int = 1,
+        backend: str | None = None,
+        trajectory_store: TrajectoryStore | None = None,
+        num_threads: int | None = None,
+    ):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown engine pool kind '{kind}'. Expected one of {POOL_KINDS}")
+        if kind == "process" and trajectory_store is not None:
+            raise ValueError("A trajectory store can only be shared by a thread pool")
+        if trajectory_store is not None and backend is None:
+            logger.warning(
+                "Trajectory store enabled, running the engine on the numpy backend instead of the C++ kernels"
+            )
+            backend = "numpy"
+        if trajectory_store is not None and backend not in TRAJECTORY_STORE_BACKENDS:
+            raise ValueError(
+                f"Engine backend '{backend}' does not use the trajectory store. Expected one of {TRAJECTORY_STORE_BACKENDS}"
+            )
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        self.pool: Executor = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cgol-engine")
+            if kind == "thread"
+            else ProcessPoolExecutor(max_workers=max_workers)
+        )
+        # traces hand their chunks to the event loop from the worker, so they always run on threads
+        self.trace_pool: Executor = (
+            self.pool
+            if kind == "thread"
+            else ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cgol-trace")
+        )
+
+        self.trajectory_store = trajectory_store
+        self.num_threads = num_threads if num_threads is not None else max(1, (os.cpu_count() or 1) // max_workers)
+        self.engine_options = {"backend": backend, "num_threads": self.num_threads}
+        if trajectory_store is not None:
+            self.engine_options["trajectory_store"] = trajectory_store
+
+        # settings shared by all worker engines, part of the result cache key
+        probe = GameOfLifeEngine(backend=backend)
+        self.backend = probe.backend
+        self.engine_settings = (probe.max_generations, probe.repeat_threshold, probe.grid_rows, probe.grid_cols)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    @classmethod
+    def from_env(cls, trajectory_store: TrajectoryStore | None = None) -> "EngineExecutor":
+        max_workers = int(os.environ.get("ENGINE_POOL_WORKERS", os.cpu_count() or 1))
+        return cls(
+            max_workers=max_workers,
+            max_queue=int(os.environ.get("ENGINE_QUEUE_SIZE", 4 * max_workers)),
+            kind=os.environ.get("ENGINE_POOL_KIND", "thread"),
+            retry_after=int(os.environ.get("ENGINE_RETRY_AFTER", 1)),
+            backend=os.environ.get("ENGINE_BACKEND") or None,
+            trajectory_store=trajectory_store,
+            num_threads=int(os.environ["ENGINE_BAND_THREADS"]) if os.environ.get("ENGINE_BAND_THREADS") else None,
+        )
+
+    def game_key(self, word: str, rule: str) -> tuple:
+        return (word, rule, *self.engine_settings)
+
+    def _admit(self, num_jobs: int) -> None:
+        with self.lock:
+            if self.in_flight + num_jobs > self.max_workers + self.max_queue:
+                self.counters["rejected"] += num_jobs
+                raise EngineQueueFullError(self.retry_after)
+            self.in_flight += num_jobs
+            self.counters["submitted"] += num_jobs
+
+    def _submit(self, fn, *args, pool: Executor | None = None, kind: str = "word") -> Future:
+        enqueued_at = time.time()
+        try:
+            future = (pool or self.pool).submit(fn, *args, self.engine_options)
+        except BaseException:
+            self._finish(None, enqueued_at, kind)
+            raise
+        # accounted when the job itself is done, a cancelled request does not free a busy worker
+        future.add_done_callback(lambda done: self._finish(done, enqueued_at, kind))
+        return future
+
+    @staticmethod
+    def _add_request_timings(enqueued_at: float, started_at: float) -> None:
+        metrics.add_timing("queue", max(started_at - enqueued_at, 0.0))
+        metrics.add_timing("engine", time.time() - started_at)
+
+    async def run(self, word: str, rule: str) -> GameResponse:
+        self._admit(1)
+        enqueued_at = time.time()
+        started_at, response = await asyncio.wrap_future(self._submit(run_engine, word, rule))
+        self._add_request_timings(enqueued_at, started_at)
+        return response
+
+    async def run_batch(self, words: list[str], rule: str) -> list[GameResponse]:
+        """
+        Runs `words` through the engine's batch path, split in chunks over the workers. All chunks are
+        admitted together or the whole batch is rejected.
+        """
+        if not words:
+            return []
+        num_chunks = max(min(self.max_workers, len(words) // MIN_BATCH_CHUNK), 1)
+        chunk_size = -(-len(words) // num_chunks)
+        chunks = [words[start : start + chunk_size] for start in range(0, len(words), chunk_size)]
+        self._admit(len(chunks))
+
+        enqueued_at = time.time()
+        futures = []
+        for idx, chunk in enumerate(chunks):
+            try:
+                futures.append(self._submit(run_engine_batch, chunk, rule, kind="batch"))
+            except BaseException:
+                # the failed chunk is accounted by `_submit`, the ones never submitted here
+                for _ in chunks[idx + 1 :]:
+                    self._finish(None, time.time(), "batch")
+                raise
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        self._add_request_timings(enqueued_at, min(started_at for started_at, _ in results))
+        return [response for _, responses in results for response in responses]
+
+    async def trace(
+        self, word: str, rule: str, chunk_generations: int
+    ) -> AsyncIterator[list[tuple[int, int, int]] | GameResponse]:
+        """
+        Yields chunks of `(generation, population, births)` while `word` runs, then its GameResponse.
+        Closing the iterator early stops the run at the next chunk.
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def emit(chunk: list[tuple[int, int, int]]) -> None:
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        self._admit(1)
+        future = self._submit(
+            trace_engine, word, rule, chunk_generations, emit, cancelled, pool=self.trace_pool, kind="trace"
+        )
+        # scheduled after the chunks emitted before the job returned
+        done = asyncio.wrap_future(future)
+        done.add_done_callback(lambda _: chunks.put_nowait(None))
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            _, response = done.result()
+            yield response
+        finally:
+            cancelled.set()
+            future.cancel()
+
+    def _finish(self, future: Future | None, enqueued_at: float, kind: str) -> None:
+        finished_at = time.time()
+        with self.lock:
+            self.in_flight -= 1
+            if future is None or future.cancelled() or future.exception() is not None:
+                self.counters["failed"] += 1
+                return
+            started_at, result = future.result()
+            self.counters["completed"] += 1
+            wait = max(started_at - enqueued_at, 0.0)
+            run_time = finished_at - started_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run_time
+
+        metrics.ENGINE_QUEUE_WAIT_SECONDS.observe(wait)
+        metrics.ENGINE_RUN_SECONDS.observe(run_time, self.backend, kind)
+        # a word job returns one response, a batch job a list, a cancelled trace None
+        responses = result if isinstance(result, list) else [result] if result is not None else []
+        num_generations = 0
+        for response in responses:
+            metrics.ENGINE_RUNS.inc(self.backend, response.stop_reason)
+            num_generations += response.num_generations
+        metrics.ENGINE_GENERATIONS.inc(self.backend, amount=num_generations)
+        if run_time > 0:
+            metrics.ENGINE_GENERATIONS_PER_SECOND.observe(num_generations / run_time, self.backend)
+
+    async def warmup(self, word: str = "warmup", rule: str = DEFAULT_RULE, timeout: float = 60.0) -> None:
+        # loads the engine library and builds a worker engine in every worker before the first request,
+        # one job per worker: the jobs wait for each other at a barrier
+        manager = multiprocessing.Manager() if self.kind == "process" else None
+        barrier = threading.Barrier(self.max_workers) if manager is None else manager.Barrier(self.max_workers)
+        try:
+            runs = [
+                asyncio.wrap_future(self.pool.submit(warmup_worker, word, rule, self.engine_options, barrier, timeout))
+                for _ in range(self.max_workers)
+            ]
+            await asyncio.gather(*runs)
+        finally:
+            if manager is not None:
+                manager.shutdown()
+
+    def stats(self) -> dict:
+        with self.lock:
+            completed = self.counters["completed"]
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "num_threads": self.num_threads,
+                "in_flight": self.in_flight,
+                "queue_depth": max(self.in_flight - self.max_workers, 0),
+                **self.counters,
+                "avg_wait_ms": 1000 * self.total_wait / completed if completed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "avg_run_ms": 1000 * self.total_run / completed if completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.trace_pool is not self.pool:
+            self.trace_pool.shutdown(wait=True, cancel_futures=True)
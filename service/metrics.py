@@ -0,0 +1,260 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+# seconds, from sub-millisecond cache hits to multi-second engine runs on large grids
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RATE_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+# durations of the current request by component, reported in its Server-Timing header
+_request_timings: contextvars.ContextVar[dict | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # per label values: count per bucket (last one is +Inf), sum
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][idx] += 1
+            entry[1][0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            values = [(labels, list(counts), total[0]) for labels, (counts, total) in self.values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class CallbackGauges:
+    """
+    Gauges read from `collect` at scrape time, for state other components already track (queue depth,
+    cache counters), so the hot path pays nothing for them. `collect` returns
+    `{name: (documentation, type, value)}`.
+    """
+
+    def __init__(self, collect: Callable[[], dict[str, tuple[str, str, float]]]):
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        for name, (documentation, metric_type, value) in self.collect().items():
+            yield f"# HELP {name} {documentation}"
+            yield f"# TYPE {name} {metric_type}"
+            yield f"{name} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def unregister(self, metric) -> None:
+        with self.lock:
+            if metric in self.metrics:
+                self.metrics.remove(metric)
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics)
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram("cgol_http_request_seconds", "HTTP request duration.", ("method", "route", "status"))
+)
+ENGINE_RUNS = REGISTRY.register(
+    Counter("cgol_engine_runs_total", "Words run through the engine.", ("backend", "stop_reason"))
+)
+ENGINE_GENERATIONS = REGISTRY.register(
+    Counter("cgol_engine_generations_total", "Generations simulated by the engine.", ("backend",))
+)
+ENGINE_RUN_SECONDS = REGISTRY.register(
+    Histogram("cgol_engine_run_seconds", "Engine job duration on a worker, a batch is one job.", ("backend", "kind"))
+)
+ENGINE_GENERATIONS_PER_SECOND = REGISTRY.register(
+    Histogram(
+        "cgol_engine_generations_per_second",
+        "Generations simulated per second of an engine job.",
+        ("backend",),
+        RATE_BUCKETS,
+    )
+)
+ENGINE_QUEUE_WAIT_SECONDS = REGISTRY.register(
+    Histogram("cgol_engine_queue_wait_seconds", "Time engine jobs waited for a worker.")
+)
+DB_SECONDS = REGISTRY.register(Histogram("cgol_db_seconds", "Database operation duration.", ("operation",)))
+DB_ERRORS = REGISTRY.register(Counter("cgol_db_errors_total", "Failed database operations.", ("operation",)))
+DB_FLUSH_SECONDS = REGISTRY.register(Histogram("cgol_db_flush_seconds", "Duration of write-behind flushes."))
+DB_FLUSH_ROWS = REGISTRY.register(
+    Histogram("cgol_db_flush_rows", "Results stored per write-behind flush.", buckets=(1, 10, 100, 1000, 10000))
+)
+
+
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set({})
+
+
+def end_request_timings(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def request_timings() -> dict | None:
+    return _request_timings.get()
+
+
+def add_timing(component: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+
+def add_note(component: str, description: str) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[component] = description
+
+
+def server_timing_header(timings: dict, total: float) -> str:
+    entries = [
+        f'{component};desc="{value}"' if isinstance(value, str) else f"{component};dur={1000 * value:.2f}"
+        for component, value in timings.items()
+    ]
+    entries.append(f"total;dur={1000 * total:.2f}")
+    return ", ".join(entries)
+
+
+@contextmanager
+def timed(histogram: Histogram, *labels: str, component: str | None = None):
+    """
+    Observes the duration of the block in `histogram` under `labels` and adds it to the current
+    request's Server-Timing `component`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, *labels)
+        if component is not None:
+            add_timing(component, elapsed)
+
+
+def timed_call(histogram: Histogram, *labels: str, component: str | None = None):
+    """
+    Decorator timing every call of the function with `timed`.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(histogram, *labels, component=component):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into `cgol_http_request_seconds` and adding a
+    `Server-Timing` header with the durations components recorded for it (db, queue, engine, ...).
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = start_request_timings()
+        timings = request_timings()
+        profile = self.profiler.start_request() if self.profiler is not None else None
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - start)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            # unmatched paths share one label, so arbitrary urls cannot grow the label set
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, scope["method"], route_path, str(status))
+            if profile is not None:
+                self.profiler.finish_request(profile, f"{scope['method']} {scope['path']}", elapsed, timings)
+            end_request_timings(token)
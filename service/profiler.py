@@ -0,0 +1,101 @@
+import heapq
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+# leaf frames of threads waiting for work, not worth a sample
+IDLE_FRAMES = ("threading.py:wait:", "queue.py:get:", "selectors.py:select:", "thread.py:_worker:")
+
+
+def collapse_stack(frame, max_depth: int = 64) -> str:
+    # root first, `;` separated, the collapsed format flame graph tools read
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler keeping the stack profiles of the `keep` slowest requests.
+
+    While profiled requests are in flight a background thread samples the stacks of all threads every
+    `interval` seconds (event loop, engine workers and database threads alike) and adds them to every
+    request in flight, so under concurrency a profile also holds samples of its neighbours. A
+    `sample_rate` below 1 profiles only that fraction of requests. Nothing runs while no profiled
+    request is in flight.
+    """
+
+    def __init__(self, interval: float = 0.005, keep: int = 10, sample_rate: float = 1.0, top_stacks: int = 25):
+        self.interval = interval
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.top_stacks = top_stacks
+        self.active: dict[int, Counter] = {}
+        self.slowest: list[tuple[float, int, dict]] = []
+        self.ids = count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, name="cgol-profiler", daemon=True)
+        self.sampler.start()
+
+    def start_request(self) -> int | None:
+        request_id = next(self.ids)
+        # deterministic sampling by request number, cheaper than a random draw
+        if self.sample_rate < 1 and (request_id * self.sample_rate) % 1 >= self.sample_rate:
+            return None
+        with self.lock:
+            self.active[request_id] = Counter()
+            # under the lock, so the sampler cannot clear it right after finding no request in flight
+            self.wakeup.set()
+        return request_id
+
+    def finish_request(self, request_id: int | None, name: str, duration: float, timings: dict | None) -> None:
+        if request_id is None:
+            return
+        with self.lock:
+            samples = self.active.pop(request_id)
+            if len(self.slowest) >= self.keep and duration <= self.slowest[0][0]:
+                return
+            profile = {
+                "request": name,
+                "duration_ms": 1000 * duration,
+                "timings": dict(timings or {}),
+                "num_samples": sum(samples.values()),
+                "stacks": dict(samples.most_common(self.top_stacks)),
+            }
+            if len(self.slowest) >= self.keep:
+                heapq.heapreplace(self.slowest, (duration, request_id, profile))
+            else:
+                heapq.heappush(self.slowest, (duration, request_id, profile))
+
+    def profiles(self) -> list[dict]:
+        with self.lock:
+            return [profile for _, _, profile in sorted(self.slowest, reverse=True)]
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        leaf = f"{frame.f_code.co_filename.rsplit('/', 1)[-1]}:{frame.f_code.co_name}:"
+        return leaf.startswith(IDLE_FRAMES)
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                if not self.active:
+                    self.wakeup.clear()
+                    continue
+            stacks = [
+                collapse_stack(frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id and not self._is_idle(frame)
+            ]
+            with self.lock:
+                for samples in self.active.values():
+                    samples.update(stacks)
+            time.sleep(self.interval)
@@ -0,0 +1,141 @@
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from starlette.concurrency import run_in_threadpool
+
+from . import metrics
+from .db.db_service import SQLiteService
+from .db.result_snapshot import ResultSnapshot
+from .db.result_store import ResultStore
+from .db.trajectory_writer import TrajectoryWriter
+from .executor import EngineExecutor
+from .result_cache import ResultCache
+from .trajectory_store import TrajectoryStore
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # resources shared by all requests: created and warmed up once, released on shutdown
+    startup_start = time.perf_counter()
+    app.state.db_service = await run_in_threadpool(
+        SQLiteService, os.environ["ENGINE_DB_URL"], int(os.environ.get("ENGINE_DB_POOL_SIZE", 5))
+    )
+    # optional read-only results exported by `run_snapshot_export.py`, memory mapped and consulted before the database
+    snapshot_path = os.environ.get("RESULT_SNAPSHOT_PATH")
+    snapshot = ResultSnapshot(snapshot_path) if snapshot_path and os.path.exists(snapshot_path) else None
+    if snapshot_path and snapshot is None:
+        logger.warning("Result snapshot %s not found, results are read from the database only", snapshot_path)
+    # requests read and write results through the store, stored results are written behind in batches
+    app.state.result_store = ResultStore.from_env(app.state.db_service, snapshot=snapshot)
+    app.state.result_store.start()
+    db_ready = time.perf_counter()
+
+    result_cache_ttl = os.environ.get("RESULT_CACHE_TTL")
+    app.state.result_cache = ResultCache(
+        max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 100_000)),
+        ttl=float(result_cache_ttl) if result_cache_ttl else None,
+    )
+    # optional, solved board states are only looked up by the "python" and "numpy" backends: the executor
+    # switches an auto selected backend to "numpy" and rejects an explicit C++ backend
+    trajectory_store_size = int(os.environ.get("TRAJECTORY_STORE_SIZE", 0))
+    app.state.trajectory_store = TrajectoryStore(trajectory_store_size) if trajectory_store_size > 0 else None
+    persist_trajectories = (
+        app.state.trajectory_store is not None and os.environ.get("TRAJECTORY_STORE_PERSIST", "1") == "1"
+    )
+    app.state.trajectory_writer = None
+    if persist_trajectories:
+        rows = await run_in_threadpool(app.state.db_service.load_trajectory_states, trajectory_store_size)
+        app.state.trajectory_store.load(rows)
+        # new states are written periodically, not only on shutdown
+        app.state.trajectory_writer = TrajectoryWriter.from_env(app.state.trajectory_store, app.state.db_service)
+        app.state.trajectory_writer.start()
+
+    app.state.engine_executor = EngineExecutor.from_env(trajectory_store=app.state.trajectory_store)
+    await app.state.engine_executor.warmup()
+    warmup_done = time.perf_counter()
+
+    app.state.startup_timings = {
+        "db_ms": 1000 * (db_ready - startup_start),
+        "warmup_ms": 1000 * (warmup_done - db_ready),
+        "startup_ms": 1000 * (warmup_done - startup_start),
+    }
+    logger.info(
+        "Service resources ready in %.1f ms (db %.1f ms, engine warmup %.1f ms)",
+        app.state.startup_timings["startup_ms"],
+        app.state.startup_timings["db_ms"],
+        app.state.startup_timings["warmup_ms"],
+    )
+
+    gauges = metrics.REGISTRY.register(metrics.CallbackGauges(lambda: collect_gauges(app)))
+    try:
+        yield
+    finally:
+        metrics.REGISTRY.unregister(gauges)
+        await run_in_threadpool(app.state.engine_executor.shutdown)
+        await app.state.result_store.close()
+        if snapshot is not None:
+            snapshot.close()
+        if app.state.trajectory_writer is not None:
+            await app.state.trajectory_writer.close()
+        app.state.db_service.dispose()
+
+
+def collect_gauges(app: FastAPI) -> dict[str, tuple[str, str, float]]:
+    engine_stats = app.state.engine_executor.stats()
+    cache_stats = app.state.result_cache.stats()
+    gauges = {
+        "cgol_engine_in_flight": ("Engine jobs running or queued.", "gauge", engine_stats["in_flight"]),
+        "cgol_engine_queue_depth": ("Engine jobs waiting for a worker.", "gauge", engine_stats["queue_depth"]),
+        "cgol_engine_rejected_total": ("Engine jobs rejected by a full queue.", "counter", engine_stats["rejected"]),
+        "cgol_result_cache_entries": ("Results in the in-process cache.", "gauge", cache_stats["entries"]),
+        "cgol_result_cache_in_flight": ("Results being computed.", "gauge", cache_stats["in_flight"]),
+    }
+    for counter in ("hits", "misses", "coalesced", "evictions", "expirations"):
+        gauges[f"cgol_result_cache_{counter}_total"] = (f"Result cache {counter}.", "counter", cache_stats[counter])
+    store_stats = app.state.result_store.stats()
+    gauges["cgol_db_write_queue_depth"] = ("Results waiting to be stored.", "gauge", store_stats["pending"])
+    gauges["cgol_db_write_queue_flushing"] = ("Results being stored.", "gauge", store_stats["flushing"])
+    for counter in ("queued", "flushed", "flushes", "failed_flushes", "pending_hits"):
+        gauges[f"cgol_db_write_queue_{counter}_total"] = (f"Write queue {counter}.", "counter", store_stats[counter])
+    if store_stats["snapshot"] is not None:
+        snapshot_stats = store_stats["snapshot"]
+        gauges["cgol_result_snapshot_records"] = ("Results in the snapshot.", "gauge", snapshot_stats["records"])
+        for counter in ("hits", "misses"):
+            gauges[f"cgol_result_snapshot_{counter}_total"] = (
+                f"Snapshot {counter}.",
+                "counter",
+                snapshot_stats[counter],
+            )
+    if app.state.trajectory_store is not None:
+        trajectory_store = app.state.trajectory_store
+        for name, value in trajectory_store.stats().items():
+            if name in trajectory_store.counters:
+                gauges[f"cgol_trajectory_store_{name}_total"] = (f"Trajectory store {name}.", "counter", value)
+            else:
+                gauges[f"cgol_trajectory_store_{name}"] = (f"Trajectory store {name}.", "gauge", value)
+    return gauges
+
+
+def get_db_service(request: Request) -> SQLiteService:
+    return request.app.state.db_service
+
+
+def get_result_store(request: Request) -> ResultStore:
+    return request.app.state.result_store
+
+
+def get_engine_executor(request: Request) -> EngineExecutor:
+    return request.app.state.engine_executor
+
+
+def get_result_cache(request: Request) -> ResultCache:
+    return request.app.state.result_cache
+
+
+def get_trajectory_store(request: Request) -> TrajectoryStore | None:
+    return request.app.state.trajectory_store
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+from . import metrics
+from .data_model import GameResponse
+
+
+class ResultCache:
+    """
+    In-process LRU of game results keyed by the full game configuration, checked before the database.
+
+    Bounded by `max_entries` (a cached result takes a few hundred bytes), entries optionally expire
+    after `ttl` seconds. Concurrent misses on the same key share a single in-flight computation, which
+    keeps running even if the request that started it is cancelled.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[GameResponse, float]] = OrderedDict()
+        self.in_flight: dict[Hashable, asyncio.Future] = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable) -> GameResponse | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.counters["expirations"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return response
+
+    def put(self, key: Hashable, response: GameResponse) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self.entries[key] = (response, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[GameResponse]]) -> GameResponse:
+        response = self.get(key)
+        if response is not None:
+            self.counters["hits"] += 1
+            metrics.add_note("cache", "hit")
+            return response
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+            metrics.add_note("cache", "coalesced")
+        else:
+            self.counters["misses"] += 1
+            metrics.add_note("cache", "miss")
+            task = asyncio.ensure_future(compute())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_computed(key, done))
+        return await asyncio.shield(task)
+
+    async def get_or_compute_many(
+        self, keys: list[Hashable], compute_many: Callable[[list[Hashable]], Awaitable[list[GameResponse]]]
+    ) -> list[GameResponse]:
+        """
+        Batched `get_or_compute`: keys not cached and not in flight are computed by a single
+        `compute_many` call, which concurrent lookups of any of those keys coalesce onto.
+        """
+        results: dict[Hashable, GameResponse] = {}
+        pending: dict[Hashable, asyncio.Future] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            response = self.get(key)
+            if response is not None:
+                self.counters["hits"] += 1
+                results[key] = response
+            elif key in self.in_flight:
+                self.counters["coalesced"] += 1
+                pending[key] = self.in_flight[key]
+            else:
+                self.counters["misses"] += 1
+                missing.append(key)
+        metrics.add_note("cache", f"{len(results)} hit, {len(pending)} coalesced, {len(missing)} miss")
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = [loop.create_future() for _ in missing]
+            for key, future in zip(missing, futures):
+                self.in_flight[key] = future
+                future.add_done_callback(lambda done, key=key: self._on_computed(key, done))
+            pending.update(zip(missing, futures))
+            task = asyncio.ensure_future(compute_many(missing))
+            task.add_done_callback(lambda done: self._resolve_many(futures, done))
+
+        for key, future in pending.items():
+            results[key] = await asyncio.shield(future)
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def _resolve_many(futures: list[asyncio.Future], task: asyncio.Task) -> None:
+        for idx, future in enumerate(futures):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result()[idx])
+
+    def _on_computed(self, key: Hashable, task: asyncio.Future) -> None:
+        self.in_flight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "in_flight": len(self.in_flight),
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+        }
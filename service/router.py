@@ -1,19 +1,51 @@
-import os
+import asyncio
+import base64
+import binascii
+import json
+import time
+from typing import AsyncIterator
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from .cgol_engine import GameOfLifeEngine
-from .data_model import GameRequest, GameResponse
+from . import metrics
+from .cgol_engine import STOP_REASONS
+from .data_model import (
+    GameRequest,
+    GameResponse,
+    GamesRequest,
+    GamesResponse,
+    ResultsPage,
+    TraceRequest,
+    WordGameResponse,
+)
 from .db.db_service import SQLiteService
+from .db.result_store import ResultStore
+from .executor import EngineExecutor, EngineQueueFullError
+from .resources import (
+    get_db_service,
+    get_engine_executor,
+    get_result_cache,
+    get_result_store,
+    get_trajectory_store,
+)
+from .result_cache import ResultCache
+from .rules import DEFAULT_RULE, parse_rule
+from .trajectory_store import TrajectoryStore
 
 router = APIRouter(prefix="/cgol")
+# at the root, where Prometheus scrapes by default
+metrics_router = APIRouter()
 
+MAX_BATCH_WORDS = 10_000
+MAX_RESULTS_PAGE = 1000
+RESULT_ORDERS = ("score", "num_generations")
+# words per engine job of a streamed batch, small enough for the first results to arrive quickly
+STREAM_CHUNK_WORDS = 16
 
-@router.post("/game")
-async def run_game(request: GameRequest) -> GameResponse:
-    word = request.word
-    db_service = SQLiteService(os.environ["ENGINE_DB_URL"])
 
+def validate_word(word) -> None:
     if not isinstance(word, str):
         raise HTTPException(status_code=400, detail="Provided word must be a string")
     if not word:
@@ -21,16 +53,320 @@ async def run_game(request: GameRequest) -> GameResponse:
     if not word.isascii():
         raise HTTPException(status_code=400, detail="Provided word should contain only ASCII characters")
 
-    db_response = db_service.get_response(word)
-    if db_response is None:
-        engine = GameOfLifeEngine()
-        response = engine.run_from_word_cpp(word)
-        db_service.insert_response(word=word, response=response)
-    else:
-        response = GameResponse(
-            num_generations=db_response.num_generations,
-            score=db_response.score,
-            stop_reason=db_response.stop_reason,
+
+def validate_rule(rule: str) -> str:
+    try:
+        # canonical rulestring, so equivalent spellings share cached results
+        return parse_rule(rule).rulestring
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def load_or_run_many(
+    words: list[str], rule: str, result_store: ResultStore, engine_executor: EngineExecutor
+) -> list[GameResponse]:
+    responses = await result_store.get_responses(words, rule=rule)
+
+    engine_words = [word for word in words if word not in responses]
+    if engine_words:
+        engine_responses = dict(zip(engine_words, await engine_executor.run_batch(engine_words, rule)))
+        await result_store.put_many(engine_responses, rule=rule)
+        responses.update(engine_responses)
+    return [responses[word] for word in words]
+
+
+def validate_games_request(request: GamesRequest) -> tuple[list[str], str]:
+    if not request.words:
+        raise HTTPException(status_code=400, detail="Provide at least one word")
+    if len(request.words) > MAX_BATCH_WORDS:
+        raise HTTPException(status_code=400, detail=f"Provide at most {MAX_BATCH_WORDS} words")
+    if request.top_k is not None and request.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k should be at least 1")
+    for word in request.words:
+        validate_word(word)
+    return list(dict.fromkeys(request.words)), validate_rule(request.rule)
+
+
+def ndjson_line(record: dict) -> str:
+    return json.dumps(record) + "\n"
+
+
+@router.post("/game")
+async def run_game(
+    request: GameRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    engine_executor: EngineExecutor = Depends(get_engine_executor),
+    result_cache: ResultCache = Depends(get_result_cache),
+) -> GameResponse:
+    word = request.word
+    validate_word(word)
+    rule = validate_rule(request.rule)
+
+    async def load_or_run() -> GameResponse:
+        stored = await result_store.get_response(word, rule=rule)
+        if stored is not None:
+            return stored
+
+        response = await engine_executor.run(word, rule)
+        await result_store.put(word, response, rule=rule)
+        return response
+
+    try:
+        return await result_cache.get_or_compute(engine_executor.game_key(word, rule), load_or_run)
+    except EngineQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+@router.post("/games")
+async def run_games(
+    request: GamesRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    engine_executor: EngineExecutor = Depends(get_engine_executor),
+    result_cache: ResultCache = Depends(get_result_cache),
+) -> GamesResponse:
+    words, rule = validate_games_request(request)
+
+    try:
+        responses = await result_cache.get_or_compute_many(
+            [engine_executor.game_key(word, rule) for word in words],
+            lambda keys: load_or_run_many([key[0] for key in keys], rule, result_store, engine_executor),
         )
+    except EngineQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    results = {word: WordGameResponse(word=word, **response.model_dump()) for word, response in zip(words, responses)}
+    if request.top_k is not None:
+        return GamesResponse(
+            results=sorted(results.values(), key=lambda result: result.score, reverse=True)[: request.top_k]
+        )
+    # computed once per distinct word, answered once per requested word in request order
+    return GamesResponse(results=[results[word] for word in request.words])
+
+
+@router.post("/games/stream")
+async def stream_games(
+    request: GamesRequest,
+    result_store: ResultStore = Depends(get_result_store),
+    engine_executor: EngineExecutor = Depends(get_engine_executor),
+    result_cache: ResultCache = Depends(get_result_cache),
+) -> StreamingResponse:
+    """
+    NDJSON variant of `/games`: a `result` line per distinct word as soon as its chunk is done (in completion
+    order), then a `summary` line with the `top_k` (default 1) best words. At most one chunk per
+    worker runs at a time, chunks not started yet are dropped when the client disconnects.
+    """
+    words, rule = validate_games_request(request)
+    top_k = request.top_k or 1
+
+    async def run_chunk(chunk: list[str]) -> list[WordGameResponse]:
+        while True:
+            try:
+                responses = await result_cache.get_or_compute_many(
+                    [engine_executor.game_key(word, rule) for word in chunk],
+                    lambda keys: load_or_run_many([key[0] for key in keys], rule, result_store, engine_executor),
+                )
+            except EngineQueueFullError as e:
+                # the stream already started, back off instead of failing it
+                await asyncio.sleep(e.retry_after)
+                continue
+            return [WordGameResponse(word=word, **response.model_dump()) for word, response in zip(chunk, responses)]
+
+    async def lines() -> AsyncIterator[str]:
+        started_at = time.perf_counter()
+        chunks = [words[start : start + STREAM_CHUNK_WORDS] for start in range(0, len(words), STREAM_CHUNK_WORDS)]
+        pending: set[asyncio.Task] = set()
+        best: list[WordGameResponse] = []
+        try:
+            while chunks or pending:
+                while chunks and len(pending) < engine_executor.max_workers:
+                    pending.add(asyncio.ensure_future(run_chunk(chunks.pop(0))))
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results = task.result()
+                    for result in results:
+                        yield ndjson_line({"type": "result", **result.model_dump()})
+                    best = sorted(best + results, key=lambda result: result.score, reverse=True)[:top_k]
+            yield ndjson_line(
+                {
+                    "type": "summary",
+                    "num_words": len(words),
+                    "rule": rule,
+                    "best": [result.model_dump() for result in best],
+                    "elapsed_ms": 1000 * (time.perf_counter() - started_at),
+                }
+            )
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/game/trace")
+async def trace_game(
+    request: TraceRequest,
+    engine_executor: EngineExecutor = Depends(get_engine_executor),
+) -> StreamingResponse:
+    """
+    Streams the population and births of every generation of a game as NDJSON `generations` lines of
+    `chunk_generations` generations each, then a `summary` line with the final result. The run stops
+    when the client disconnects.
+    """
+    validate_word(request.word)
+    rule = validate_rule(request.rule)
+    if request.chunk_generations < 1:
+        raise HTTPException(status_code=400, detail="chunk_generations should be at least 1")
+    started_at = time.perf_counter()
+    try:
+        # admitted before the response starts, so a full queue is still a 503
+        trace = engine_executor.trace(request.word, rule, request.chunk_generations)
+        first_chunk = await anext(trace)
+    except EngineQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    async def lines() -> AsyncIterator[str]:
+        chunk = first_chunk
+        try:
+            while not isinstance(chunk, GameResponse):
+                generations = [
+                    {"generation": generation, "population": population, "births": births}
+                    for generation, population, births in chunk
+                ]
+                yield ndjson_line({"type": "generations", "generations": generations})
+                chunk = await anext(trace)
+            yield ndjson_line(
+                {
+                    "type": "summary",
+                    "word": request.word,
+                    "rule": rule,
+                    **chunk.model_dump(),
+                    "elapsed_ms": 1000 * (time.perf_counter() - started_at),
+                }
+            )
+        finally:
+            await trace.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def encode_cursor(value: int, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(value), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/results")
+async def get_results(
+    rule: str = DEFAULT_RULE,
+    stop_reason: str | None = None,
+    min_generations: int | None = None,
+    max_generations: int | None = None,
+    min_score: int | None = None,
+    max_score: int | None = None,
+    order_by: str = "score",
+    order: str = "desc",
+    limit: int = Query(50, ge=1, le=MAX_RESULTS_PAGE),
+    cursor: str | None = None,
+    db_service: SQLiteService = Depends(get_db_service),
+) -> ResultsPage:
+    """
+    Stored results filtered by stop reason, generation and score bounds, ordered by `order_by`.
+    Keyset paginated: a full page comes with a `next_cursor` to pass as `cursor` for the next one.
+    """
+    rule = validate_rule(rule)
+    if stop_reason is not None and stop_reason not in STOP_REASONS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown stop reason '{stop_reason}'. Expected one of {STOP_REASONS}"
+        )
+    if order_by not in RESULT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown order_by '{order_by}'. Expected one of {RESULT_ORDERS}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order should be 'asc' or 'desc'")
+
+    rows = await run_in_threadpool(
+        db_service.query_responses,
+        rule=rule,
+        order_by=order_by,
+        descending=order == "desc",
+        limit=limit,
+        stop_reason=stop_reason,
+        min_generations=min_generations,
+        max_generations=max_generations,
+        min_score=min_score,
+        max_score=max_score,
+        after=decode_cursor(cursor) if cursor is not None else None,
+    )
+    results = [
+        WordGameResponse(
+            word=row.word, num_generations=row.num_generations, score=row.score, stop_reason=row.stop_reason
+        )
+        for row in rows
+    ]
+    next_cursor = encode_cursor(getattr(rows[-1], order_by), rows[-1].id) if len(rows) == limit else None
+    return ResultsPage(results=results, next_cursor=next_cursor)
+
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    rule: str = DEFAULT_RULE,
+    k: int = Query(10, ge=1, le=MAX_RESULTS_PAGE),
+    stop_reason: str | None = None,
+    order_by: str = "score",
+    db_service: SQLiteService = Depends(get_db_service),
+) -> GamesResponse:
+    """
+    The `k` best stored words by `order_by`, optionally of one stop reason.
+    """
+    page = await get_results(
+        rule=rule,
+        stop_reason=stop_reason,
+        min_generations=None,
+        max_generations=None,
+        min_score=None,
+        max_score=None,
+        order_by=order_by,
+        order="desc",
+        limit=k,
+        cursor=None,
+        db_service=db_service,
+    )
+    return GamesResponse(results=page.results)
+
+
+@router.get("/engine/stats")
+async def get_engine_stats(request: Request, engine_executor: EngineExecutor = Depends(get_engine_executor)) -> dict:
+    return {**engine_executor.stats(), "startup": request.app.state.startup_timings}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(result_cache: ResultCache = Depends(get_result_cache)) -> dict:
+    return result_cache.stats()
+
+
+@router.get("/trajectories/stats")
+async def get_trajectory_stats(trajectory_store: TrajectoryStore | None = Depends(get_trajectory_store)) -> dict:
+    return trajectory_store.stats() if trajectory_store is not None else {"enabled": False}
+
+
+@router.get("/db/stats")
+async def get_db_stats(result_store: ResultStore = Depends(get_result_store)) -> dict:
+    return result_store.stats()
+
+
+@router.get("/profiles")
+async def get_profiles(request: Request) -> dict:
+    profiler = request.app.state.profiler
+    if profiler is None:
+        return {"enabled": False, "profiles": []}
+    return {"enabled": True, "profiles": await run_in_threadpool(profiler.profiles)}
+
 
-    return response
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,64 @@
+import re
+
+import numpy as np
+
+DEFAULT_RULE = "B3/S23"
+
+_BS_PATTERN = re.compile(r"^B([0-8]*)/S([0-8]*)$")
+_SB_PATTERN = re.compile(r"^([0-8]*)/([0-8]*)$")
+
+
+class LifeRule:
+    """
+    Life-like cellular automaton rule in B/S notation, e.g. "B3/S23" (Conway), "B36/S23" (HighLife)
+    or "B2/S" (Seeds). The traditional S/B form "23/3" is accepted as well.
+
+    A rule is compiled into transition tables the stepping kernels index directly: `table` maps
+    `9 * alive + live_neighbours` to the next cell state. The C++ kernels take the `birth_mask` and
+    `survival_mask` bit masks (bit n set when n live neighbours give birth or survive).
+    """
+
+    def __init__(self, birth: frozenset[int], survival: frozenset[int]):
+        self.birth = birth
+        self.survival = survival
+        self.rulestring = f"B{''.join(map(str, sorted(birth)))}/S{''.join(map(str, sorted(survival)))}"
+
+        self.birth_mask = sum(1 << num_neighbours for num_neighbours in birth)
+        self.survival_mask = sum(1 << num_neighbours for num_neighbours in survival)
+
+        self.table = np.zeros(18, dtype=np.uint8)
+        self.table[list(birth)] = 1
+        self.table[[9 + num_neighbours for num_neighbours in survival]] = 1
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LifeRule) and self.rulestring == other.rulestring
+
+    def __hash__(self) -> int:
+        return hash(self.rulestring)
+
+    def __repr__(self) -> str:
+        return f"LifeRule('{self.rulestring}')"
+
+    @property
+    def is_conway(self) -> bool:
+        return self.rulestring == DEFAULT_RULE
+
+    def next_state(self, alive: int, num_neighbours: int) -> int:
+        return int(self.table[9 * alive + num_neighbours])
+
+
+def parse_rule(rulestring: str) -> LifeRule:
+    """
+    Parses a B/S ("B36/S23") or S/B ("23/36") rulestring, case insensitive. Raises ValueError on
+    anything else.
+    """
+    normalized = rulestring.strip().upper()
+    match = _BS_PATTERN.match(normalized)
+    if match is not None:
+        birth, survival = match.groups()
+    else:
+        match = _SB_PATTERN.match(normalized)
+        if match is None:
+            raise ValueError(f"Invalid rule '{rulestring}', expected B/S notation like '{DEFAULT_RULE}'")
+        survival, birth = match.groups()
+    return LifeRule(frozenset(map(int, birth)), frozenset(map(int, survival)))
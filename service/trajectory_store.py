@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .data_model import GameResponse
+
+# Packed states a single run keeps for recording its trajectory, beyond that it only does lookups
+MAX_TRAJECTORY_BYTES = 64 << 20
+
+# state key -> (remaining generations, remaining births, stop reason)
+Outcome = tuple[int, int, str]
+
+
+def pack_state(grid: np.ndarray) -> bytes:
+    return np.packbits(grid != 0).tobytes()
+
+
+class TrajectoryStore:
+    """
+    Outcomes of board states seen in earlier runs: how many generations and births remain from a state
+    until the run stops, and why. Shared by all engines with the same `config` (rule, repeat threshold
+    and grid size), so a run reaching a solved state jumps straight to the answer.
+
+    Only states whose outcome does not depend on the generations before them are stored: states of
+    runs that ended in extinction or a persistent state, and the states before the cycle of runs that
+    ended in a repeated pattern. Such a state is not part of a cycle, so no later state can equal a
+    state from before it and the stop conditions only ever compare states of its own future. States
+    of a cycle are skipped, the repeat is detected relative to where the cycle was entered.
+
+    States are keyed by their packed cells, so a hit is an exact match. The store is bounded by
+    `max_entries` with LRU eviction and is safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 1_000_000):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple[str, bytes], Outcome] = OrderedDict()
+        # recorded since the last `drain_new`, for persisting
+        self.new_keys: set[tuple[str, bytes]] = set()
+        self.lock = threading.Lock()
+        self.counters = {"lookups": 0, "hits": 0, "recorded": 0, "evictions": 0, "skipped_generations": 0}
+
+    def lookup(self, config: str, state: bytes) -> Outcome | None:
+        key = (config, state)
+        with self.lock:
+            self.counters["lookups"] += 1
+            outcome = self.entries.get(key)
+            if outcome is None:
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            self.counters["skipped_generations"] += outcome[0]
+            return outcome
+
+    def record(
+        self,
+        config: str,
+        trajectory: list[tuple[bytes, int, int]],
+        end_generation: int,
+        end_score: int,
+        stop_reason: str,
+    ) -> None:
+        """
+        Stores the outcome of every `(state, generation, score at generation)` of `trajectory` for a
+        run that stopped at `end_generation` with `end_score`.
+        """
+        with self.lock:
+            for state, generation, score in trajectory:
+                key = (config, state)
+                if key not in self.entries:
+                    self.counters["recorded"] += 1
+                    self.new_keys.add(key)
+                self.entries[key] = (end_generation - generation, end_score - score, stop_reason)
+                self.entries.move_to_end(key)
+            self._evict()
+
+    def load(self, rows: list[tuple[str, bytes, int, int, str]]) -> None:
+        with self.lock:
+            for config, state, remaining_generations, remaining_births, stop_reason in rows:
+                self.entries[(config, state)] = (remaining_generations, remaining_births, stop_reason)
+            self._evict()
+
+    def drain_new(self) -> list[tuple[str, bytes, int, int, str]]:
+        with self.lock:
+            rows = [(*key, *self.entries[key]) for key in self.new_keys if key in self.entries]
+            self.new_keys.clear()
+        return rows
+
+    def requeue(self, rows: list[tuple[str, bytes, int, int, str]]) -> None:
+        # rows of `drain_new` that could not be stored, kept for the next attempt unless evicted meanwhile
+        with self.lock:
+            for config, state, *_ in rows:
+                if (config, state) in self.entries:
+                    self.new_keys.add((config, state))
+
+    def _evict(self) -> None:
+        while len(self.entries) > self.max_entries:
+            key, _ = self.entries.popitem(last=False)
+            self.new_keys.discard(key)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "max_entries": self.max_entries, **self.counters}
+
+
+class TrajectoryRecorder:
+    """
+    Per run companion of a `TrajectoryStore`: `check` is called with every state that did not stop
+    the run and returns the final response when the state's outcome is known, `finish` records the
+    run's states once it stopped. Without a store both are no-ops.
+    """
+
+    def __init__(self, store: TrajectoryStore | None, config: str, max_generations: int, repeat_threshold: int):
+        self.store = store
+        self.config = config
+        self.max_generations = max_generations
+        self.repeat_threshold = repeat_threshold
+        self.trajectory: list[tuple[bytes, int, int]] | None = [] if store is not None else None
+        self.trajectory_bytes = 0
+
+    def check(self, grid: np.ndarray, generation: int, score: int) -> GameResponse | None:
+        if self.store is None:
+            return None
+        state = pack_state(grid)
+        outcome = self.store.lookup(self.config, state)
+        if outcome is not None and generation + outcome[0] <= self.max_generations:
+            remaining_generations, remaining_births, stop_reason = outcome
+            response = GameResponse(
+                num_generations=generation + remaining_generations,
+                score=score + remaining_births,
+                stop_reason=stop_reason,
+            )
+            # the states leading to a stored state are not part of a cycle either
+            if self.trajectory:
+                self.store.record(self.config, self.trajectory, response.num_generations, response.score, stop_reason)
+            return response
+
+        if self.trajectory is not None:
+            self.trajectory.append((state, generation, score))
+            self.trajectory_bytes += len(state)
+            if self.trajectory_bytes > MAX_TRAJECTORY_BYTES:
+                self.trajectory = None
+        return None
+
+    def finish(self, response: GameResponse, grid: np.ndarray) -> GameResponse:
+        if self.store is None or not self.trajectory:
+            return response
+
+        num_transient = 0
+        if response.stop_reason in ("extinction", "persistent_state"):
+            num_transient = len(self.trajectory)
+        elif response.stop_reason == "repeated_pattern":
+            # states from the first occurrence of the repeated state on form the cycle
+            state = pack_state(grid)
+            for idx in range(len(self.trajectory) - 1, max(len(self.trajectory) - self.repeat_threshold, 0) - 1, -1):
+                if self.trajectory[idx][0] == state:
+                    num_transient = idx
+                    break
+
+        if num_transient > 0:
+            self.store.record(
+                self.config,
+                self.trajectory[:num_transient],
+                response.num_generations,
+                response.score,
+                response.stop_reason,
+            )
+        return response
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from service.app import app
+from service.cgol_engine import GameOfLifeEngine
+
+WORDS = ["a", "b", "hello", "a", "monkey", "hello"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENGINE_DB_URL", str(tmp_path / "service.db"))
+    monkeypatch.setenv("ENGINE_POOL_WORKERS", "2")
+    with TestClient(app) as client:
+        yield client
+
+
+def expected_result(word: str, rule: str = "B3/S23") -> dict:
+    return {"word": word, **GameOfLifeEngine(rule=rule).run(word).model_dump()}
+
+
+def test_game(client):
+    response = client.post("/cgol/game", json={"word": "hello"})
+
+    assert response.status_code == 200
+    assert {"word": "hello", **response.json()} == expected_result("hello")
+
+
+def test_games_answers_every_word_in_request_order(client):
+    response = client.post("/cgol/games", json={"words": WORDS})
+
+    assert response.status_code == 200
+    assert response.json()["results"] == [expected_result(word) for word in WORDS]
+
+
+def test_games_computes_duplicates_once(client):
+    client.post("/cgol/games", json={"words": WORDS})
+
+    # the distinct words are cache misses, everything else is a hit or coalesced
+    assert client.get("/cgol/cache/stats").json()["misses"] == len(set(WORDS))
+
+
+def test_games_top_k_returns_distinct_best_words(client):
+    response = client.post("/cgol/games", json={"words": WORDS, "top_k": 2})
+
+    expected = sorted((expected_result(word) for word in dict.fromkeys(WORDS)), key=lambda r: r["score"], reverse=True)
+    assert response.json()["results"] == expected[:2]
+
+
+def test_games_with_rule(client):
+    response = client.post("/cgol/games", json={"words": WORDS, "rule": "b36/s23"})
+
+    assert response.json()["results"] == [expected_result(word, "B36/S23") for word in WORDS]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"words": []},
+        {"words": ["hello", ""]},
+        {"words": ["héllo"]},
+        {"words": ["hello"], "rule": "B9/S23"},
+        {"words": ["hello"], "top_k": 0},
+    ],
+)
+def test_games_rejects_invalid_requests(client, payload):
+    assert client.post("/cgol/games", json=payload).status_code == 400
+
+
+def test_games_stream(client):
+    response = client.post("/cgol/games/stream", json={"words": WORDS, "top_k": 1})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    results = {line["word"]: line for line in lines if line["type"] == "result"}
+    assert len(results) == len(set(WORDS))
+    for word, result in results.items():
+        assert {key: val for key, val in result.items() if key != "type"} == expected_result(word)
+    summary = lines[-1]
+    assert summary["type"] == "summary"
+    assert summary["best"] == [max((expected_result(word) for word in WORDS), key=lambda r: r["score"])]
+
+
+def test_results_are_persisted(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENGINE_DB_URL", str(tmp_path / "service.db"))
+    with TestClient(app) as client:
+        client.post("/cgol/games", json={"words": WORDS})
+    # the write-behind queue is flushed on shutdown, a fresh process reads the stored results
+    with TestClient(app) as client:
+        response = client.get("/cgol/results", params={"order_by": "num_generations", "limit": 10})
+
+    assert sorted(result["word"] for result in response.json()["results"]) == sorted(set(WORDS))
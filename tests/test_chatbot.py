@@ -0,0 +1,38 @@
+import asyncio
+import sys
+
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.sqlite")
+
+from benchmarks.chat_load import CHATBOT_DIR, scripted_model_class  # noqa: E402
+
+if str(CHATBOT_DIR) not in sys.path:
+    sys.path.insert(0, str(CHATBOT_DIR))
+from chatbot import Chatbot  # noqa: E402
+
+
+@pytest.fixture
+def chatbot(tmp_path):
+    chatbot = Chatbot(reset_memory=True, memory_path=str(tmp_path / "memory.db"), llm=scripted_model_class()())
+    yield chatbot
+    chatbot.close()
+
+
+def test_async_turns_on_separate_event_loops(chatbot):
+    async def turn(prompt: str) -> list:
+        # concurrent turns contend for the lock of the running loop
+        states = await asyncio.gather(
+            chatbot.ainvoke({"messages": [prompt]}, thread_id="first"),
+            chatbot.ainvoke({"messages": [prompt]}, thread_id="second"),
+        )
+        return [state["messages"] for state in states]
+
+    first = asyncio.run(turn("hello"))
+    # a new loop, as `asyncio.run` per Streamlit rerun, continues the checkpointed threads
+    second = asyncio.run(turn("again"))
+    asyncio.run(chatbot.aclose())
+
+    assert [len(messages) for messages in first] == [2, 2]
+    assert [len(messages) for messages in second] == [4, 4]
+    assert chatbot.async_graph is None
@@ -0,0 +1,209 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from service.data_model import GameResponse
+from service.db.db_service import SQLiteService
+from service.db.result_snapshot import ResultSnapshot, write_snapshot
+from service.db.result_store import ResultStore
+from service.db.trajectory_writer import TrajectoryWriter
+from service.trajectory_store import TrajectoryStore
+
+
+def game_response(value: int, stop_reason: str = "extinction") -> GameResponse:
+    return GameResponse(num_generations=value, score=value, stop_reason=stop_reason)
+
+
+@pytest.fixture
+def db_service(tmp_path):
+    db_service = SQLiteService(str(tmp_path / "service.db"))
+    yield db_service
+    db_service.dispose()
+
+
+class SlowDBService:
+    """
+    Stands in for `SQLiteService` with inserts that take `delay` seconds and fail for `failing_rules`.
+    """
+
+    def __init__(self, delay: float = 0.0, failing_rules: tuple[str, ...] = ()):
+        self.delay = delay
+        self.failing_rules = failing_rules
+        self.rows: dict[tuple[str, str], GameResponse] = {}
+        self.insert_started = threading.Event()
+
+    def insert_responses(self, responses: dict[str, GameResponse], rule: str) -> bool:
+        self.insert_started.set()
+        time.sleep(self.delay)
+        if rule in self.failing_rules:
+            return False
+        self.rows.update(((rule, word), response) for word, response in responses.items())
+        return True
+
+
+def test_trajectory_writer_persists_periodically(db_service):
+    store = TrajectoryStore()
+
+    async def scenario():
+        writer = TrajectoryWriter(store, db_service, flush_interval=0.01)
+        writer.start()
+        store.record("config", [(b"a", 1, 1), (b"b", 2, 3)], 5, 6, "extinction")
+        for _ in range(100):
+            if db_service.load_trajectory_states(10):
+                break
+            await asyncio.sleep(0.01)
+        flushed_while_running = len(db_service.load_trajectory_states(10))
+        store.record("config", [(b"c", 1, 1)], 5, 6, "extinction")
+        await writer.close()
+        return flushed_while_running
+
+    assert asyncio.run(scenario()) == 2
+    assert sorted(db_service.load_trajectory_states(10)) == [
+        ("config", b"a", 4, 5, "extinction"),
+        ("config", b"b", 3, 3, "extinction"),
+        ("config", b"c", 4, 5, "extinction"),
+    ]
+
+
+def test_insert_responses_overwrite(db_service):
+    db_service.insert_responses({"word": game_response(1)})
+    db_service.insert_responses({"word": game_response(2)})
+    assert db_service.get_response("word").num_generations == 1
+
+    db_service.insert_responses({"word": game_response(2)}, overwrite=True)
+    assert db_service.get_response("word").num_generations == 2
+
+
+def test_close_stores_everything_queued(db_service):
+    async def scenario():
+        store = ResultStore(db_service, flush_interval=60)
+        store.start()
+        await store.put_many({f"word{idx}": game_response(idx) for idx in range(100)})
+        await store.put("word0", game_response(1, "persistent_state"), rule="B36/S23")
+        await store.close()
+        return store
+
+    store = asyncio.run(scenario())
+
+    assert len(db_service.load_results()) == 101
+    assert db_service.get_response("word0", rule="B36/S23").stop_reason == "persistent_state"
+    assert store.stats()["pending"] == 0
+
+
+def test_close_waits_for_the_flush_in_progress():
+    db_service = SlowDBService(delay=0.2)
+
+    async def scenario():
+        store = ResultStore(db_service, flush_interval=0.01)
+        store.start()
+        await store.put_many({"a": game_response(1)}, rule="B3/S23")
+        await store.put_many({"b": game_response(2)}, rule="B36/S23")
+        await asyncio.get_running_loop().run_in_executor(None, db_service.insert_started.wait)
+        # the loop is inside its first insert, the second rule is not stored yet
+        await store.close()
+
+    asyncio.run(scenario())
+
+    assert db_service.rows == {("B3/S23", "a"): game_response(1), ("B36/S23", "b"): game_response(2)}
+
+
+def test_cancelled_flush_keeps_results_not_stored():
+    db_service = SlowDBService(delay=0.2)
+
+    async def scenario():
+        store = ResultStore(db_service)
+        await store.put_many({"a": game_response(1)}, rule="B3/S23")
+        await store.put_many({"b": game_response(2)}, rule="B36/S23")
+        flush = asyncio.ensure_future(store.flush())
+        await asyncio.get_running_loop().run_in_executor(None, db_service.insert_started.wait)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        return store
+
+    store = asyncio.run(scenario())
+
+    # the interrupted rule and the one after it are queued again
+    assert set(store.pending) == {("B3/S23", "a"), ("B36/S23", "b")}
+    assert store.flushing == {}
+
+
+def test_failed_flush_keeps_its_rule_queued():
+    db_service = SlowDBService(failing_rules=("B36/S23",))
+
+    async def scenario():
+        store = ResultStore(db_service)
+        await store.put_many({"a": game_response(1)}, rule="B3/S23")
+        await store.put_many({"b": game_response(2)}, rule="B36/S23")
+        await store.flush()
+        return store
+
+    store = asyncio.run(scenario())
+
+    assert db_service.rows == {("B3/S23", "a"): game_response(1)}
+    assert set(store.pending) == {("B36/S23", "b")}
+    assert store.stats()["failed_flushes"] == 1
+
+
+def test_backpressure_without_flush_loop_flushes_inline(db_service):
+    async def scenario():
+        store = ResultStore(db_service, max_pending=10)
+        await asyncio.wait_for(store.put_many({f"word{idx}": game_response(idx) for idx in range(25)}), 5)
+        return store
+
+    store = asyncio.run(scenario())
+
+    assert len(db_service.load_results()) == 25
+    assert store.stats()["pending"] == 0
+
+
+def test_reads_see_queued_results(db_service):
+    async def scenario():
+        store = ResultStore(db_service, flush_interval=60)
+        await store.put("queued", game_response(3))
+        db_service.insert_responses({"stored": game_response(4)})
+        return await store.get_responses(["queued", "stored", "missing"]), await store.get_response("missing")
+
+    responses, missing = asyncio.run(scenario())
+
+    assert responses == {"queued": game_response(3), "stored": game_response(4)}
+    assert missing is None
+
+
+def test_snapshot_round_trip(db_service, tmp_path):
+    db_service.insert_responses({f"word{idx}": game_response(idx) for idx in range(50)})
+    db_service.insert_responses({"word1": game_response(7, "repeated_pattern"), "zebra": game_response(8)}, "B36/S23")
+    db_service.insert_responses({"héllo": game_response(9, "reached_max_generation")})
+    rows = db_service.load_results()
+    path = str(tmp_path / "results.snapshot")
+
+    assert write_snapshot(path, rows) == len(rows)
+    snapshot = ResultSnapshot(path)
+    try:
+        assert len(snapshot) == len(rows)
+        for rule, word, num_generations, score, stop_reason in rows:
+            assert snapshot.get_response(word, rule) == GameResponse(
+                num_generations=num_generations, score=score, stop_reason=stop_reason
+            )
+        assert snapshot.get_response("zebra") is None
+        assert snapshot.get_response("word1", "B2/S") is None
+        assert snapshot.stats()["hits"] == len(rows)
+    finally:
+        snapshot.close()
+
+
+def test_store_reads_through_the_snapshot(db_service, tmp_path):
+    path = str(tmp_path / "results.snapshot")
+    write_snapshot(path, [("B3/S23", "snapshot", 5, 6, "extinction")])
+    snapshot = ResultSnapshot(path)
+
+    async def scenario():
+        store = ResultStore(db_service, snapshot=snapshot)
+        return await store.get_response("snapshot"), await store.get_response("missing")
+
+    try:
+        assert asyncio.run(scenario()) == (GameResponse(num_generations=5, score=6, stop_reason="extinction"), None)
+    finally:
+        snapshot.close()
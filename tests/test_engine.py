@@ -0,0 +1,201 @@
+import ctypes
+
+import numpy as np
+import pytest
+
+from service.cgol_engine import CPP_ABI_VERSION, STOP_REASONS, GameOfLifeEngine
+from service.data_model import GameResponse
+from service.rules import DEFAULT_RULE
+from service.trajectory_store import TrajectoryStore
+
+WORDS = ["a", "hello", "monkey", "persistent_state", "Conway", "glider", "zebra", "Game of Life", "~!@#", "qwertyuiop"]
+GRIDS = [(60, 40), (24, 24), (17, 33)]
+# Conway, HighLife, Seeds (never settles) and Day & Night
+RULES = ["B3/S23", "B36/S23", "B2/S", "B3678/S34678"]
+MAX_GENERATIONS = 200
+# backends stepping the board from Python run on a few words only
+SLOW_BACKENDS = ("python",)
+SLOW_WORDS = WORDS[:4]
+
+
+def reference_engine(grid_rows: int, grid_cols: int, rule: str) -> GameOfLifeEngine:
+    return GameOfLifeEngine(max_generations=MAX_GENERATIONS, grid_rows=grid_rows, grid_cols=grid_cols, rule=rule)
+
+
+def run_from_word(engine: GameOfLifeEngine, word: str) -> GameResponse:
+    """
+    Result of the C++ `runFromWordRule` entry point, or of the python backend without the library.
+    """
+    if engine.cpp_lib is None or engine.cpp_abi_version != CPP_ABI_VERSION:
+        return GameOfLifeEngine(
+            max_generations=engine.max_generations,
+            grid_rows=engine.grid_rows,
+            grid_cols=engine.grid_cols,
+            rule=engine.rule.rulestring,
+            backend="python",
+        ).run(word)
+
+    engine.grid = np.zeros((engine.grid_rows, engine.grid_cols), dtype=np.uint8)
+    engine.inject_bitmask_seed(engine.bitmask_reshape(engine.word_to_bitmask(word)))
+    out_generations = ctypes.c_int()
+    out_score = ctypes.c_int()
+    reason_buffer = ctypes.create_string_buffer(128)
+    engine.cpp_lib.runFromWordRule(
+        engine.grid.reshape(-1),
+        engine.grid_rows,
+        engine.grid_cols,
+        engine.max_generations,
+        engine.repeat_threshold,
+        out_generations,
+        out_score,
+        reason_buffer,
+        ctypes.sizeof(reason_buffer),
+        0,
+        engine.rule.birth_mask,
+        engine.rule.survival_mask,
+    )
+    return GameResponse(
+        num_generations=out_generations.value, score=out_score.value, stop_reason=reason_buffer.value.decode()
+    )
+
+
+@pytest.fixture(scope="module", params=[(grid, rule) for grid in GRIDS for rule in RULES], ids=str)
+def expected(request) -> tuple[tuple[int, int], str, dict[str, GameResponse]]:
+    (grid_rows, grid_cols), rule = request.param
+    engine = reference_engine(grid_rows, grid_cols, rule)
+    return (grid_rows, grid_cols), rule, {word: run_from_word(engine, word) for word in WORDS}
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy", "cpp", "cpp_packed"])
+def test_backends_match_run_from_word(expected, backend):
+    (grid_rows, grid_cols), rule, responses = expected
+    engine = GameOfLifeEngine(
+        max_generations=MAX_GENERATIONS, grid_rows=grid_rows, grid_cols=grid_cols, rule=rule, backend="numpy"
+    )
+    if backend not in engine.available_backends():
+        pytest.skip(f"backend {backend} is not available")
+    engine = GameOfLifeEngine(
+        max_generations=MAX_GENERATIONS, grid_rows=grid_rows, grid_cols=grid_cols, rule=rule, backend=backend
+    )
+    words = SLOW_WORDS if backend in SLOW_BACKENDS else WORDS
+
+    assert [engine.run(word) for word in words] == [responses[word] for word in words]
+
+
+@pytest.mark.parametrize("backend", ["numpy", "cpp", "cpp_packed"])
+def test_run_batch_matches_run_from_word(expected, backend):
+    (grid_rows, grid_cols), rule, responses = expected
+    try:
+        engine = GameOfLifeEngine(
+            max_generations=MAX_GENERATIONS, grid_rows=grid_rows, grid_cols=grid_cols, rule=rule, backend=backend
+        )
+    except RuntimeError:
+        pytest.skip(f"backend {backend} is not available")
+    words = SLOW_WORDS if backend in SLOW_BACKENDS else WORDS
+
+    assert engine.run_batch(words) == [responses[word] for word in words]
+    assert engine.run_batch([]) == []
+
+
+@pytest.mark.parametrize("backend", ["numpy", "cpp", "cpp_packed"])
+def test_run_with_history_is_consistent(expected, backend):
+    (grid_rows, grid_cols), rule, responses = expected
+    try:
+        engine = GameOfLifeEngine(
+            max_generations=MAX_GENERATIONS, grid_rows=grid_rows, grid_cols=grid_cols, rule=rule, backend=backend
+        )
+    except RuntimeError:
+        pytest.skip(f"backend {backend} is not available")
+
+    for word in WORDS[:4]:
+        response, grid, population, births = engine.run_with_history(word)
+        assert response == responses[word]
+        assert len(population) == len(births) == response.num_generations + 1
+        assert births[1:].sum() == response.score
+        assert population[-1] == grid.sum()
+
+
+def test_trajectory_store_keeps_results(expected):
+    (grid_rows, grid_cols), rule, responses = expected
+    store = TrajectoryStore()
+    engine = GameOfLifeEngine(
+        max_generations=MAX_GENERATIONS,
+        grid_rows=grid_rows,
+        grid_cols=grid_cols,
+        rule=rule,
+        backend="numpy",
+        trajectory_store=store,
+    )
+
+    # the second pass hits the states recorded by the first one
+    for _ in range(2):
+        assert [engine.run(word) for word in WORDS] == [responses[word] for word in WORDS]
+
+
+def test_packed_bands_match_single_thread():
+    engine = GameOfLifeEngine(backend="numpy")
+    if "cpp_packed" not in engine.available_backends():
+        pytest.skip("backend cpp_packed is not available")
+
+    # a random board keeps enough words active per band for the band threads to run
+    grid_rows, grid_cols = 512, 640
+    seed = (np.random.default_rng(0).random((grid_rows, grid_cols)) < 0.3).astype(np.uint8)
+    results = []
+    for packed, num_threads in ((0, 1), (1, 1), (1, 4)):
+        grid = seed.copy().reshape(-1)
+        out = [ctypes.c_int() for _ in range(3)]
+        engine.cpp_lib.runFromWordInto(
+            grid,
+            np.empty_like(grid),
+            grid_rows,
+            grid_cols,
+            100,
+            engine.repeat_threshold,
+            0,
+            engine.rule.birth_mask,
+            engine.rule.survival_mask,
+            packed,
+            num_threads,
+            *out,
+            None,
+            None,
+        )
+        results.append(((out[0].value, out[1].value, STOP_REASONS[out[2].value]), grid))
+
+    for result, grid in results[1:]:
+        assert result == results[0][0]
+        assert np.array_equal(grid, results[0][1])
+
+
+def test_legacy_run_from_word_runs_conway():
+    engine = reference_engine(60, 40, DEFAULT_RULE)
+    if engine.cpp_abi_version != CPP_ABI_VERSION:
+        pytest.skip("C++ library is not available")
+
+    for word in WORDS:
+        engine.grid = np.zeros((engine.grid_rows, engine.grid_cols), dtype=np.uint8)
+        engine.inject_bitmask_seed(engine.bitmask_reshape(engine.word_to_bitmask(word)))
+        out_generations = ctypes.c_int()
+        out_score = ctypes.c_int()
+        reason_buffer = ctypes.create_string_buffer(128)
+        # the original 9 argument signature
+        engine.cpp_lib.runFromWord(
+            engine.grid.reshape(-1),
+            engine.grid_rows,
+            engine.grid_cols,
+            engine.max_generations,
+            engine.repeat_threshold,
+            out_generations,
+            out_score,
+            reason_buffer,
+            ctypes.sizeof(reason_buffer),
+        )
+        response = GameResponse(
+            num_generations=out_generations.value, score=out_score.value, stop_reason=reason_buffer.value.decode()
+        )
+        assert response == run_from_word(engine, word)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        GameOfLifeEngine(backend="gpu")
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+from service.executor import EngineExecutor, EngineQueueFullError, _worker_state
+from service.rules import DEFAULT_RULE
+from service.trajectory_store import TrajectoryStore
+
+
+def test_full_queue_rejects_runs():
+    executor = EngineExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        # the only worker is busy, one run waits in the queue and the next one is rejected
+        executor.pool.submit(release.wait, 5)
+        queued = [asyncio.ensure_future(executor.run(word, DEFAULT_RULE)) for word in ("a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(EngineQueueFullError):
+            await executor.run("c", DEFAULT_RULE)
+        release.set()
+        return await asyncio.gather(*queued)
+
+    try:
+        assert len(asyncio.run(scenario())) == 2
+        assert executor.stats()["rejected"] == 1
+        assert executor.stats()["completed"] == 2
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_trajectory_store_selects_the_numpy_backend():
+    executor = EngineExecutor(max_workers=1, max_queue=1, trajectory_store=TrajectoryStore(100))
+    try:
+        assert executor.backend == "numpy"
+        assert executor.engine_options["backend"] == "numpy"
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.parametrize("backend", ["cpp", "cpp_packed"])
+def test_trajectory_store_rejects_cpp_backends(backend):
+    with pytest.raises(ValueError):
+        EngineExecutor(max_workers=1, max_queue=1, backend=backend, trajectory_store=TrajectoryStore(100))
+
+
+def has_worker_engine(barrier: threading.Barrier) -> bool:
+    # one job per worker thread, like the warmup jobs
+    barrier.wait(5)
+    return DEFAULT_RULE in getattr(_worker_state, "engines", {})
+
+
+def test_warmup_builds_an_engine_in_every_worker():
+    executor = EngineExecutor(max_workers=4, max_queue=0)
+    try:
+        asyncio.run(executor.warmup())
+        barrier = threading.Barrier(executor.max_workers)
+        checks = [executor.pool.submit(has_worker_engine, barrier) for _ in range(executor.max_workers)]
+        assert all(check.result() for check in checks)
+    finally:
+        executor.shutdown()
+
+
+def test_warmup_process_pool():
+    executor = EngineExecutor(max_workers=2, max_queue=0, kind="process")
+    try:
+        asyncio.run(executor.warmup(timeout=30))
+    finally:
+        executor.shutdown()
@@ -0,0 +1,54 @@
+import asyncio
+
+from service.data_model import GameResponse
+from service.result_cache import ResultCache
+
+
+def game_response(value: int) -> GameResponse:
+    return GameResponse(num_generations=value, score=value, stop_reason="extinction")
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return game_response(1)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [game_response(1)] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+    assert cache.get("key") == game_response(1)
+
+
+def test_get_or_compute_many_computes_missing_keys_once():
+    cache = ResultCache()
+    cache.put("cached", game_response(0))
+    computed = []
+
+    async def compute_many(keys):
+        computed.append(keys)
+        return [game_response(len(key)) for key in keys]
+
+    async def scenario():
+        return await cache.get_or_compute_many(["a", "cached", "bb", "a"], compute_many)
+
+    assert asyncio.run(scenario()) == [game_response(1), game_response(0), game_response(2), game_response(1)]
+    assert computed == [["a", "bb"]]
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, game_response(1))
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+    expiring = ResultCache(ttl=-1)
+    expiring.put("a", game_response(1))
+    assert expiring.get("a") is None
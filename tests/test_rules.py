@@ -0,0 +1,27 @@
+import pytest
+
+from service.rules import DEFAULT_RULE, parse_rule
+
+
+@pytest.mark.parametrize(
+    "rulestring, expected",
+    [("B3/S23", "B3/S23"), ("b36/s23", "B36/S23"), ("23/36", "B36/S23"), ("B2/S", "B2/S"), (" B3678/S34678 ", None)],
+)
+def test_parse_rule(rulestring, expected):
+    assert parse_rule(rulestring).rulestring == (expected or rulestring.strip())
+
+
+@pytest.mark.parametrize("rulestring", ["", "B9/S23", "conway", "B3/S23/X"])
+def test_parse_rule_rejects_invalid_rules(rulestring):
+    with pytest.raises(ValueError):
+        parse_rule(rulestring)
+
+
+def test_tables_follow_the_rule():
+    rule = parse_rule("B36/S23")
+
+    assert rule.birth_mask == (1 << 3) | (1 << 6)
+    assert rule.survival_mask == (1 << 2) | (1 << 3)
+    assert [rule.next_state(0, count) for count in range(9)] == [0, 0, 0, 1, 0, 0, 1, 0, 0]
+    assert [rule.next_state(1, count) for count in range(9)] == [0, 0, 1, 1, 0, 0, 0, 0, 0]
+    assert parse_rule(DEFAULT_RULE).is_conway and not rule.is_conway